@@ -0,0 +1,55 @@
+-- Sharded Visitor Counter
+-- Spreads visitor increments across N rows so concurrent writers do not
+-- serialize on the single website_visitors row lock. Readers sum the shards.
+
+-- ============================================================================
+-- VISITOR COUNTER SHARDS TABLE
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS website_visitor_shards (
+    shard_id INTEGER PRIMARY KEY,
+    count BIGINT NOT NULL DEFAULT 0,
+    last_updated TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Carry the legacy single-row total over into shard 0
+INSERT INTO website_visitor_shards (shard_id, count, last_updated)
+SELECT 0, count, last_updated
+FROM website_visitors
+WHERE id = 'visitor_count'
+ON CONFLICT (shard_id) DO NOTHING;
+
+-- Pre-create the default 16 shards (the app upserts any others on demand)
+INSERT INTO website_visitor_shards (shard_id, count)
+SELECT shard_id, 0 FROM generate_series(0, 15) AS shard_id
+ON CONFLICT (shard_id) DO NOTHING;
+
+-- ============================================================================
+-- FUNCTIONS
+-- ============================================================================
+
+-- Keep increment_visitor_count() for existing callers, now backed by shards
+-- (dropped first because the return type widens from INTEGER to BIGINT)
+DROP FUNCTION IF EXISTS increment_visitor_count();
+CREATE FUNCTION increment_visitor_count()
+RETURNS BIGINT AS $$
+DECLARE
+    total BIGINT;
+BEGIN
+    INSERT INTO website_visitor_shards (shard_id, count, last_updated)
+    VALUES (floor(random() * 16)::INTEGER, 1, NOW())
+    ON CONFLICT (shard_id) DO UPDATE
+    SET count = website_visitor_shards.count + 1,
+        last_updated = NOW();
+
+    SELECT COALESCE(SUM(count), 0) INTO total FROM website_visitor_shards;
+    RETURN total;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- PERMISSIONS
+-- ============================================================================
+GRANT ALL PRIVILEGES ON website_visitor_shards TO pretamane;
+
+COMMENT ON TABLE website_visitor_shards IS 'Sharded visitor counter - total is SUM(count)';
+COMMENT ON FUNCTION increment_visitor_count() IS 'Increments a random visitor counter shard and returns the total';
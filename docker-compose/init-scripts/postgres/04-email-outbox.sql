@@ -0,0 +1,35 @@
+-- Transactional Email Outbox
+-- Notification emails are written here in the same transaction as the row
+-- that triggers them, then delivered by the API's background outbox worker.
+
+-- ============================================================================
+-- EMAIL OUTBOX TABLE
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    event_type VARCHAR(100) NOT NULL,
+    aggregate_id VARCHAR(255),
+    payload JSONB NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',  -- pending, sending, sent, dead
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    locked_until TIMESTAMPTZ,
+    last_error TEXT,
+    sent_at TIMESTAMPTZ,
+
+    -- Additional metadata
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Only undelivered messages are ever scanned by the worker
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox(next_attempt_at)
+    WHERE status IN ('pending', 'sending');
+CREATE INDEX IF NOT EXISTS idx_email_outbox_aggregate ON email_outbox(aggregate_id);
+
+-- ============================================================================
+-- PERMISSIONS
+-- ============================================================================
+GRANT ALL PRIVILEGES ON email_outbox TO pretamane;
+GRANT ALL PRIVILEGES ON SEQUENCE email_outbox_id_seq TO pretamane;
+
+COMMENT ON TABLE email_outbox IS 'Transactional outbox for notification emails';
@@ -0,0 +1,122 @@
+-- Analytics Rollups
+-- Maintains contact/document totals per status and per document type with
+-- triggers, so /analytics/insights reads a handful of rows instead of
+-- scanning contact_submissions and documents on every call.
+
+-- ============================================================================
+-- ANALYTICS ROLLUPS TABLE
+-- ============================================================================
+-- Each (metric, dimension) is spread over a few shards so concurrent inserts
+-- do not serialize on one row; readers SUM over shard_id.
+CREATE TABLE IF NOT EXISTS analytics_rollups (
+    metric VARCHAR(50) NOT NULL,       -- contacts, documents, document_status, document_type
+    dimension VARCHAR(255) NOT NULL,   -- 'total', a processing status, or a document type
+    shard_id SMALLINT NOT NULL DEFAULT 0,
+    count BIGINT NOT NULL DEFAULT 0,
+    last_updated TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+
+    PRIMARY KEY (metric, dimension, shard_id)
+);
+
+-- ============================================================================
+-- FUNCTIONS AND TRIGGERS
+-- ============================================================================
+
+-- Add delta to one rollup counter
+CREATE OR REPLACE FUNCTION bump_analytics_rollup(p_metric TEXT, p_dimension TEXT, p_delta BIGINT)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO analytics_rollups (metric, dimension, shard_id, count, last_updated)
+    VALUES (p_metric, COALESCE(p_dimension, 'unknown'), floor(random() * 8)::SMALLINT, p_delta, NOW())
+    ON CONFLICT (metric, dimension, shard_id) DO UPDATE
+    SET count = analytics_rollups.count + EXCLUDED.count,
+        last_updated = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Contact totals
+CREATE OR REPLACE FUNCTION rollup_contact_submissions()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_analytics_rollup('contacts', 'total', 1);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM bump_analytics_rollup('contacts', 'total', -1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Document totals per status and per type
+CREATE OR REPLACE FUNCTION rollup_documents()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM bump_analytics_rollup('documents', 'total', 1);
+        PERFORM bump_analytics_rollup('document_status', NEW.processing_status, 1);
+        PERFORM bump_analytics_rollup('document_type', NEW.document_type, 1);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM bump_analytics_rollup('documents', 'total', -1);
+        PERFORM bump_analytics_rollup('document_status', OLD.processing_status, -1);
+        PERFORM bump_analytics_rollup('document_type', OLD.document_type, -1);
+    ELSIF TG_OP = 'UPDATE' THEN
+        IF NEW.processing_status IS DISTINCT FROM OLD.processing_status THEN
+            PERFORM bump_analytics_rollup('document_status', OLD.processing_status, -1);
+            PERFORM bump_analytics_rollup('document_status', NEW.processing_status, 1);
+        END IF;
+        IF NEW.document_type IS DISTINCT FROM OLD.document_type THEN
+            PERFORM bump_analytics_rollup('document_type', OLD.document_type, -1);
+            PERFORM bump_analytics_rollup('document_type', NEW.document_type, 1);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS rollup_contact_submissions_trigger ON contact_submissions;
+CREATE TRIGGER rollup_contact_submissions_trigger AFTER INSERT OR DELETE
+    ON contact_submissions FOR EACH ROW
+    EXECUTE FUNCTION rollup_contact_submissions();
+
+DROP TRIGGER IF EXISTS rollup_documents_trigger ON documents;
+CREATE TRIGGER rollup_documents_trigger AFTER INSERT OR DELETE OR UPDATE OF processing_status, document_type
+    ON documents FOR EACH ROW
+    EXECUTE FUNCTION rollup_documents();
+
+-- ============================================================================
+-- BACKFILL
+-- ============================================================================
+-- Rebuild from the base tables (also usable to correct drift by hand)
+CREATE OR REPLACE FUNCTION rebuild_analytics_rollups()
+RETURNS VOID AS $$
+BEGIN
+    LOCK TABLE contact_submissions, documents IN SHARE MODE;
+    DELETE FROM analytics_rollups;
+
+    INSERT INTO analytics_rollups (metric, dimension, count)
+    SELECT 'contacts', 'total', COUNT(*) FROM contact_submissions;
+
+    INSERT INTO analytics_rollups (metric, dimension, count)
+    SELECT 'documents', 'total', COUNT(*) FROM documents;
+
+    INSERT INTO analytics_rollups (metric, dimension, count)
+    SELECT 'document_status', COALESCE(processing_status, 'unknown'), COUNT(*)
+    FROM documents GROUP BY COALESCE(processing_status, 'unknown');
+
+    INSERT INTO analytics_rollups (metric, dimension, count)
+    SELECT 'document_type', COALESCE(document_type, 'unknown'), COUNT(*)
+    FROM documents GROUP BY COALESCE(document_type, 'unknown');
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT rebuild_analytics_rollups();
+
+-- ============================================================================
+-- PERMISSIONS
+-- ============================================================================
+GRANT ALL PRIVILEGES ON analytics_rollups TO pretamane;
+GRANT EXECUTE ON FUNCTION bump_analytics_rollup(TEXT, TEXT, BIGINT) TO pretamane;
+GRANT EXECUTE ON FUNCTION rebuild_analytics_rollups() TO pretamane;
+
+COMMENT ON TABLE analytics_rollups IS 'Trigger-maintained analytics counters - total is SUM(count) over shard_id';
+COMMENT ON FUNCTION rebuild_analytics_rollups() IS 'Recompute analytics_rollups from contact_submissions and documents';
@@ -0,0 +1,96 @@
+-- Storage Usage Ledger
+-- Byte and object totals per bucket and per contact, updated on every
+-- upload/delete so /admin/system-info no longer lists whole buckets.
+-- Bucket totals count stored objects; contact totals count the contact's
+-- document rows, so a deduplicated blob counts for every contact using it.
+-- A periodic reconciliation job corrects a bucket's rows from a full scan
+-- and the documents table.
+
+-- ============================================================================
+-- STORAGE USAGE TABLE
+-- ============================================================================
+-- Per-contact totals of the documents stored in each bucket
+CREATE TABLE IF NOT EXISTS storage_usage (
+    bucket VARCHAR(255) NOT NULL,
+    contact_id VARCHAR(255) NOT NULL,
+    total_bytes BIGINT NOT NULL DEFAULT 0,
+    object_count BIGINT NOT NULL DEFAULT 0,
+    last_updated TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_reconciled TIMESTAMPTZ,
+
+    PRIMARY KEY (bucket, contact_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_storage_usage_contact ON storage_usage(contact_id);
+
+-- Per-bucket totals, kept apart so no contact id can collide with them
+CREATE TABLE IF NOT EXISTS storage_bucket_usage (
+    bucket VARCHAR(255) PRIMARY KEY,
+    total_bytes BIGINT NOT NULL DEFAULT 0,
+    object_count BIGINT NOT NULL DEFAULT 0,
+    last_updated TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_reconciled TIMESTAMPTZ
+);
+
+-- ============================================================================
+-- FUNCTIONS
+-- ============================================================================
+
+-- Apply an object upload (+) or delete (-) to the bucket total
+CREATE OR REPLACE FUNCTION record_storage_usage(p_bucket TEXT, p_bytes BIGINT, p_objects BIGINT)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO storage_bucket_usage (bucket, total_bytes, object_count, last_updated)
+    VALUES (p_bucket, p_bytes, p_objects, NOW())
+    ON CONFLICT (bucket) DO UPDATE
+    SET total_bytes = GREATEST(storage_bucket_usage.total_bytes + EXCLUDED.total_bytes, 0),
+        object_count = GREATEST(storage_bucket_usage.object_count + EXCLUDED.object_count, 0),
+        last_updated = NOW();
+END;
+$$ LANGUAGE plpgsql;
+
+-- Count a document row for its contact when it is inserted or deleted
+CREATE OR REPLACE FUNCTION record_document_storage()
+RETURNS TRIGGER AS $$
+DECLARE
+    doc documents%ROWTYPE;
+    direction BIGINT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        doc := NEW;
+        direction := 1;
+    ELSE
+        doc := OLD;
+        direction := -1;
+    END IF;
+
+    IF doc.s3_bucket IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO storage_usage (bucket, contact_id, total_bytes, object_count, last_updated)
+    VALUES (doc.s3_bucket, doc.contact_id, GREATEST(direction * doc.size, 0), GREATEST(direction, 0), NOW())
+    ON CONFLICT (bucket, contact_id) DO UPDATE
+    SET total_bytes = GREATEST(storage_usage.total_bytes + direction * doc.size, 0),
+        object_count = GREATEST(storage_usage.object_count + direction, 0),
+        last_updated = NOW();
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS record_document_storage_trigger ON documents;
+CREATE TRIGGER record_document_storage_trigger AFTER INSERT OR DELETE
+    ON documents FOR EACH ROW
+    EXECUTE FUNCTION record_document_storage();
+
+-- ============================================================================
+-- PERMISSIONS
+-- ============================================================================
+GRANT ALL PRIVILEGES ON storage_usage TO pretamane;
+GRANT ALL PRIVILEGES ON storage_bucket_usage TO pretamane;
+GRANT EXECUTE ON FUNCTION record_storage_usage(TEXT, BIGINT, BIGINT) TO pretamane;
+
+COMMENT ON TABLE storage_usage IS 'Per-contact document storage totals in each bucket';
+COMMENT ON TABLE storage_bucket_usage IS 'Per-bucket object storage totals';
+COMMENT ON FUNCTION record_storage_usage(TEXT, BIGINT, BIGINT) IS 'Apply an upload/delete delta to storage_bucket_usage';
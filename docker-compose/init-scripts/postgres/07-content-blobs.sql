@@ -0,0 +1,76 @@
+-- Content-Addressed Blobs
+-- Uploaded files are stored once per SHA-256 under blobs/sha256/{xx}/{hash}
+-- and shared by every document with that file_hash. ref_count tracks how
+-- many documents point at a blob (kept by triggers on documents, so it
+-- changes in the same transaction as the row); unreferenced blobs are
+-- garbage collected.
+
+-- ============================================================================
+-- CONTENT BLOBS TABLE
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS content_blobs (
+    sha256 CHAR(64) PRIMARY KEY,
+    bucket VARCHAR(255) NOT NULL,
+    s3_key TEXT NOT NULL,
+    size BIGINT NOT NULL,
+    content_type VARCHAR(255),
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    -- Set by the garbage collector before it deletes the object; a blob in
+    -- this state can no longer gain references
+    deleting BOOLEAN NOT NULL DEFAULT FALSE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    released_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_content_blobs_orphans ON content_blobs(released_at) WHERE ref_count = 0;
+
+-- Lookups of already-processed copies of the same file
+CREATE INDEX IF NOT EXISTS idx_documents_file_hash ON documents(file_hash)
+    WHERE file_hash IS NOT NULL AND file_hash <> '';
+
+-- ============================================================================
+-- FUNCTIONS AND TRIGGERS
+-- ============================================================================
+
+-- Take a reference when a document pointing at a blob is inserted
+CREATE OR REPLACE FUNCTION reference_content_blob()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE content_blobs
+    SET ref_count = ref_count + 1,
+        released_at = NULL
+    WHERE sha256 = NEW.file_hash
+      AND s3_key = NEW.s3_key;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS reference_content_blob_trigger ON documents;
+CREATE TRIGGER reference_content_blob_trigger AFTER INSERT
+    ON documents FOR EACH ROW
+    EXECUTE FUNCTION reference_content_blob();
+
+-- Drop a reference when a document pointing at a blob is deleted
+CREATE OR REPLACE FUNCTION release_content_blob()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE content_blobs
+    SET ref_count = GREATEST(ref_count - 1, 0),
+        released_at = CASE WHEN ref_count <= 1 THEN NOW() ELSE released_at END
+    WHERE sha256 = OLD.file_hash
+      AND s3_key = OLD.s3_key;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS release_content_blob_trigger ON documents;
+CREATE TRIGGER release_content_blob_trigger AFTER DELETE
+    ON documents FOR EACH ROW
+    EXECUTE FUNCTION release_content_blob();
+
+-- ============================================================================
+-- PERMISSIONS
+-- ============================================================================
+GRANT ALL PRIVILEGES ON content_blobs TO pretamane;
+
+COMMENT ON TABLE content_blobs IS 'One stored object per distinct file SHA-256, reference counted by documents';
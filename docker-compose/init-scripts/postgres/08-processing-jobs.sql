@@ -0,0 +1,91 @@
+-- Document Processing Jobs
+-- One job per stored object that needs processing. Jobs are created by the
+-- API on upload, by MinIO bucket notifications (POST /events/minio) and by a
+-- low-frequency sweep over documents still pending; workers claim them with
+-- FOR UPDATE SKIP LOCKED. Documents sharing a content-addressed object are
+-- all completed by the one job for that object. Queuing an object whose job
+-- is already being processed sets requeue, so the job runs again instead of
+-- completing (the documents it was queued for may not have been visible yet).
+
+-- ============================================================================
+-- PROCESSING JOBS TABLE
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS processing_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    bucket VARCHAR(255) NOT NULL,
+    s3_key TEXT NOT NULL,
+    source VARCHAR(20) NOT NULL DEFAULT 'api',    -- api, webhook, sweep
+    status VARCHAR(20) NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'processing', 'completed', 'dead')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    requeue BOOLEAN NOT NULL DEFAULT FALSE,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    locked_until TIMESTAMPTZ,
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    completed_at TIMESTAMPTZ
+);
+
+-- At most one open job per object, so repeated events collapse
+CREATE UNIQUE INDEX IF NOT EXISTS idx_processing_jobs_open ON processing_jobs(bucket, s3_key)
+    WHERE status IN ('pending', 'processing');
+
+CREATE INDEX IF NOT EXISTS idx_processing_jobs_due ON processing_jobs(next_attempt_at)
+    WHERE status = 'pending';
+
+-- Object event -> documents lookups
+CREATE INDEX IF NOT EXISTS idx_documents_s3_object ON documents(s3_bucket, s3_key);
+
+-- ============================================================================
+-- FUNCTIONS AND TRIGGERS
+-- ============================================================================
+
+-- Wake listening workers as soon as a job is queued
+CREATE OR REPLACE FUNCTION notify_processing_job()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('processing_jobs', NEW.id::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS notify_processing_job_trigger ON processing_jobs;
+CREATE TRIGGER notify_processing_job_trigger AFTER INSERT
+    ON processing_jobs FOR EACH ROW
+    EXECUTE FUNCTION notify_processing_job();
+
+-- Safety net: queue objects of documents that have been pending longer than
+-- min_age without an open or dead-lettered job; returns the number queued
+CREATE OR REPLACE FUNCTION enqueue_pending_documents(min_age INTERVAL)
+RETURNS INTEGER AS $$
+DECLARE
+    queued INTEGER;
+BEGIN
+    INSERT INTO processing_jobs (bucket, s3_key, source)
+    SELECT DISTINCT d.s3_bucket, d.s3_key, 'sweep'
+    FROM documents d
+    WHERE d.processing_status = 'pending'
+      AND d.upload_timestamp < NOW() - min_age
+      AND COALESCE(d.s3_key, '') <> ''
+      AND NOT EXISTS (
+          SELECT 1 FROM processing_jobs j
+          WHERE j.bucket = d.s3_bucket
+            AND j.s3_key = d.s3_key
+            AND j.status IN ('pending', 'processing', 'dead')
+      )
+    ON CONFLICT (bucket, s3_key) WHERE status IN ('pending', 'processing') DO NOTHING;
+
+    GET DIAGNOSTICS queued = ROW_COUNT;
+    RETURN queued;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- PERMISSIONS
+-- ============================================================================
+GRANT ALL PRIVILEGES ON processing_jobs TO pretamane;
+GRANT ALL PRIVILEGES ON SEQUENCE processing_jobs_id_seq TO pretamane;
+GRANT EXECUTE ON FUNCTION enqueue_pending_documents(INTERVAL) TO pretamane;
+
+COMMENT ON TABLE processing_jobs IS 'Document processing queue, one open job per stored object';
+COMMENT ON FUNCTION enqueue_pending_documents(INTERVAL) IS 'Queue jobs for documents stuck in pending (polling safety net)';
@@ -0,0 +1,62 @@
+-- Keyword Document Frequencies
+-- Corpus statistics for TF-IDF keyword scoring. Each processed object adds
+-- one to the document frequency of every distinct term it contains; the API
+-- keeps an in-memory snapshot of this table and refreshes it periodically.
+
+-- ============================================================================
+-- TABLES
+-- ============================================================================
+
+-- Number of counted documents containing each term
+CREATE TABLE IF NOT EXISTS keyword_document_frequency (
+    term VARCHAR(64) PRIMARY KEY,
+    document_count BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Objects already counted, so retried or repeated processing is not counted twice
+-- (content-addressed objects also make duplicate uploads count once)
+CREATE TABLE IF NOT EXISTS keyword_corpus_documents (
+    document_key TEXT PRIMARY KEY,
+    term_count INTEGER NOT NULL,
+    counted_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- ============================================================================
+-- FUNCTIONS
+-- ============================================================================
+
+-- Count one document's distinct terms; returns FALSE if it was already counted
+CREATE OR REPLACE FUNCTION record_document_terms(p_document_key TEXT, p_terms TEXT[])
+RETURNS BOOLEAN AS $$
+BEGIN
+    INSERT INTO keyword_corpus_documents (document_key, term_count)
+    VALUES (p_document_key, COALESCE(array_length(p_terms, 1), 0))
+    ON CONFLICT (document_key) DO NOTHING;
+
+    IF NOT FOUND THEN
+        RETURN FALSE;
+    END IF;
+
+    -- Sorted so concurrent documents lock shared terms in the same order
+    INSERT INTO keyword_document_frequency (term, document_count)
+    SELECT DISTINCT term, 1 FROM unnest(p_terms) AS term
+    ORDER BY term
+    ON CONFLICT (term) DO UPDATE
+    SET document_count = keyword_document_frequency.document_count + 1,
+        updated_at = NOW();
+
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================================================
+-- PERMISSIONS
+-- ============================================================================
+GRANT ALL PRIVILEGES ON keyword_document_frequency TO pretamane;
+GRANT ALL PRIVILEGES ON keyword_corpus_documents TO pretamane;
+GRANT EXECUTE ON FUNCTION record_document_terms(TEXT, TEXT[]) TO pretamane;
+
+COMMENT ON TABLE keyword_document_frequency IS 'Per-term document frequencies for TF-IDF keywords';
+COMMENT ON TABLE keyword_corpus_documents IS 'Objects whose terms are counted in keyword_document_frequency';
+COMMENT ON FUNCTION record_document_terms(TEXT, TEXT[]) IS 'Add one document''s distinct terms to the corpus (idempotent per document_key)';
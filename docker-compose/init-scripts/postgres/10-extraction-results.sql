@@ -0,0 +1,32 @@
+-- Extraction Results Cache
+-- Output of document analysis (text, metadata with keywords and entities,
+-- complexity score) keyed by file SHA-256, extractor version and the
+-- declared content type and file extension (which pick the extractor and
+-- shape the output), so the same upload is never extracted twice. Rows of
+-- other versions are ignored and removed with their blob.
+
+-- ============================================================================
+-- EXTRACTION RESULTS TABLE
+-- ============================================================================
+CREATE TABLE IF NOT EXISTS extraction_results (
+    sha256 CHAR(64) NOT NULL,
+    extractor_version VARCHAR(32) NOT NULL,
+    content_type VARCHAR(255) NOT NULL,
+    file_extension TEXT NOT NULL,
+    -- NULL when the raw content equals text_content
+    content TEXT,
+    text_content TEXT NOT NULL,
+    metadata JSONB NOT NULL,
+    complexity_score NUMERIC(5,2),
+    hit_count BIGINT NOT NULL DEFAULT 0,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_hit_at TIMESTAMPTZ,
+    PRIMARY KEY (sha256, extractor_version, content_type, file_extension)
+);
+
+-- ============================================================================
+-- PERMISSIONS
+-- ============================================================================
+GRANT ALL PRIVILEGES ON extraction_results TO pretamane;
+
+COMMENT ON TABLE extraction_results IS 'Document analysis results by file hash, extractor version and declared type';
@@ -6,47 +6,53 @@
 # - CloudWatch → Prometheus + Loki
 
 from fastapi import FastAPI, Request, Response, HTTPException, UploadFile, File, Form, BackgroundTasks, Header, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
 import os
+import re
+import secrets
+import asyncio
 import logging
 from datetime import datetime
 from typing import Optional
 import time
 import uuid
-import json
+from email.utils import format_datetime
+from urllib.parse import quote
 
 # Import services for open-source stack
 from shared.database_service_postgres import PostgreSQLService
+from shared.database_service_asyncpg import AsyncPostgreSQLService
 from shared.search_service_meilisearch import MeilisearchService
+from shared.search_batch_indexer import MeilisearchBatchIndexer
+from shared.search_cache import SearchResultCache
 from shared.storage_service_minio import MinIOStorageService
 from shared.email_service import EmailService
+from shared.offload_executor import OffloadExecutor
+from shared.analysis_pool import DocumentAnalysisPool
+from shared.json_codec import FAST_JSON, FastJSONResponse
+from shared.storage_events import created_objects
+from shared.structured_logging import setup_logging, stop_logging, AccessLogSampler
+from components.email_outbox_worker import EmailOutboxWorker
+from components.health_prober import HealthProber
+from components.storage_ledger import StorageUsageLedger
+from components.content_store import ContentAddressedStore
+from components.keyword_index import KeywordIndex
+from components.document_processing_worker import DocumentProcessingWorker
 
 # Import models
 from models.contact import ContactForm, ContactResponse
-from models.document import DocumentUpload, DocumentResponse, SearchRequest, SearchResponse
+from models.document import (
+    DocumentUpload, DocumentResponse, SearchRequest, SearchResponse,
+    UploadUrlRequest, UploadUrlResponse, UploadCompleteRequest
+)
 from models.response import HealthResponse, AnalyticsResponse, StatsResponse
 
-# Configure logging with JSON format
-class JSONFormatter(logging.Formatter):
-    def format(self, record):
-        log_data = {
-            "timestamp": self.formatTime(record, self.datefmt),
-            "level": record.levelname,
-            "name": record.name,
-            "message": record.getMessage(),
-            "correlation_id": getattr(record, 'correlation_id', 'N/A')
-        }
-        return json.dumps(log_data)
-
-handler = logging.StreamHandler()
-handler.setFormatter(JSONFormatter())
-logging.basicConfig(
-    level=os.environ.get('LOG_LEVEL', 'INFO'),
-    handlers=[handler]
-)
+# Configure logging with JSON format (queued, written by a background thread)
+setup_logging(os.environ.get('LOG_LEVEL', 'INFO'))
 logger = logging.getLogger(__name__)
+access_log_sampler = AccessLogSampler()
 
 # ============================================================================
 # AUTHENTICATION
@@ -75,10 +81,19 @@ http_requests_total = Counter(
     ['method', 'endpoint', 'status']
 )
 
+# Latency buckets in seconds, overridable as a comma-separated list
+HTTP_DURATION_BUCKETS = tuple(
+    float(bucket) for bucket in os.environ.get(
+        'HTTP_DURATION_BUCKETS',
+        '0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10'
+    ).split(',')
+)
+
 http_request_duration_seconds = Histogram(
     'http_request_duration_seconds',
     'HTTP request duration in seconds',
-    ['method', 'endpoint']
+    ['method', 'endpoint'],
+    buckets=HTTP_DURATION_BUCKETS
 )
 
 # Business metrics
@@ -105,6 +120,12 @@ active_connections = Gauge(
     'Number of active database connections'
 )
 
+storage_events_total = Counter(
+    'storage_events_total',
+    'Objects reported by bucket notifications',
+    ['outcome']
+)
+
 visitor_count_gauge = Gauge(
     'website_visitor_count',
     'Total website visitor count'
@@ -119,7 +140,8 @@ app = FastAPI(
     description="Enterprise document processing with PostgreSQL, Meilisearch, and MinIO",
     version="4.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=FastJSONResponse if FAST_JSON else JSONResponse
 )
 
 # Add CORS middleware
@@ -136,72 +158,112 @@ db_service = None
 search_service = None
 storage_service = None
 email_service = None
+offload_executor = None
+analysis_pool = None
+outbox_worker = None
+search_indexer = None
+search_cache = None
+health_prober = None
+storage_ledger = None
+content_store = None
+keyword_index = None
+processing_worker = None
+
+# Database driver: 'asyncpg' (native asyncio) or 'psycopg2' (blocking, run in threadpool)
+DB_BACKEND = os.environ.get('DB_BACKEND', 'psycopg2').lower()
+
+async def db_call(method: str, *args, **kwargs):
+    """Call a database service method without blocking the event loop"""
+    func = getattr(db_service, method)
+    if asyncio.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    return await offload_executor.run('postgres', func, *args, **kwargs)
 
 # ============================================================================
 # MIDDLEWARE FOR CORRELATION IDS AND METRICS
 # ============================================================================
 
-@app.middleware("http")
-async def correlation_and_metrics_middleware(request: Request, call_next):
-    """Add correlation ID and collect metrics for each request"""
-    # Generate or extract correlation ID
-    correlation_id = request.headers.get('X-Correlation-ID', str(uuid.uuid4()))
-    request.state.correlation_id = correlation_id
-    
-    # Log request with correlation ID
-    logger.info(
-        f"Request started: {request.method} {request.url.path}",
-        extra={
-            "correlation_id": correlation_id,
-            "method": request.method,
-            "path": request.url.path,
-            "client": request.client.host if request.client else "unknown"
-        }
-    )
+UNMATCHED_ROUTE = '__unmatched__'
+
+def route_template(scope) -> str:
+    """Label requests by matched route template (e.g. /contacts/{contact_id}/documents)"""
+    route = scope.get('route')
+    if route is None:
+        return UNMATCHED_ROUTE
+    return getattr(route, 'path_format', None) or getattr(route, 'path', UNMATCHED_ROUTE)
+
+class CorrelationAndMetricsMiddleware:
+    """Pure ASGI middleware: correlation IDs, request logging and route-level metrics"""
     
-    start_time = time.time()
+    def __init__(self, app):
+        self.app = app
     
-    try:
-        response = await call_next(request)
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
         
-        # Record metrics
-        duration = time.time() - start_time
-        http_requests_total.labels(
-            method=request.method,
-            endpoint=request.url.path,
-            status=response.status_code
-        ).inc()
+        # Generate or extract correlation ID
+        correlation_id = None
+        for name, value in scope['headers']:
+            if name == b'x-correlation-id':
+                correlation_id = value.decode('latin-1')
+                break
+        correlation_id = correlation_id or str(uuid.uuid4())
+        scope.setdefault('state', {})['correlation_id'] = correlation_id
         
-        http_request_duration_seconds.labels(
-            method=request.method,
-            endpoint=request.url.path
-        ).observe(duration)
-        
-        # Add correlation ID to response headers
-        response.headers['X-Correlation-ID'] = correlation_id
-        
-        # Log response with correlation ID
-        logger.info(
-            f"Request completed: {request.method} {request.url.path} - {response.status_code}",
-            extra={
-                "correlation_id": correlation_id,
-                "status": response.status_code,
-                "duration": duration
-            }
-        )
+        method = scope['method']
+        path = scope['path']
+        client = scope.get('client')
         
-        return response
+        status_code = 500
+        header_value = correlation_id.encode('latin-1')
         
-    except Exception as e:
-        logger.error(
-            f"Request failed: {request.method} {request.url.path}",
-            extra={
-                "correlation_id": correlation_id,
-                "error": str(e)
-            },
-            exc_info=True
-        )
-        raise
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                # Add correlation ID to response headers
+                message.setdefault('headers', []).append((b'x-correlation-id', header_value))
+            await send(message)
+        
+        start_time = time.perf_counter()
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            logger.error(
+                f"Request failed: {method} {path}",
+                extra={
+                    "correlation_id": correlation_id,
+                    "error": str(e)
+                },
+                exc_info=True
+            )
+            raise
+        finally:
+            # Record metrics against the route template, not the raw path
+            duration = time.perf_counter() - start_time
+            endpoint = route_template(scope)
+            http_requests_total.labels(method=method, endpoint=endpoint, status=status_code).inc()
+            http_request_duration_seconds.labels(method=method, endpoint=endpoint).observe(duration)
+        
+        # One combined access-log line per request; successes are sampled, errors always kept
+        if access_log_sampler.should_log(status_code, duration):
+            logger.info(
+                f"{method} {path} - {status_code}",
+                extra={
+                    "correlation_id": correlation_id,
+                    "method": method,
+                    "path": path,
+                    "route": endpoint,
+                    "status": status_code,
+                    "duration": round(duration, 6),
+                    "client": client[0] if client else "unknown"
+                }
+            )
+
+app.add_middleware(CorrelationAndMetricsMiddleware)
 
 # ============================================================================
 # STARTUP AND SHUTDOWN
@@ -210,33 +272,82 @@ async def correlation_and_metrics_middleware(request: Request, call_next):
 @app.on_event("startup")
 async def startup_event():
     """Initialize services on startup"""
-    global db_service, search_service, storage_service, email_service
+    global db_service, search_service, storage_service, email_service, offload_executor, analysis_pool, outbox_worker, search_indexer, search_cache, health_prober, storage_ledger, content_store, keyword_index, processing_worker
     
     logger.info("Starting Open-Source Stack Application...")
-    logger.info(f"Database: PostgreSQL")
+    logger.info(f"Database: PostgreSQL ({DB_BACKEND})")
     logger.info(f"Search: Meilisearch")
     logger.info(f"Storage: MinIO (S3-compatible)")
     logger.info(f"Email: AWS SES")
     
     try:
+        # Per-backend thread pools for blocking SDK calls
+        offload_executor = OffloadExecutor()
+        
         # Initialize PostgreSQL service
-        db_service = PostgreSQLService()
+        if DB_BACKEND == 'asyncpg':
+            db_service = AsyncPostgreSQLService()
+            await db_service.connect()
+        else:
+            db_service = PostgreSQLService()
         logger.info("PostgreSQL service initialized")
         
         # Initialize Meilisearch service
         search_service = MeilisearchService()
         logger.info("Meilisearch service initialized")
         
+        # Coalesce index writes into batched Meilisearch tasks
+        search_indexer = MeilisearchBatchIndexer(search_service, offload_executor)
+        await search_indexer.start()
+        
+        # Serve repeated queries from memory until the index changes
+        search_cache = SearchResultCache(search_service)
+        
         # Initialize MinIO storage service
         storage_service = MinIOStorageService()
         logger.info("MinIO storage service initialized")
         
+        # Track per-bucket/per-contact usage in PostgreSQL, reconciled from MinIO periodically
+        storage_ledger = StorageUsageLedger(db_call, storage_service, offload_executor)
+        await storage_ledger.start()
+        
+        # Store each distinct file once and share it between duplicate uploads
+        content_store = ContentAddressedStore(
+            db_call, storage_service, offload_executor, storage_ledger, search_service, search_indexer
+        )
+        await content_store.start()
+        
+        # Worker processes for CPU-bound document analysis
+        analysis_pool = DocumentAnalysisPool()
+        
+        # Corpus document frequencies for TF-IDF keywords
+        keyword_index = KeywordIndex(db_call)
+        await keyword_index.start()
+        
+        # Process queued documents (shared across replicas via SKIP LOCKED)
+        processing_worker = DocumentProcessingWorker(
+            db_call, storage_service, offload_executor, search_indexer, analysis_pool, keyword_index
+        )
+        await processing_worker.start()
+        
         # Initialize email service (AWS SES - kept for cost efficiency)
         import boto3
         ses_client = boto3.client('ses', region_name=os.environ.get('AWS_REGION', 'ap-southeast-1'))
         email_service = EmailService(ses_client)
         logger.info("Email service (SES) initialized")
         
+        # Deliver queued notification emails off the request path
+        outbox_worker = EmailOutboxWorker(db_call, email_service, offload_executor)
+        await outbox_worker.start()
+        
+        # Refresh dependency health in the background for /health, /livez and /readyz
+        health_prober = HealthProber()
+        health_prober.register('postgresql', probe_postgresql)
+        health_prober.register('meilisearch', probe_meilisearch)
+        health_prober.register('minio', probe_minio)
+        health_prober.register('ses', probe_ses)
+        await health_prober.start()
+        
         logger.info("Application startup complete!")
         
     except Exception as e:
@@ -248,11 +359,39 @@ async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("Shutting down application...")
     
+    if health_prober:
+        await health_prober.stop()
+    
+    if outbox_worker:
+        await outbox_worker.stop()
+    
+    if processing_worker:
+        await processing_worker.stop()
+    
+    if keyword_index:
+        await keyword_index.stop()
+    
+    if content_store:
+        await content_store.stop()
+    
+    if storage_ledger:
+        await storage_ledger.stop()
+    
+    if search_indexer:
+        await search_indexer.stop()
+    
     if db_service:
-        db_service.close()
+        await db_call('close')
         logger.info("Database connections closed")
     
+    if analysis_pool:
+        analysis_pool.shutdown()
+    
+    if offload_executor:
+        offload_executor.shutdown()
+    
     logger.info("Application shutdown complete!")
+    stop_logging()
 
 # ============================================================================
 # HEALTH AND INFO ENDPOINTS
@@ -287,6 +426,8 @@ def read_root():
         "endpoints": {
             "api_docs": "/docs",
             "health": "/health",
+            "liveness": "/livez",
+            "readiness": "/readyz",
             "metrics": "/metrics",
             "contact": "/contact",
             "documents": "/documents/*",
@@ -295,49 +436,68 @@ def read_root():
         }
     }
 
+async def probe_postgresql():
+    """Probe PostgreSQL with a cheap round trip"""
+    await db_call('ping')
+    visitor_count = await db_call('get_visitor_count')
+    visitor_count_gauge.set(visitor_count)
+    return {'status': 'connected', 'visitor_count': visitor_count}
+
+async def probe_meilisearch():
+    """Probe Meilisearch via index stats"""
+    stats = await offload_executor.run('meilisearch', search_service.get_index_stats)
+    if not stats:
+        return {'status': 'error: index stats unavailable'}
+    return {'status': 'connected', 'search_stats': stats}
+
+async def probe_minio():
+    """Probe MinIO by checking the data bucket"""
+    bucket_exists = await offload_executor.run('minio', storage_service.bucket_exists, storage_service.data_bucket)
+    return {'status': 'connected' if bucket_exists else 'bucket_missing'}
+
+async def probe_ses():
+    """Probe SES quota with the long-lived client"""
+    await offload_executor.run('ses', email_service.ses_client.get_send_quota)
+    return {'status': 'connected'}
+
+@app.get("/livez")
+async def liveness_check():
+    """Liveness probe - the process is up and serving requests"""
+    return {"status": "alive", "timestamp": datetime.utcnow().isoformat() + 'Z'}
+
+@app.get("/readyz")
+async def readiness_check():
+    """Readiness probe - served from the cached background probe results"""
+    failing = health_prober.failing()
+    body = {
+        "status": "ready" if not failing else "not_ready",
+        "failing": failing,
+        "timestamp": datetime.utcnow().isoformat() + 'Z'
+    }
+    return JSONResponse(status_code=200 if not failing else 503, content=body)
+
 @app.get("/health")
-def health_check():
-    """Comprehensive health check"""
+async def health_check():
+    """Comprehensive health check, served from the cached background probe results"""
     try:
         health_status = {
-            "status": "healthy",
+            "status": "healthy" if health_prober.is_ready() else "degraded",
             "timestamp": datetime.utcnow().isoformat() + 'Z',
             "version": "4.0.0",
-            "services": {}
+            "services": {},
+            "probes": health_prober.snapshot()
         }
         
-        # Check PostgreSQL
-        try:
-            visitor_count = db_service.get_visitor_count()
-            health_status["services"]["postgresql"] = "connected"
-            health_status["visitor_count"] = visitor_count
-            visitor_count_gauge.set(visitor_count)
-        except Exception as e:
-            health_status["services"]["postgresql"] = f"error: {str(e)}"
-        
-        # Check Meilisearch
-        try:
-            stats = search_service.get_index_stats()
-            health_status["services"]["meilisearch"] = "connected"
-            health_status["search_stats"] = stats
-        except Exception as e:
-            health_status["services"]["meilisearch"] = f"error: {str(e)}"
+        for name, result in health_prober.results.items():
+            health_status["services"][name] = result['status']
         
-        # Check MinIO
-        try:
-            bucket_exists = storage_service.bucket_exists(storage_service.data_bucket)
-            health_status["services"]["minio"] = "connected" if bucket_exists else "bucket_missing"
-        except Exception as e:
-            health_status["services"]["minio"] = f"error: {str(e)}"
+        postgresql = health_prober.results.get('postgresql', {})
+        if 'visitor_count' in postgresql:
+            health_status["visitor_count"] = postgresql['visitor_count']
         
-        # Check SES
-        try:
-            import boto3
-            ses = boto3.client('ses', region_name=os.environ.get('AWS_REGION', 'ap-southeast-1'))
-            ses.get_send_quota()
-            health_status["services"]["ses"] = "connected"
-        except Exception as e:
-            health_status["services"]["ses"] = f"error: {str(e)}"
+        meilisearch = health_prober.results.get('meilisearch', {})
+        if 'search_stats' in meilisearch:
+            health_status["search_stats"] = meilisearch['search_stats']
         
         return health_status
         
@@ -387,29 +547,32 @@ async def submit_contact(contact_form: ContactForm):
             'pageUrl': contact_form.pageUrl or ''
         }
         
-        # Save to PostgreSQL
-        db_service.create_contact_record(contact_data)
+        # Save to PostgreSQL together with the notification email (transactional outbox)
+        notification = {
+            'event_type': 'contact_notification',
+            'payload': {
+                'name': contact_form.name,
+                'email': contact_form.email,
+                'company': contact_data['company'],
+                'service': contact_data['service'],
+                'budget': contact_data['budget'],
+                'message': contact_form.message,
+                'timestamp': timestamp,
+                'source': contact_data['source'],
+                'user_agent': contact_data['userAgent'],
+                'page_url': contact_data['pageUrl']
+            }
+        }
+        await db_call('create_contact_record', contact_data, notification)
+        outbox_worker.notify()
         
         # Update visitor count
-        visitor_count = db_service.update_visitor_count()
+        visitor_count = await db_call('update_visitor_count')
         
         # Get document count
-        documents = db_service.get_contact_documents(contact_id)
+        documents = await db_call('get_contact_documents', contact_id)
         documents_count = len(documents)
         
-        # Send email notification
-        try:
-            email_service.send_contact_notification(
-                contact_form.name, contact_form.email,
-                contact_data['company'], contact_data['service'],
-                contact_data['budget'], contact_form.message,
-                timestamp, contact_data['source'],
-                contact_data['userAgent'], contact_data['pageUrl'],
-                documents_count
-            )
-        except Exception as e:
-            logger.warning(f"Email notification failed: {str(e)}")
-        
         # Record metrics
         contact_submissions_total.labels(
             source=contact_data['source'],
@@ -439,6 +602,41 @@ async def submit_contact(contact_form: ContactForm):
 # DOCUMENT ENDPOINTS
 # ============================================================================
 
+# Lifetime of presigned upload/download URLs
+PRESIGNED_URL_EXPIRATION = int(os.environ.get('S3_PRESIGN_EXPIRATION', '3600'))
+
+# Bytes read from MinIO per chunk when streaming document content
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get('S3_DOWNLOAD_CHUNK_SIZE', 1024 * 1024))
+
+# Single byte ranges only; anything else is ignored and the whole object is served
+SINGLE_BYTE_RANGE = re.compile(r'^bytes=(\d+-\d*|-\d+)$')
+
+def document_s3_key(contact_id: str, document_id: str, filename: str) -> str:
+    """Object key for an uploaded document"""
+    return f"documents/{contact_id}/{document_id}_{filename}"
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak If-None-Match comparison against an object ETag"""
+    candidates = [value.strip() for value in if_none_match.split(',')]
+    return '*' in candidates or any(value.removeprefix('W/') == etag for value in candidates)
+
+async def iter_object_body(body, chunk_size: int = DOWNLOAD_CHUNK_SIZE):
+    """Yield an S3 response body chunk by chunk, reading on the minio offload pool"""
+    chunks = body.iter_chunks(chunk_size)
+    try:
+        while True:
+            chunk = await offload_executor.run('minio', next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        body.close()
+
+async def queue_processing(bucket: str, s3_key: str):
+    """Queue a stored object for the processing workers (the sweep retries if this fails)"""
+    if await db_call('enqueue_processing_jobs', [(bucket, s3_key)], 'api'):
+        processing_worker.notify()
+
 @app.post("/documents/upload", response_model=DocumentResponse, dependencies=[Depends(require_api_key)])
 async def upload_document(
     file: UploadFile = File(...),
@@ -449,44 +647,61 @@ async def upload_document(
 ):
     """Upload and process documents"""
     try:
-        # Read file
-        content = await file.read()
-        
         # Generate document ID
         import uuid
         document_id = str(uuid.uuid4())
         timestamp = datetime.utcnow().isoformat() + 'Z'
         
-        # Upload to MinIO
-        s3_key = f"documents/{contact_id}/{document_id}_{file.filename}"
-        storage_service.upload_file(
-            file_content=content,
-            key=s3_key,
+        # Stream to a staging key part by part (the spooled upload is never read into memory whole).
+        # Large files take as long as they take: a timeout would answer 500 while the
+        # thread kept reading a spooled file that is closed once the response is sent
+        staged_key = document_s3_key(contact_id, document_id, file.filename)
+        upload_result = await offload_executor.run(
+            'minio', storage_service.upload_stream,
+            fileobj=file.file,
+            key=staged_key,
             content_type=file.content_type,
             metadata={
                 'contact_id': contact_id,
                 'document_type': document_type,
                 'upload_timestamp': timestamp
-            }
+            },
+            timeout=0
         )
         
+        if not upload_result:
+            raise Exception(f"Failed to store {file.filename} in MinIO")
+        
+        # Move into the content-addressed blob store (a no-op copy-wise for duplicates)
+        content_type = file.content_type or 'application/octet-stream'
+        stored = await content_store.adopt(staged_key, upload_result['sha256'], upload_result['size'], content_type)
+        s3_key = stored['s3_key']
+        
         # Save metadata to PostgreSQL
         document_data = {
             'id': document_id,
             'contact_id': contact_id,
             'filename': file.filename,
-            'size': len(content),
-            'content_type': file.content_type or 'application/octet-stream',
+            'size': upload_result['size'],
+            'content_type': content_type,
             'document_type': document_type,
             'description': description or '',
             'tags': tags.split(',') if tags else [],
             'upload_timestamp': timestamp,
             'processing_status': 'pending',
-            's3_bucket': storage_service.data_bucket,
-            's3_key': s3_key
+            's3_bucket': stored['bucket'],
+            's3_key': s3_key,
+            'file_hash': upload_result['sha256']
         }
         
-        db_service.create_document_record(document_data)
+        await db_call('create_document_record', document_data)
+        
+        # A duplicate of an already-processed file skips processing
+        processing_status = 'pending'
+        if stored['deduplicated'] and await content_store.reuse_results(document_data):
+            processing_status = 'completed'
+        else:
+            await queue_processing(stored['bucket'], stored['s3_key'])
         
         # Record metrics
         document_uploads_total.labels(
@@ -499,12 +714,12 @@ async def upload_document(
         return DocumentResponse(
             document_id=document_id,
             filename=file.filename,
-            size=len(content),
-            content_type=file.content_type or 'application/octet-stream',
+            size=upload_result['size'],
+            content_type=content_type,
             upload_timestamp=timestamp,
-            processing_status='pending',
+            processing_status=processing_status,
             contact_id=contact_id,
-            s3_path=f"s3://{storage_service.data_bucket}/{s3_key}"
+            s3_path=f"s3://{stored['bucket']}/{s3_key}"
         )
         
     except Exception as e:
@@ -515,6 +730,209 @@ async def upload_document(
         ).inc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/documents/upload-url", response_model=UploadUrlResponse, dependencies=[Depends(require_api_key)])
+async def create_upload_url(upload_request: UploadUrlRequest):
+    """Presign a direct upload to MinIO so file bytes bypass the API"""
+    try:
+        document_id = str(uuid.uuid4())
+        timestamp = datetime.utcnow().isoformat() + 'Z'
+        s3_key = document_s3_key(upload_request.contact_id, document_id, upload_request.filename)
+        
+        # Stored as object metadata and checked again on completion
+        presigned = await offload_executor.run(
+            'minio', storage_service.presign_upload,
+            key=s3_key,
+            size=upload_request.size,
+            content_type=upload_request.content_type,
+            metadata={
+                'contact_id': upload_request.contact_id,
+                'document_type': upload_request.document_type,
+                'upload_timestamp': timestamp
+            },
+            sha256=upload_request.sha256,
+            expiration=PRESIGNED_URL_EXPIRATION
+        )
+        
+        if not presigned:
+            raise Exception(f"Failed to presign upload for {upload_request.filename}")
+        
+        logger.info(f"Presigned {presigned['method']} upload: {document_id}")
+        
+        return UploadUrlResponse(document_id=document_id, s3_key=s3_key, **presigned)
+        
+    except Exception as e:
+        logger.error(f"Error creating upload URL: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/documents/{document_id}/complete", response_model=DocumentResponse, dependencies=[Depends(require_api_key)])
+async def complete_upload(document_id: str, complete_request: UploadCompleteRequest):
+    """Verify a presigned upload landed in MinIO and record the document"""
+    try:
+        uuid.UUID(document_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid document ID")
+    
+    if complete_request.upload_id and not complete_request.parts:
+        raise HTTPException(status_code=400, detail="Multipart completion requires parts")
+    
+    contact_id = complete_request.contact_id
+    s3_key = document_s3_key(contact_id, document_id, complete_request.filename)
+    
+    # A retried completion gets the recorded document rather than storing it twice
+    existing = await db_call('get_document', document_id)
+    if existing:
+        if existing['contact_id'] != contact_id:
+            raise HTTPException(status_code=409, detail="Document already exists")
+        return DocumentResponse(
+            document_id=document_id,
+            filename=existing['filename'],
+            size=existing['size'],
+            content_type=existing['content_type'],
+            upload_timestamp=existing['upload_timestamp'].isoformat(),
+            processing_status=existing['processing_status'],
+            contact_id=contact_id,
+            s3_path=f"s3://{existing['s3_bucket']}/{existing['s3_key']}"
+        )
+    
+    if complete_request.upload_id:
+        completed = await offload_executor.run(
+            'minio', storage_service.complete_multipart_upload,
+            s3_key, complete_request.upload_id, [part.model_dump() for part in complete_request.parts]
+        )
+        if not completed:
+            raise HTTPException(status_code=400, detail="Multipart upload could not be completed")
+    
+    # HEAD the object: it must exist and carry the metadata signed into the upload URL
+    object_info = await offload_executor.run('minio', storage_service.get_file_metadata, s3_key)
+    if not object_info or object_info['metadata'].get('contact_id') != contact_id:
+        raise HTTPException(status_code=404, detail="Uploaded object not found")
+    
+    document_type = object_info['metadata'].get('document_type', 'general')
+    
+    try:
+        timestamp = object_info['metadata'].get('upload_timestamp') or datetime.utcnow().isoformat() + 'Z'
+        
+        # Content-addressed only when MinIO verified the hash; otherwise the object stays where it is
+        if object_info['sha256']:
+            stored = await content_store.adopt(s3_key, object_info['sha256'], object_info['size'], object_info['content_type'])
+        else:
+            stored = {'bucket': storage_service.data_bucket, 's3_key': s3_key, 'deduplicated': False}
+        
+        document_data = {
+            'id': document_id,
+            'contact_id': contact_id,
+            'filename': complete_request.filename,
+            'size': object_info['size'],
+            'content_type': object_info['content_type'],
+            'document_type': document_type,
+            'description': complete_request.description or '',
+            'tags': complete_request.tags or [],
+            'upload_timestamp': timestamp,
+            'processing_status': 'pending',
+            's3_bucket': stored['bucket'],
+            's3_key': stored['s3_key'],
+            # Only known when the client had MinIO verify a SHA-256 on upload
+            'file_hash': object_info['sha256'] or ''
+        }
+        
+        await db_call('create_document_record', document_data)
+        
+        # Counted once the document exists, so a failed or duplicate completion adds nothing
+        if not object_info['sha256']:
+            await storage_ledger.record_upload(storage_service.data_bucket, object_info['size'])
+        
+        processing_status = 'pending'
+        if stored['deduplicated'] and await content_store.reuse_results(document_data):
+            processing_status = 'completed'
+        else:
+            await queue_processing(stored['bucket'], stored['s3_key'])
+        
+        document_uploads_total.labels(
+            document_type=document_type,
+            status='success'
+        ).inc()
+        
+        logger.info(f"Direct upload completed: {document_id}")
+        
+        return DocumentResponse(
+            document_id=document_id,
+            filename=complete_request.filename,
+            size=object_info['size'],
+            content_type=object_info['content_type'],
+            upload_timestamp=timestamp,
+            processing_status=processing_status,
+            contact_id=contact_id,
+            s3_path=f"s3://{stored['bucket']}/{stored['s3_key']}"
+        )
+        
+    except Exception as e:
+        logger.error(f"Error completing upload: {str(e)}")
+        document_uploads_total.labels(
+            document_type=document_type,
+            status='error'
+        ).inc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/documents/{document_id}/content", dependencies=[Depends(require_api_key)])
+async def get_document_content(document_id: str, request: Request):
+    """Stream a document from MinIO with Range and If-None-Match support"""
+    try:
+        uuid.UUID(document_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid document ID")
+    
+    document = await db_call('get_document', document_id)
+    if not document or not document['s3_key']:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    byte_range = request.headers.get('range')
+    if byte_range and not SINGLE_BYTE_RANGE.match(byte_range.replace(' ', '')):
+        byte_range = None
+    
+    # MinIO evaluates a single ETag itself; lists are compared below
+    if_none_match = request.headers.get('if-none-match')
+    single_etag = if_none_match if if_none_match and ',' not in if_none_match and '*' not in if_none_match else None
+    
+    try:
+        obj = await offload_executor.run(
+            'minio', storage_service.open_object,
+            document['s3_key'],
+            document['s3_bucket'] or None,
+            byte_range.replace(' ', '') if byte_range else None,
+            single_etag.removeprefix('W/') if single_etag else None
+        )
+    except Exception as e:
+        logger.error(f"Error opening document content: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if obj['status'] == 304:
+        return Response(status_code=304, headers={'ETag': single_etag.removeprefix('W/')})
+    if obj['status'] == 404:
+        raise HTTPException(status_code=404, detail="Document content not found")
+    if obj['status'] == 416:
+        return Response(status_code=416, headers={'Content-Range': f"bytes */{document['size']}"})
+    
+    if if_none_match and not single_etag and etag_matches(if_none_match, obj['etag']):
+        obj['body'].close()
+        return Response(status_code=304, headers={'ETag': obj['etag']})
+    
+    headers = {
+        'Content-Length': str(obj['content_length']),
+        'ETag': obj['etag'],
+        'Last-Modified': format_datetime(obj['last_modified'], usegmt=True),
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': f"attachment; filename*=UTF-8''{quote(document['filename'])}"
+    }
+    if obj['content_range']:
+        headers['Content-Range'] = obj['content_range']
+    
+    return StreamingResponse(
+        iter_object_body(obj['body']),
+        status_code=obj['status'],
+        media_type=document['content_type'] or obj['content_type'],
+        headers=headers
+    )
+
 @app.post("/documents/search", response_model=SearchResponse, dependencies=[Depends(require_api_key)])
 async def search_documents(search_request: SearchRequest):
     """Search documents using Meilisearch"""
@@ -523,21 +941,28 @@ async def search_documents(search_request: SearchRequest):
         
         start_time = time.time()
         
-        # Search with Meilisearch
-        results = search_service.search_documents(
-            query=search_request.query,
-            filters=search_request.filters,
-            limit=search_request.limit
-        )
+        # Serve from the result cache, falling back to Meilisearch
+        results = search_cache.get(search_request.query, search_request.filters, search_request.limit)
+        if results is None:
+            generation = search_service.generation
+            results = await offload_executor.run(
+                'meilisearch', search_service.search_documents,
+                query=search_request.query,
+                filters=search_request.filters,
+                limit=search_request.limit
+            )
+            search_cache.put(search_request.query, search_request.filters, search_request.limit, generation, results)
         
         processing_time = time.time() - start_time
         
-        return SearchResponse(
-            results=results['results'],
-            total_count=results['total_count'],
-            query=search_request.query,
-            processing_time=processing_time
-        )
+        # Returned as a Response so large result pages skip pydantic re-validation;
+        # the shape still matches SearchResponse
+        return FastJSONResponse(content={
+            'results': results['results'],
+            'total_count': results['total_count'],
+            'query': search_request.query,
+            'processing_time': processing_time
+        })
         
     except Exception as e:
         logger.error(f"Error searching documents: {str(e)}")
@@ -547,18 +972,64 @@ async def search_documents(search_request: SearchRequest):
 async def get_contact_documents(contact_id: str):
     """Get all documents for a contact"""
     try:
-        documents = db_service.get_contact_documents(contact_id)
+        documents = await db_call('get_contact_documents', contact_id)
         
-        return {
+        # Encoded directly (rows carry datetimes/UUIDs) instead of via jsonable_encoder
+        return FastJSONResponse(content={
             'contact_id': contact_id,
             'documents': documents,
             'total_count': len(documents)
-        }
+        })
         
     except Exception as e:
         logger.error(f"Error getting contact documents: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/contacts/{contact_id}/storage")
+async def get_contact_storage(contact_id: str):
+    """Get a contact's stored bytes and document counts from the storage ledger"""
+    try:
+        return await db_call('get_contact_storage_usage', contact_id)
+        
+    except Exception as e:
+        logger.error(f"Error getting contact storage: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ============================================================================
+# STORAGE EVENT ENDPOINTS
+# ============================================================================
+
+# Token MinIO sends with bucket notifications; the webhook is disabled when unset
+MINIO_WEBHOOK_TOKEN = os.environ.get('MINIO_WEBHOOK_TOKEN')
+
+@app.post("/events/minio")
+async def receive_storage_events(request: Request, authorization: Optional[str] = Header(default=None)):
+    """Queue processing for objects reported by MinIO bucket notifications"""
+    if not MINIO_WEBHOOK_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    
+    token = (authorization or '').removeprefix('Bearer ').strip()
+    if not secrets.compare_digest(token.encode(), MINIO_WEBHOOK_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    
+    try:
+        payload = await request.json()
+        objects = [
+            (bucket, key) for bucket, key in created_objects(payload)
+            if bucket == storage_service.data_bucket
+        ]
+        
+        queued = await db_call('enqueue_processing_jobs', objects, 'webhook') if objects else 0
+        
+        storage_events_total.labels(outcome='queued').inc(queued)
+        storage_events_total.labels(outcome='duplicate').inc(len(objects) - queued)
+        
+        return {'received': len(objects), 'queued': queued}
+        
+    except Exception as e:
+        logger.error(f"Error handling storage events: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # ============================================================================
 # ANALYTICS ENDPOINTS
 # ============================================================================
@@ -567,7 +1038,7 @@ async def get_contact_documents(contact_id: str):
 async def get_analytics():
     """Get system analytics and insights"""
     try:
-        analytics_data = db_service.get_analytics_data()
+        analytics_data = await db_call('get_analytics_data')
         return AnalyticsResponse(**analytics_data)
         
     except Exception as e:
@@ -578,7 +1049,7 @@ async def get_analytics():
 async def get_stats():
     """Get visitor statistics"""
     try:
-        visitor_count = db_service.get_visitor_count()
+        visitor_count = await db_call('get_visitor_count')
         
         return StatsResponse(
             visitor_count=visitor_count,
@@ -598,6 +1069,12 @@ async def get_stats():
 async def get_system_info():
     """Get system information and resource usage"""
     try:
+        # Bucket sizes come from the storage ledger rather than listing MinIO
+        storage_usage, search_stats = await asyncio.gather(
+            storage_ledger.get_usage(),
+            offload_executor.run('meilisearch', search_service.get_index_stats)
+        )
+        
         return {
             "version": "4.0.0",
             "architecture": "opensource",
@@ -609,10 +1086,19 @@ async def get_system_info():
                 "logging": "Loki + Promtail"
             },
             "storage_stats": {
-                "data_bucket": storage_service.get_bucket_size(storage_service.data_bucket),
-                "backup_bucket": storage_service.get_bucket_size(storage_service.backup_bucket)
+                "data_bucket": storage_usage[storage_service.data_bucket],
+                "backup_bucket": storage_usage[storage_service.backup_bucket]
             },
-            "search_stats": search_service.get_index_stats(),
+            "search_stats": search_stats,
+            "offload_stats": offload_executor.get_stats(),
+            "analysis_pool": analysis_pool.get_stats(),
+            "outbox_worker": outbox_worker.get_status(),
+            "search_indexer": search_indexer.get_status(),
+            "search_cache": search_cache.get_stats(),
+            "storage_ledger": storage_ledger.get_status(),
+            "content_store": content_store.get_status(),
+            "keyword_index": keyword_index.get_status(),
+            "processing_worker": processing_worker.get_status(),
             "timestamp": datetime.utcnow().isoformat() + 'Z'
         }
         
@@ -3,7 +3,7 @@ import asyncio
 import logging
 import os
 from typing import Dict, Any, List
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
 from shared.aws_clients import AWSClientManager
 from components.document_processor import DocumentProcessor
@@ -18,6 +18,11 @@ class BackgroundTaskProcessor:
         self.document_processor = document_processor
         self.running = False
         self.tasks = []
+        
+        # Bucket notifications drive processing; this poll only catches missed events
+        self.poll_interval = float(os.environ.get('S3_POLL_INTERVAL', '900'))
+        self.poll_overlap = float(os.environ.get('S3_POLL_OVERLAP', '60'))
+        self.last_polled = datetime.now(timezone.utc) - timedelta(seconds=self.poll_interval)
     
     async def start(self):
         """Start background task processor"""
@@ -57,21 +62,15 @@ class BackgroundTaskProcessor:
         logger.info("Background task processor stopped")
     
     async def _process_s3_events(self):
-        """Process S3 events in background (simulating Lambda functionality)"""
-        logger.info("Starting S3 event processor...")
+        """Low-frequency safety-net sweep for objects whose notifications were missed"""
+        logger.info(f"Starting S3 safety-net poll (interval={self.poll_interval}s)...")
         
         while self.running:
             try:
-                # In a real implementation, this would:
-                # 1. Poll SQS for S3 events
-                # 2. Process each event
-                # 3. Handle errors and retries
-                
-                # For now, we'll simulate by checking for new S3 objects
                 await self._check_for_new_s3_objects()
                 
                 # Wait before next check
-                await asyncio.sleep(30)  # Check every 30 seconds
+                await asyncio.sleep(self.poll_interval)
                 
             except asyncio.CancelledError:
                 logger.info("S3 event processor cancelled")
@@ -81,32 +80,32 @@ class BackgroundTaskProcessor:
                 await asyncio.sleep(60)  # Wait longer on error
     
     async def _check_for_new_s3_objects(self):
-        """Check for new S3 objects to process"""
+        """Process objects modified since the previous sweep (all pages, not just the first)"""
         try:
-            # This is a simplified version - in production you'd use SQS
             s3_bucket = os.environ.get('S3_DATA_BUCKET', 'realistic-demo-pretamane-data')
             
-            # List objects in the documents/ prefix
-            response = self.aws_clients.s3_client.list_objects_v2(
-                Bucket=s3_bucket,
-                Prefix='documents/',
-                MaxKeys=10
-            )
+            # Overlap sweeps slightly so objects written during the last listing are not skipped
+            started = datetime.now(timezone.utc)
+            since = self.last_polled - timedelta(seconds=self.poll_overlap)
+            
+            keys = await asyncio.to_thread(self._list_keys_since, s3_bucket, 'documents/', since)
+            for key in keys:
+                await self._process_s3_object(s3_bucket, key)
             
-            if 'Contents' in response:
-                for obj in response['Contents']:
-                    # Check if object was created recently (last 5 minutes)
-                    if self._is_recent_object(obj['LastModified']):
-                        await self._process_s3_object(s3_bucket, obj['Key'])
+            self.last_polled = started
                         
         except Exception as e:
             logger.error(f"Error checking for new S3 objects: {str(e)}")
     
-    def _is_recent_object(self, last_modified) -> bool:
-        """Check if object was created recently"""
-        import datetime
-        now = datetime.datetime.now(datetime.timezone.utc)
-        return (now - last_modified).total_seconds() < 300  # 5 minutes
+    def _list_keys_since(self, bucket: str, prefix: str, since: datetime) -> List[str]:
+        """Keys under a prefix modified after since, across every listing page"""
+        paginator = self.aws_clients.s3_client.get_paginator('list_objects_v2')
+        return [
+            obj['Key']
+            for page in paginator.paginate(Bucket=bucket, Prefix=prefix)
+            for obj in page.get('Contents', [])
+            if obj['LastModified'] > since
+        ]
     
     async def _process_s3_object(self, bucket: str, key: str):
         """Process a single S3 object"""
@@ -153,5 +152,7 @@ class BackgroundTaskProcessor:
         return {
             'running': self.running,
             'active_tasks': len(self.tasks),
+            'poll_interval': self.poll_interval,
+            'last_polled': self.last_polled.isoformat(),
             'timestamp': datetime.utcnow().isoformat() + 'Z'
         }
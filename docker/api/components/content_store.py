@@ -0,0 +1,207 @@
+# Content Store Component - Content-addressed, reference-counted document storage
+import os
+import asyncio
+import logging
+from typing import Dict, Any, Callable, Awaitable, Optional
+from prometheus_client import Counter
+
+from shared.storage_service_minio import MinIOStorageService
+from shared.search_service_meilisearch import MeilisearchService
+from shared.search_batch_indexer import MeilisearchBatchIndexer
+from shared.offload_executor import OffloadExecutor
+from components.storage_ledger import StorageUsageLedger
+
+logger = logging.getLogger(__name__)
+
+content_dedup_total = Counter(
+    'content_dedup_total',
+    'Uploads by deduplication outcome',
+    ['outcome']
+)
+
+content_blobs_collected_total = Counter(
+    'content_blobs_collected_total',
+    'Unreferenced blobs deleted by the garbage collector'
+)
+
+class ContentAddressedStore:
+    """Keeps one object per distinct file under blobs/sha256/{xx}/{hash}.
+
+    An upload is first staged under its own key, where it is hashed. adopt()
+    then copies it to the blob key only if no blob with that hash exists. A
+    duplicate costs just a content_blobs reference and a document row, and
+    reuse_results() gives it the processing output of an earlier copy. The
+    reference is taken by a trigger when the document row is inserted, so an
+    upload whose insert fails leaves none behind and its blob is collected.
+
+    Blobs whose documents are all gone are deleted after a grace period. The
+    collector marks a blob 'deleting' before removing the object, and such a
+    blob cannot gain new references. An upload racing the collector keeps its
+    staged object instead.
+    """
+
+    def __init__(self, db_call: Callable[..., Awaitable[Any]], storage_service: MinIOStorageService,
+                 offload_executor: OffloadExecutor, storage_ledger: StorageUsageLedger,
+                 search_service: MeilisearchService, search_indexer: MeilisearchBatchIndexer):
+        self.db_call = db_call
+        self.storage_service = storage_service
+        self.offload_executor = offload_executor
+        self.storage_ledger = storage_ledger
+        self.search_service = search_service
+        self.search_indexer = search_indexer
+
+        # Configuration (an interval of 0 disables garbage collection)
+        self.gc_interval = float(os.environ.get('BLOB_GC_INTERVAL', '3600'))
+        self.gc_grace_seconds = float(os.environ.get('BLOB_GC_GRACE_SECONDS', '86400'))
+        self.gc_batch_size = int(os.environ.get('BLOB_GC_BATCH_SIZE', '100'))
+
+        self.running = False
+        self.task = None
+
+    @staticmethod
+    def blob_key(sha256: str) -> str:
+        """Object key for a file hash"""
+        return f"blobs/sha256/{sha256[:2]}/{sha256}"
+
+    async def start(self):
+        """Start the blob garbage collector"""
+        if self.running:
+            logger.warning("Content store already running")
+            return
+
+        if self.gc_interval <= 0:
+            logger.info("Content blob garbage collection disabled")
+            return
+
+        self.running = True
+        self.task = asyncio.create_task(self._run())
+        logger.info(f"Content store started (gc_interval={self.gc_interval}s, grace={self.gc_grace_seconds}s)")
+
+    async def stop(self):
+        """Stop the blob garbage collector"""
+        if not self.running:
+            return
+
+        self.running = False
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+        logger.info("Content store stopped")
+
+    async def _run(self):
+        """Collect unreferenced blobs every interval"""
+        while self.running:
+            try:
+                await asyncio.sleep(self.gc_interval)
+                await self.collect_garbage()
+            except asyncio.CancelledError:
+                logger.info("Content store cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error in content store: {str(e)}")
+
+    async def adopt(self, staged_key: str, sha256: str, size: int, content_type: str,
+                    bucket: Optional[str] = None) -> Dict[str, Any]:
+        """Move a staged upload into the blob store, or drop it if the content is already stored.
+
+        Returns the bucket/key the document should point at and whether the
+        upload was a duplicate.
+        """
+        bucket = bucket or self.storage_service.data_bucket
+        key = self.blob_key(sha256)
+
+        existing = await self.db_call('get_content_blob', sha256)
+        if existing and existing['deleting']:
+            return await self._keep_staged(staged_key, size, bucket)
+
+        if not existing:
+            # Same content under a content-addressed key, so racing copies are harmless
+            copied = await self.offload_executor.run(
+                'minio', self.storage_service.copy_file, staged_key, key, bucket, timeout=0
+            )
+            if not copied:
+                return await self._keep_staged(staged_key, size, bucket)
+
+        blob = await self.db_call('register_content_blob', sha256, bucket, key, size, content_type)
+        if not blob:
+            return await self._keep_staged(staged_key, size, bucket)
+
+        if blob['created']:
+            await self.storage_ledger.record_upload(blob['bucket'], size)
+
+        await self.offload_executor.run('minio', self.storage_service.delete_file, staged_key, bucket)
+
+        deduplicated = not blob['created']
+        content_dedup_total.labels(outcome='duplicate' if deduplicated else 'new').inc()
+        if deduplicated:
+            logger.info(f"Deduplicated upload {staged_key} onto {blob['s3_key']}")
+
+        return {'bucket': blob['bucket'], 's3_key': blob['s3_key'], 'deduplicated': deduplicated}
+
+    async def _keep_staged(self, staged_key: str, size: int, bucket: str) -> Dict[str, Any]:
+        """Fall back to storing the upload under its staged key"""
+        content_dedup_total.labels(outcome='fallback').inc()
+        logger.warning(f"Keeping {staged_key} outside the blob store")
+        await self.storage_ledger.record_upload(bucket, size)
+        return {'bucket': bucket, 's3_key': staged_key, 'deduplicated': False}
+
+    async def reuse_results(self, document_data: Dict[str, Any]) -> bool:
+        """Give a duplicate document the processing results and index entry of a completed copy"""
+        if not document_data.get('file_hash'):
+            return False
+
+        reused = await self.db_call('copy_document_results', document_data['id'], document_data['file_hash'])
+        if not reused:
+            return False
+
+        indexed = await self.offload_executor.run(
+            'meilisearch', self.search_service.get_document_by_id, reused['source_id']
+        ) or {}
+
+        await self.search_indexer.enqueue({
+            'id': document_data['id'],
+            'contact_id': document_data['contact_id'],
+            'filename': document_data['filename'],
+            'document_type': document_data['document_type'],
+            'content': indexed.get('content', ''),
+            'text_content': indexed.get('text_content', ''),
+            'upload_timestamp': document_data['upload_timestamp'],
+            'processing_timestamp': reused['processing_timestamp'].isoformat(),
+            'metadata': reused['processing_metadata'] or {},
+            'processing_info': {
+                'status': 'completed',
+                'complexity_score': float(reused['complexity_score'] or 0.0)
+            },
+            's3_metadata': {
+                'bucket': document_data['s3_bucket'],
+                'key': document_data['s3_key'],
+                'size': document_data['size']
+            }
+        })
+
+        logger.info(f"Reused processing results of {reused['source_id']} for {document_data['id']}")
+        return True
+
+    async def collect_garbage(self) -> int:
+        """Delete one batch of blobs that have had no references for the grace period"""
+        blobs = await self.db_call('claim_orphan_blobs', self.gc_grace_seconds, self.gc_batch_size)
+
+        deleted = []
+        for blob in blobs:
+            if await self.storage_ledger.delete_file(blob['s3_key'], blob['bucket']):
+                deleted.append(blob['sha256'])
+
+        if deleted:
+            await self.db_call('delete_content_blobs', deleted)
+            content_blobs_collected_total.inc(len(deleted))
+            logger.info(f"Garbage collected {len(deleted)} content blobs")
+
+        return len(deleted)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get garbage collector status"""
+        return {
+            'running': self.running,
+            'gc_interval': self.gc_interval,
+            'gc_grace_seconds': self.gc_grace_seconds
+        }
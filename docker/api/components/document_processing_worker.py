@@ -0,0 +1,435 @@
+# Document Processing Worker - Claims processing_jobs and analyzes stored documents
+import os
+import time
+import random
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Any, Callable, Awaitable, List, Tuple
+from prometheus_client import Counter, Gauge, Histogram
+
+from shared.storage_service_minio import MinIOStorageService
+from shared.search_batch_indexer import MeilisearchBatchIndexer
+from shared.offload_executor import OffloadExecutor
+from shared.analysis_pool import DocumentAnalysisPool
+from components.keyword_index import KeywordIndex
+from utils.document_processing import DocumentProcessingService, StreamingContentAnalyzer, STREAMABLE_CONTENT_TYPES
+from utils.text_extractors import declared_extractor, EXTRACTOR_VERSION
+
+logger = logging.getLogger(__name__)
+
+processing_jobs_total = Counter(
+    'processing_jobs_total',
+    'Processing jobs handled by outcome',
+    ['outcome']
+)
+
+processing_job_duration_seconds = Histogram(
+    'processing_job_duration_seconds',
+    'Time from claiming a processing job to recording its outcome'
+)
+
+extraction_cache_total = Counter(
+    'extraction_cache_total',
+    'Extraction result cache lookups by outcome',
+    ['outcome']
+)
+
+processing_jobs_in_flight = Gauge(
+    'processing_jobs_in_flight',
+    'Processing jobs currently leased by this process'
+)
+
+# Channel the processing_jobs insert trigger notifies
+JOBS_CHANNEL = 'processing_jobs'
+
+class LeaseLostError(Exception):
+    """Another worker took over the job after its lease expired"""
+
+class DocumentProcessingWorker:
+    """Pool of workers that process documents queued in processing_jobs.
+
+    Each worker leases one job at a time with FOR UPDATE SKIP LOCKED, so any
+    number of workers across API replicas can share the queue. The lease is
+    renewed while the job runs; a crashed worker's job is picked up again once
+    its lease expires. Every lease update is fenced on the attempt number, so
+    a worker that lost its lease cannot overwrite the new owner's outcome.
+
+    Failures are retried with exponential backoff and dead-lettered after
+    max_attempts, at which point the object's documents are marked 'failed'.
+    Workers wake on NOTIFY from the jobs table, on notify() from this process,
+    or after the poll interval. A periodic sweep queues documents that were
+    left pending without a job.
+    """
+
+    def __init__(self, db_call: Callable[..., Awaitable[Any]], storage_service: MinIOStorageService,
+                 offload_executor: OffloadExecutor, search_indexer: MeilisearchBatchIndexer,
+                 analysis_pool: DocumentAnalysisPool, keyword_index: KeywordIndex):
+        self.db_call = db_call
+        self.storage_service = storage_service
+        self.offload_executor = offload_executor
+        self.search_indexer = search_indexer
+        self.analysis_pool = analysis_pool
+        self.keyword_index = keyword_index
+
+        # Configuration (0 workers disables processing in this replica)
+        self.worker_count = int(os.environ.get('PROCESSING_WORKERS', '2'))
+        self.poll_interval = float(os.environ.get('PROCESSING_POLL_INTERVAL', '5'))
+        self.lease_seconds = int(os.environ.get('PROCESSING_LEASE_SECONDS', '120'))
+        self.job_timeout = float(os.environ.get('PROCESSING_JOB_TIMEOUT', '600'))
+        self.max_attempts = int(os.environ.get('PROCESSING_MAX_ATTEMPTS', '5'))
+        self.backoff_base = float(os.environ.get('PROCESSING_BACKOFF_BASE', '10'))
+        self.backoff_max = float(os.environ.get('PROCESSING_BACKOFF_MAX', '3600'))
+        # Objects up to max_bytes are analyzed in memory; larger text is streamed
+        self.max_bytes = int(os.environ.get('PROCESSING_MAX_BYTES', str(10 * 1024 * 1024)))
+        # Formats with an extractor (PDF, Office) cannot be cut short, so up to this much is read whole
+        self.max_extract_bytes = int(os.environ.get('PROCESSING_MAX_EXTRACT_BYTES', str(50 * 1024 * 1024)))
+        self.stream_chunk_bytes = int(os.environ.get('PROCESSING_STREAM_CHUNK_BYTES', str(1024 * 1024)))
+        self.entity_limit = int(os.environ.get('PROCESSING_ENTITY_LIMIT', '1000'))
+        self.preview_chars = int(os.environ.get('PROCESSING_PREVIEW_CHARS', '100000'))
+        self.sweep_interval = float(os.environ.get('PROCESSING_SWEEP_INTERVAL', '300'))
+        self.sweep_min_age = float(os.environ.get('PROCESSING_SWEEP_MIN_AGE', '300'))
+
+        self.running = False
+        self.tasks: List[asyncio.Task] = []
+        self.listener = None
+        self.in_flight = 0
+        self._wakeup = asyncio.Event()
+
+    async def start(self):
+        """Start the workers, the NOTIFY listener and the pending-document sweep"""
+        if self.running:
+            logger.warning("Document processing worker already running")
+            return
+
+        if self.worker_count <= 0:
+            logger.info("Document processing disabled (PROCESSING_WORKERS=0)")
+            return
+
+        self.running = True
+
+        # NOTIFY may arrive on another thread (psycopg2 backend)
+        loop = asyncio.get_running_loop()
+        self.listener = await self.db_call(
+            'listen', JOBS_CHANNEL, lambda payload: loop.call_soon_threadsafe(self._wakeup.set)
+        )
+
+        self.tasks = [asyncio.create_task(self._run(index)) for index in range(self.worker_count)]
+        self.tasks.append(asyncio.create_task(self._sweep()))
+
+        logger.info(f"Document processing worker started (workers={self.worker_count}, "
+                    f"listening={self.listener is not None})")
+
+    async def stop(self):
+        """Stop the workers; leased jobs are retried by whoever claims them next"""
+        if not self.running:
+            return
+
+        self.running = False
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks.clear()
+
+        if self.listener:
+            await self.db_call('unlisten', self.listener)
+            self.listener = None
+
+        logger.info("Document processing worker stopped")
+
+    def notify(self):
+        """Wake the workers immediately after a job is queued"""
+        self._wakeup.set()
+
+    async def _run(self, index: int):
+        """Process jobs until the queue is empty, then wait for a wakeup or the poll interval"""
+        while self.running:
+            try:
+                if await self.process_next():
+                    continue
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+            except asyncio.CancelledError:
+                logger.info(f"Document processing worker {index} cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error in document processing worker {index}: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _sweep(self):
+        """Queue documents that have been pending too long without a job"""
+        while self.running:
+            try:
+                await asyncio.sleep(self.sweep_interval)
+                queued = await self.db_call('enqueue_pending_documents', self.sweep_min_age)
+                if queued:
+                    logger.warning(f"Sweep queued {queued} pending documents without a processing job")
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in pending document sweep: {str(e)}")
+
+    async def process_next(self) -> bool:
+        """Claim and process one job; False if none was due"""
+        jobs = await self.db_call('claim_processing_jobs', 1, self.lease_seconds)
+        if not jobs:
+            return False
+
+        job = jobs[0]
+        started = time.monotonic()
+        self.in_flight += 1
+        processing_jobs_in_flight.inc()
+
+        try:
+            outcome = await self._run_leased(job)
+            if not await self.db_call('complete_processing_job', job['id'], job['attempts']):
+                raise LeaseLostError(f"Lease on job {job['id']} lost before completion")
+            processing_jobs_total.labels(outcome=outcome).inc()
+
+        except LeaseLostError as e:
+            processing_jobs_total.labels(outcome='lease_lost').inc()
+            logger.warning(str(e))
+
+        except Exception as e:
+            await self._schedule_retry(job, e)
+
+        finally:
+            self.in_flight -= 1
+            processing_jobs_in_flight.dec()
+            processing_job_duration_seconds.observe(time.monotonic() - started)
+
+        return True
+
+    async def _run_leased(self, job: Dict[str, Any]) -> str:
+        """Run a job, renewing its lease until it finishes or times out"""
+        work = asyncio.create_task(self.process_object(job['bucket'], job['s3_key']))
+        deadline = time.monotonic() + self.job_timeout
+
+        try:
+            while True:
+                done, _ = await asyncio.wait({work}, timeout=self.lease_seconds / 3)
+                if done:
+                    return work.result()
+
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"Processing exceeded {self.job_timeout}s")
+
+                if not await self.db_call('extend_processing_lease', job['id'], job['attempts'], self.lease_seconds):
+                    raise LeaseLostError(f"Lease on job {job['id']} lost while processing")
+        finally:
+            if not work.done():
+                work.cancel()
+                await asyncio.gather(work, return_exceptions=True)
+
+    async def process_object(self, bucket: str, key: str) -> str:
+        """Analyze one stored object and complete every pending document that points at it.
+
+        Analysis results are cached by file hash, EXTRACTOR_VERSION and the
+        declared content type and file extension (which choose the extractor
+        and shape the output), so the same upload (a re-upload, a retried
+        job) is never read or analyzed twice. Returns the outcome label: 'completed', 'cached',
+        'skipped' (nothing pending) or 'missing' (the object is gone).
+        """
+        documents = [
+            document for document in await self.db_call('get_object_documents', bucket, key)
+            if document['processing_status'] in ('pending', 'processing')
+        ]
+
+        # Objects already processed, or a blob reported before its document
+        # row exists; queuing that document re-arms or reopens the job
+        if not documents:
+            return 'skipped'
+
+        content_type = documents[0]['content_type']
+        filename = documents[0]['filename']
+        file_extension = os.path.splitext(filename)[1].lower()
+
+        file_hash = next((document['file_hash'] for document in documents if document.get('file_hash')), None)
+        cached = await self.db_call(
+            'get_extraction_result', file_hash, EXTRACTOR_VERSION, content_type, file_extension
+        ) if file_hash else None
+        if cached:
+            extraction_cache_total.labels(outcome='hit').inc()
+            text_content = cached['text_content']
+            content = text_content if cached['content'] is None else cached['content']
+            complexity_score = float(cached['complexity_score'] or 0.0)
+
+            for document in documents:
+                await self._complete_document(document, content, text_content, cached['metadata'], complexity_score)
+
+            logger.info(f"Reused cached analysis of s3://{bucket}/{key} for {len(documents)} documents")
+            return 'cached'
+
+        if file_hash:
+            extraction_cache_total.labels(outcome='miss').inc()
+
+        # Other text types only have a prefix analyzed, so at most max_bytes of them is read
+        streamable = content_type in STREAMABLE_CONTENT_TYPES
+        read_limit = self.max_extract_bytes if declared_extractor(content_type, filename) else self.max_bytes
+        opened = await self.offload_executor.run(
+            'minio', self.storage_service.open_object, key, bucket,
+            None if streamable else f"bytes=0-{read_limit - 1}"
+        )
+        if opened['status'] == 404:
+            for document in documents:
+                await self.db_call('update_document_status', document['document_id'], 'failed')
+            logger.error(f"Object s3://{bucket}/{key} is missing; marked {len(documents)} documents failed")
+            return 'missing'
+
+        # MinIO answers a range request on an empty object with 416
+        if opened['status'] == 416:
+            analysis = await self.analysis_pool.analyze(b'', content_type, filename)
+            content = analysis['content']
+        elif opened['status'] in (200, 206):
+            try:
+                if streamable and opened['content_length'] > self.max_bytes:
+                    content, analysis = await self._analyze_stream(opened['body'], filename)
+                else:
+                    data = await self.offload_executor.run('minio', opened['body'].read)
+                    # Decoding, format extraction and scanning are CPU-bound, so they run in the process pool
+                    analysis = await self.analysis_pool.analyze(data, content_type, filename)
+                    content = analysis['content']
+            finally:
+                opened['body'].close()
+        else:
+            raise RuntimeError(f"Unexpected status {opened['status']} reading s3://{bucket}/{key}")
+
+        # Objects are content-addressed, so identical uploads count once in the corpus
+        analysis['metadata']['keywords'] = await self.keyword_index.keywords(
+            f"{bucket}/{key}", analysis['token_counts']
+        )
+
+        metadata = analysis['metadata']
+        complexity_score = DocumentProcessingService.calculate_complexity_score(metadata)
+
+        # A parser failure may be a deployment problem (a missing library), so it is not cached
+        if file_hash and 'extraction_error' not in metadata:
+            await self.db_call(
+                'store_extraction_result', file_hash, EXTRACTOR_VERSION, content_type, file_extension,
+                None if content == analysis['text_content'] else content,
+                analysis['text_content'], metadata, complexity_score
+            )
+
+        for document in documents:
+            await self._complete_document(document, content, analysis['text_content'], metadata, complexity_score)
+
+        logger.info(f"Processed s3://{bucket}/{key} for {len(documents)} documents")
+        return 'completed'
+
+    async def _analyze_stream(self, body, filename: str) -> Tuple[str, Dict[str, Any]]:
+        """Analyze an object chunk by chunk, reading the next chunk while the current one is scanned.
+
+        Memory stays at about two chunks however large the object is. The
+        search index gets the first preview_chars characters. JSON is
+        analyzed as raw text rather than pretty-printed as in the
+        in-memory path.
+        """
+        analyzer = StreamingContentAnalyzer(entity_limit=self.entity_limit, preview_chars=self.preview_chars)
+
+        def read_chunk():
+            return asyncio.ensure_future(self.offload_executor.run('minio', body.read, self.stream_chunk_bytes))
+
+        pending = read_chunk()
+        try:
+            while True:
+                data = await pending
+                if data:
+                    pending = read_chunk()
+
+                for segment in analyzer.feed(data, final=not data):
+                    analyzer.add(await self.analysis_pool.scan(segment, self.entity_limit))
+
+                if not data:
+                    break
+        finally:
+            if not pending.done():
+                pending.cancel()
+                await asyncio.gather(pending, return_exceptions=True)
+
+        return analyzer.preview, {
+            'text_content': analyzer.preview,
+            'metadata': analyzer.metadata(filename),
+            'token_counts': analyzer.token_counts
+        }
+
+    async def _complete_document(self, document: Dict[str, Any], content: str, text_content: str,
+                                 analysis: Dict[str, Any], complexity_score: float):
+        """Store one document's results, index it and enrich its contact"""
+        upload_timestamp = document['upload_timestamp'].isoformat()
+        metadata = dict(
+            analysis,
+            file_extension=os.path.splitext(document['filename'])[1].lower(),
+            filename=document['filename'],
+            size=document['size'],
+            content_type=document['content_type'],
+            document_type=document['document_type'],
+            upload_timestamp=upload_timestamp,
+            processing_status='completed'
+        )
+        # The score counts the file extension, which comes from this document's name
+        if metadata['file_extension'] != analysis.get('file_extension'):
+            complexity_score = DocumentProcessingService.calculate_complexity_score(metadata)
+
+        if not await self.db_call('complete_document_processing', document['document_id'], metadata, complexity_score):
+            raise RuntimeError(f"Failed to store results for document {document['document_id']}")
+
+        await self.search_indexer.enqueue({
+            'id': document['document_id'],
+            'contact_id': document['contact_id'],
+            'filename': document['filename'],
+            'document_type': document['document_type'],
+            'content': content,
+            'text_content': text_content,
+            'upload_timestamp': upload_timestamp,
+            'processing_timestamp': datetime.utcnow().isoformat() + 'Z',
+            'metadata': metadata,
+            'processing_info': {
+                'status': 'completed',
+                'complexity_score': complexity_score
+            },
+            's3_metadata': {
+                'bucket': document['s3_bucket'],
+                'key': document['s3_key'],
+                'size': document['size']
+            }
+        })
+
+        await self.db_call('enrich_contact_data', document['contact_id'], metadata)
+
+    async def _schedule_retry(self, job: Dict[str, Any], error: Exception):
+        """Back off exponentially with jitter; dead-letter after max_attempts"""
+        attempts = job['attempts']
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        delay = delay * random.uniform(0.5, 1.0)
+
+        dead = attempts >= self.max_attempts
+        processing_jobs_total.labels(outcome='dead' if dead else 'retry').inc()
+
+        log = logger.error if dead else logger.warning
+        log(f"Processing job {job['id']} for s3://{job['bucket']}/{job['s3_key']} failed "
+            f"(attempt {attempts}/{self.max_attempts}): {str(error)}")
+
+        recorded = await self.db_call('fail_processing_job', job['id'], attempts,
+                                      str(error) or type(error).__name__, delay, self.max_attempts)
+
+        if dead and recorded:
+            for document in await self.db_call('get_object_documents', job['bucket'], job['s3_key']):
+                if document['processing_status'] in ('pending', 'processing'):
+                    await self.db_call('update_document_status', document['document_id'], 'failed')
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get processing worker status"""
+        return {
+            'running': self.running,
+            'workers': self.worker_count,
+            'in_flight': self.in_flight,
+            'listening': self.listener is not None,
+            'lease_seconds': self.lease_seconds,
+            'max_attempts': self.max_attempts,
+            'timestamp': datetime.utcnow().isoformat() + 'Z'
+        }
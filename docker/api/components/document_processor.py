@@ -4,14 +4,15 @@ import time
 import uuid
 import logging
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from fastapi import UploadFile
 
 from shared.aws_clients import AWSClientManager
 from shared.email_service import EmailService
 from shared.database_service import DatabaseService
 from shared.opensearch_client import OpenSearchService
-from utils.document_processing import DocumentProcessingService
+from utils.document_processing import DocumentProcessingService, StreamingContentAnalyzer, STREAMABLE_CONTENT_TYPES
+from utils.text_extractors import extract_document_text
 from utils.validation import ValidationService
 from models.document import DocumentUpload, DocumentResponse, SearchRequest, SearchResponse, DocumentRecord
 from models.contact import ContactRecord
@@ -36,6 +37,9 @@ class DocumentProcessor:
             # Image formats
             '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg', '.tiff', '.tif'
         }
+        # Text objects larger than this are analyzed as a stream
+        self.STREAM_THRESHOLD = 10 * 1024 * 1024  # 10MB
+        self.STREAM_CHUNK_SIZE = 1024 * 1024
         self.UPLOAD_DIR = "/mnt/efs/uploads"
         self.PROCESSED_DIR = "/mnt/efs/processed"
     
@@ -140,8 +144,8 @@ class DocumentProcessor:
             
             # Get object from S3
             response = self.aws_clients.s3_client.get_object(Bucket=bucket, Key=key)
-            content = response['Body'].read().decode('utf-8')
             content_type = response.get('ContentType', 'application/octet-stream')
+            filename = os.path.basename(key)
             
             # Extract metadata from S3 object metadata
             s3_metadata = response.get('Metadata', {})
@@ -149,12 +153,19 @@ class DocumentProcessor:
             document_type = s3_metadata.get('document_type', 'unknown')
             upload_timestamp = s3_metadata.get('upload_timestamp', datetime.utcnow().isoformat())
             
-            # Extract text content
-            text_content = DocumentProcessingService.extract_text_from_content(content, content_type)
-            
-            # Extract metadata
-            filename = os.path.basename(key)
-            document_metadata = DocumentProcessingService.extract_metadata_from_content(text_content, filename)
+            if content_type in STREAMABLE_CONTENT_TYPES and response['ContentLength'] > self.STREAM_THRESHOLD:
+                # Large text is analyzed chunk by chunk; only a preview is kept for indexing
+                content, document_metadata = self._analyze_stream(response['Body'], filename)
+                text_content = content
+            else:
+                # Extract text content (binary formats through their extractor, not UTF-8 decoding)
+                extracted = extract_document_text(response['Body'].read(), content_type, filename)
+                content = extracted['content']
+                text_content = extracted['text_content']
+                
+                # Extract metadata
+                document_metadata = DocumentProcessingService.extract_metadata_from_content(text_content, filename)
+                document_metadata['extractor'] = extracted['extractor']
             
             # Add S3 metadata
             document_metadata.update({
@@ -256,6 +267,18 @@ class DocumentProcessor:
                 'enhanced_processing': True
             }
     
+    def _analyze_stream(self, body, filename: str) -> Tuple[str, Dict[str, Any]]:
+        """Analyze a streaming S3 body in bounded memory; returns (preview, metadata)"""
+        analyzer = StreamingContentAnalyzer()
+        
+        for chunk in body.iter_chunks(self.STREAM_CHUNK_SIZE):
+            for segment in analyzer.feed(chunk):
+                analyzer.add(DocumentProcessingService.scan_content(segment))
+        for segment in analyzer.feed(b'', final=True):
+            analyzer.add(DocumentProcessingService.scan_content(segment))
+        
+        return analyzer.preview, analyzer.metadata(filename)
+    
     async def search_documents(self, search_request: SearchRequest) -> SearchResponse:
         """Search documents with advanced filtering (from enhanced_app.py)"""
         try:
@@ -0,0 +1,170 @@
+# Email Outbox Worker - Delivers notification emails written to the email_outbox table
+import os
+import random
+import asyncio
+import logging
+from typing import Dict, Any, Callable, Awaitable
+from datetime import datetime
+from prometheus_client import Counter, Gauge
+
+from shared.email_service import EmailService
+from shared.offload_executor import OffloadExecutor
+
+logger = logging.getLogger(__name__)
+
+outbox_messages_total = Counter(
+    'email_outbox_messages_total',
+    'Outbox messages processed by outcome',
+    ['event_type', 'outcome']
+)
+
+outbox_last_batch_size = Gauge(
+    'email_outbox_last_batch_size',
+    'Number of messages claimed in the last outbox batch'
+)
+
+class EmailOutboxWorker:
+    """Background sender that drains email_outbox with batching, retries and backoff.
+
+    Several API workers can run this concurrently; claim_outbox_messages uses
+    FOR UPDATE SKIP LOCKED with a lease so a message is sent by one worker at
+    a time, and an expired lease is picked up again after a crash.
+    """
+
+    def __init__(self, db_call: Callable[..., Awaitable[Any]], email_service: EmailService,
+                 offload_executor: OffloadExecutor):
+        self.db_call = db_call
+        self.email_service = email_service
+        self.offload_executor = offload_executor
+
+        # Configuration
+        self.batch_size = int(os.environ.get('OUTBOX_BATCH_SIZE', '20'))
+        self.poll_interval = float(os.environ.get('OUTBOX_POLL_INTERVAL', '5'))
+        self.lease_seconds = int(os.environ.get('OUTBOX_LEASE_SECONDS', '60'))
+        self.max_attempts = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '8'))
+        self.backoff_base = float(os.environ.get('OUTBOX_BACKOFF_BASE', '5'))
+        self.backoff_max = float(os.environ.get('OUTBOX_BACKOFF_MAX', '3600'))
+
+        # Map outbox event types to EmailService senders
+        self.handlers = {
+            'contact_notification': self.email_service.send_contact_notification,
+        }
+
+        self.running = False
+        self.task = None
+        self._wakeup = asyncio.Event()
+
+    async def start(self):
+        """Start the outbox drain loop"""
+        if self.running:
+            logger.warning("Email outbox worker already running")
+            return
+
+        self.running = True
+        self.task = asyncio.create_task(self._run())
+        logger.info("Email outbox worker started")
+
+    async def stop(self):
+        """Stop the outbox drain loop"""
+        if not self.running:
+            return
+
+        self.running = False
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+        logger.info("Email outbox worker stopped")
+
+    def notify(self):
+        """Wake the worker immediately after a new message is committed"""
+        self._wakeup.set()
+
+    async def _run(self):
+        """Drain due messages, then sleep until notified or the poll interval passes"""
+        while self.running:
+            try:
+                claimed = await self.drain_once()
+
+                # A full batch means there is probably more waiting
+                if claimed >= self.batch_size:
+                    continue
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+            except asyncio.CancelledError:
+                logger.info("Email outbox worker cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error in email outbox worker: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def drain_once(self) -> int:
+        """Claim one batch, send it concurrently and record the outcomes"""
+        messages = await self.db_call('claim_outbox_messages', self.batch_size, self.lease_seconds)
+        outbox_last_batch_size.set(len(messages))
+
+        if not messages:
+            return 0
+
+        results = await asyncio.gather(
+            *(self._send(message) for message in messages),
+            return_exceptions=True
+        )
+
+        sent_ids = []
+        for message, result in zip(messages, results):
+            if result is True:
+                sent_ids.append(message['id'])
+                outbox_messages_total.labels(event_type=message['event_type'], outcome='sent').inc()
+            else:
+                await self._schedule_retry(message, result)
+
+        if sent_ids:
+            await self.db_call('mark_outbox_sent', sent_ids)
+
+        logger.info(f"Email outbox batch: {len(sent_ids)}/{len(messages)} sent")
+        return len(messages)
+
+    async def _send(self, message: Dict[str, Any]) -> bool:
+        """Deliver one message through the SES offload pool"""
+        handler = self.handlers.get(message['event_type'])
+        if handler is None:
+            raise ValueError(f"Unknown outbox event type: {message['event_type']}")
+
+        response = await self.offload_executor.run('ses', handler, **message['payload'])
+
+        # EmailService returns None when SES rejects the message
+        if response is None:
+            raise RuntimeError("SES did not accept the message")
+        return True
+
+    async def _schedule_retry(self, message: Dict[str, Any], error: Any):
+        """Back off exponentially with jitter; dead-letter after max_attempts"""
+        attempts = message['attempts']
+        delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+        delay = delay * random.uniform(0.5, 1.0)
+
+        dead = attempts >= self.max_attempts
+        outbox_messages_total.labels(
+            event_type=message['event_type'],
+            outcome='dead' if dead else 'retry'
+        ).inc()
+
+        log = logger.error if dead else logger.warning
+        log(f"Outbox message {message['id']} failed (attempt {attempts}/{self.max_attempts}): {str(error)}")
+
+        await self.db_call('mark_outbox_failed', message['id'], str(error) or type(error).__name__,
+                           delay, self.max_attempts)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get outbox worker status"""
+        return {
+            'running': self.running,
+            'batch_size': self.batch_size,
+            'max_attempts': self.max_attempts,
+            'timestamp': datetime.utcnow().isoformat() + 'Z'
+        }
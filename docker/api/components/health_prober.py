@@ -0,0 +1,147 @@
+# Health Prober Component - Refreshes dependency health in the background
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Callable, Awaitable, List, Optional
+from datetime import datetime, timezone
+from prometheus_client import Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+dependency_up = Gauge(
+    'dependency_up',
+    'Whether the last background probe of a dependency succeeded',
+    ['service']
+)
+
+dependency_probe_duration_seconds = Histogram(
+    'dependency_probe_duration_seconds',
+    'Background dependency probe latency',
+    ['service']
+)
+
+class HealthProber:
+    """Probes each dependency on an interval and keeps the latest result in memory.
+
+    Health endpoints read the snapshot instead of calling the backends, so
+    load-balancer and blackbox probes cost nothing downstream. A probe is an
+    async callable returning a dict with at least a 'status' key
+    ('connected' means healthy); anything it raises is reported as an error.
+    """
+
+    def __init__(self):
+        self.interval = float(os.environ.get('HEALTH_PROBE_INTERVAL', '10'))
+        self.timeout = float(os.environ.get('HEALTH_PROBE_TIMEOUT', '5'))
+        # A snapshot older than this is treated as unknown by /readyz
+        self.max_age = float(os.environ.get('HEALTH_MAX_AGE', str(self.interval * 3)))
+        self.required = [
+            name.strip() for name in
+            os.environ.get('HEALTH_REQUIRED_SERVICES', 'postgresql,meilisearch,minio').split(',')
+            if name.strip()
+        ]
+
+        self.probes: Dict[str, Callable[[], Awaitable[Dict[str, Any]]]] = {}
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+        self.running = False
+        self.task = None
+
+    def register(self, name: str, probe: Callable[[], Awaitable[Dict[str, Any]]]):
+        """Register a dependency probe"""
+        self.probes[name] = probe
+
+    async def start(self):
+        """Run one probe round, then keep refreshing in the background"""
+        if self.running:
+            logger.warning("Health prober already running")
+            return
+
+        self.running = True
+        await self.probe_all()
+        self.task = asyncio.create_task(self._run())
+        logger.info(f"Health prober started (interval={self.interval}s, required={self.required})")
+
+    async def stop(self):
+        """Stop the background probe loop"""
+        if not self.running:
+            return
+
+        self.running = False
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+        logger.info("Health prober stopped")
+
+    async def _run(self):
+        """Refresh all probes every interval"""
+        while self.running:
+            try:
+                await asyncio.sleep(self.interval)
+                await self.probe_all()
+            except asyncio.CancelledError:
+                logger.info("Health prober cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error in health prober: {str(e)}")
+
+    async def probe_all(self):
+        """Probe every dependency concurrently"""
+        await asyncio.gather(*(self._probe(name, probe) for name, probe in self.probes.items()))
+
+    async def _probe(self, name: str, probe: Callable[[], Awaitable[Dict[str, Any]]]):
+        """Run one probe with a timeout and record its outcome"""
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(probe(), self.timeout)
+        except asyncio.TimeoutError:
+            result = {'status': f"error: probe timed out after {self.timeout}s"}
+        except Exception as e:
+            result = {'status': f"error: {str(e)}"}
+
+        latency = time.monotonic() - started
+        healthy = result.get('status') == 'connected'
+
+        self.results[name] = {
+            **result,
+            'healthy': healthy,
+            'latency_ms': round(latency * 1000, 2),
+            'checked_at': time.time()
+        }
+
+        dependency_up.labels(service=name).set(1 if healthy else 0)
+        dependency_probe_duration_seconds.labels(service=name).observe(latency)
+
+        if not healthy:
+            logger.warning(f"Health probe for {name} failed: {result.get('status')}")
+
+    def age(self, name: str) -> Optional[float]:
+        """Seconds since the dependency was last probed"""
+        result = self.results.get(name)
+        return time.time() - result['checked_at'] if result else None
+
+    def failing(self) -> List[str]:
+        """Required dependencies that are unhealthy or have no fresh result"""
+        failing = []
+        for name in self.required:
+            age = self.age(name)
+            if age is None or age > self.max_age or not self.results[name]['healthy']:
+                failing.append(name)
+        return failing
+
+    def is_ready(self) -> bool:
+        """Whether every required dependency has a fresh, healthy result"""
+        return not self.failing()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Cached probe results with their age"""
+        return {
+            name: {
+                'status': result['status'],
+                'healthy': result['healthy'],
+                'latency_ms': result['latency_ms'],
+                'age_seconds': round(time.time() - result['checked_at'], 2),
+                'checked_at': datetime.fromtimestamp(result['checked_at'], timezone.utc).isoformat()
+            }
+            for name, result in self.results.items()
+        }
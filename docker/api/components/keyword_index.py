@@ -0,0 +1,179 @@
+# Keyword Index Component - TF-IDF keyword scoring against corpus document frequencies
+import os
+import time
+import asyncio
+import logging
+from collections import Counter
+from typing import Dict, Any, Callable, Awaitable, List, Optional
+from datetime import datetime
+import numpy as np
+from prometheus_client import Counter as MetricCounter, Gauge
+
+logger = logging.getLogger(__name__)
+
+keyword_index_refreshes_total = MetricCounter(
+    'keyword_index_refreshes_total',
+    'Document frequency snapshot refreshes by outcome',
+    ['outcome']
+)
+
+keyword_index_terms = Gauge(
+    'keyword_index_terms',
+    'Terms held in the in-memory document frequency snapshot'
+)
+
+# keyword_document_frequency.term is VARCHAR(64)
+MAX_TERM_LENGTH = 64
+
+class KeywordIndex:
+    """Scores document keywords by TF-IDF against the corpus in keyword_document_frequency.
+
+    Each processed object adds its distinct terms to the table once
+    (record_document_terms is idempotent per document key). Scoring reads an
+    in-memory snapshot of the table, refreshed every refresh_interval and
+    bumped locally for the documents this process records in between, so it
+    never waits on the database. Terms in fewer than snapshot_min_count
+    documents are left out of the snapshot and scored as if seen once.
+
+    score = (1 + ln tf) * (ln((N + 1) / (df + 1)) + 1), over terms that occur
+    at least min_term_count times, so a word common to every document ranks
+    below a rarer one used as often.
+    """
+
+    def __init__(self, db_call: Callable[..., Awaitable[Any]]):
+        self.db_call = db_call
+
+        # Configuration
+        self.refresh_interval = float(os.environ.get('KEYWORD_DF_REFRESH_INTERVAL', '300'))
+        self.snapshot_min_count = int(os.environ.get('KEYWORD_DF_SNAPSHOT_MIN_COUNT', '2'))
+        self.limit = int(os.environ.get('KEYWORD_LIMIT', '10'))
+        self.min_term_count = int(os.environ.get('KEYWORD_MIN_TERM_COUNT', '2'))
+
+        # Snapshot: corpus size and term -> document frequency
+        self.document_count = 0
+        self.frequencies: Dict[str, int] = {}
+        self.refreshed_at: Optional[float] = None
+
+        self.running = False
+        self.task = None
+
+    async def start(self):
+        """Load the first snapshot, then keep refreshing it in the background"""
+        if self.running:
+            logger.warning("Keyword index already running")
+            return
+
+        self.running = True
+        await self.refresh()
+        self.task = asyncio.create_task(self._run())
+        logger.info(f"Keyword index started (documents={self.document_count}, terms={len(self.frequencies)})")
+
+    async def stop(self):
+        """Stop the refresh loop"""
+        if not self.running:
+            return
+
+        self.running = False
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+        logger.info("Keyword index stopped")
+
+    async def _run(self):
+        """Refresh the snapshot every interval"""
+        while self.running:
+            try:
+                await asyncio.sleep(self.refresh_interval)
+                await self.refresh()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in keyword index refresh loop: {str(e)}")
+
+    async def refresh(self) -> bool:
+        """Replace the snapshot with the current table; the old one is kept on failure"""
+        snapshot = await self.db_call('get_keyword_document_frequencies', self.snapshot_min_count)
+        if snapshot is None:
+            keyword_index_refreshes_total.labels(outcome='error').inc()
+            return False
+
+        self.document_count = snapshot['document_count']
+        self.frequencies = snapshot['frequencies']
+        self.refreshed_at = time.time()
+
+        keyword_index_refreshes_total.labels(outcome='success').inc()
+        keyword_index_terms.set(len(self.frequencies))
+        return True
+
+    async def record(self, document_key: str, token_counts: Counter) -> bool:
+        """Count one document's terms in the corpus; False if already counted or on error"""
+        terms = [term for term in token_counts if len(term) <= MAX_TERM_LENGTH]
+        if not await self.db_call('record_document_terms', document_key, terms):
+            return False
+
+        # Keep the snapshot current until the next refresh replaces it
+        self.document_count += 1
+        frequencies = self.frequencies
+        for term in terms:
+            if term in frequencies:
+                frequencies[term] += 1
+
+        return True
+
+    async def keywords(self, document_key: str, token_counts: Counter) -> List[str]:
+        """Record a document in the corpus and return its top keywords"""
+        await self.record(document_key, token_counts)
+        return self.score_batch([token_counts])[0]
+
+    def score_batch(self, documents: List[Counter], limit: Optional[int] = None) -> List[List[str]]:
+        """Top keywords for many documents' term counts at once (e.g. to rescore a backfill).
+
+        All candidate terms are scored in one vectorized pass and ranked per
+        document by score, then first occurrence.
+        """
+        limit = self.limit if limit is None else limit
+        terms: List[str] = []
+        counts: List[int] = []
+        owners: List[int] = []
+
+        for index, token_counts in enumerate(documents):
+            for term, count in token_counts.items():
+                if count >= self.min_term_count:
+                    terms.append(term)
+                    counts.append(count)
+                    owners.append(index)
+
+        results: List[List[str]] = [[] for _ in documents]
+        if not terms or limit <= 0:
+            return results
+
+        frequencies = self.frequencies
+        tf = np.array(counts, dtype=np.float64)
+        # A term the snapshot lacks has been counted at most a few times; 1 covers the document itself
+        df = np.fromiter((frequencies.get(term, 1) for term in terms), dtype=np.float64, count=len(terms))
+        owner = np.array(owners, dtype=np.int64)
+
+        n = max(self.document_count, int(df.max()))
+        scores = (1.0 + np.log(tf)) * (np.log((n + 1.0) / (df + 1.0)) + 1.0)
+
+        # Last key is primary: document, then descending score, then first-seen position
+        order = np.lexsort((np.arange(len(terms)), -scores, owner))
+        sorted_owner = owner[order]
+        group_start = np.searchsorted(sorted_owner, sorted_owner, side='left')
+        rank = np.arange(len(order)) - group_start
+
+        for position in order[rank < limit].tolist():
+            results[owners[position]].append(terms[position])
+
+        return results
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get keyword index status"""
+        return {
+            'running': self.running,
+            'document_count': self.document_count,
+            'terms': len(self.frequencies),
+            'refresh_interval': self.refresh_interval,
+            'refreshed_at': datetime.utcfromtimestamp(self.refreshed_at).isoformat() + 'Z' if self.refreshed_at else None,
+            'timestamp': datetime.utcnow().isoformat() + 'Z'
+        }
@@ -0,0 +1,189 @@
+# Storage Ledger Component - Keeps the storage_usage ledger in step with MinIO
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Callable, Awaitable, List, Optional
+from prometheus_client import Gauge, Histogram
+
+from shared.storage_service_minio import MinIOStorageService
+from shared.offload_executor import OffloadExecutor
+from shared.storage_usage import usage_deltas
+
+logger = logging.getLogger(__name__)
+
+storage_ledger_drift_bytes = Gauge(
+    'storage_ledger_drift_bytes',
+    'Bytes the ledger was off by at the last reconciliation (scan minus ledger)',
+    ['bucket']
+)
+
+storage_reconcile_duration_seconds = Histogram(
+    'storage_reconcile_duration_seconds',
+    'Time to scan a bucket and correct its ledger rows',
+    ['bucket']
+)
+
+# Advisory lock held by the one process reconciling at a time
+RECONCILE_LOCK = 'storage_ledger_reconcile'
+
+class StorageUsageLedger:
+    """Records every upload/delete in the storage ledger and periodically reconciles it.
+
+    Bucket totals follow stored objects; contact totals follow document rows
+    (a database trigger keeps them), since content-addressed blob keys no
+    longer name a contact. Reads are a single-row lookup per bucket or
+    contact. The reconciliation job lists each bucket with the S3 paginator,
+    recounts the contacts from the documents table and corrects drift from
+    failed ledger writes or out-of-band changes. Only the process holding
+    an advisory lock reconciles, and the scan is applied as the difference
+    from the ledger snapshot read before it, so uploads and deletes recorded
+    during the scan are kept. An object that lands while its bucket is being
+    scanned may still be counted twice or not at all until the next run.
+    """
+
+    def __init__(self, db_call: Callable[..., Awaitable[Any]], storage_service: MinIOStorageService,
+                 offload_executor: OffloadExecutor):
+        self.db_call = db_call
+        self.storage_service = storage_service
+        self.offload_executor = offload_executor
+
+        # Configuration (0 disables the periodic job)
+        self.reconcile_interval = float(os.environ.get('STORAGE_RECONCILE_INTERVAL', '3600'))
+
+        self.running = False
+        self.task = None
+        self.last_reconciled: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def buckets(self) -> List[str]:
+        return [self.storage_service.data_bucket, self.storage_service.backup_bucket]
+
+    async def start(self):
+        """Start the reconciliation loop (the first run happens immediately)"""
+        if self.running:
+            logger.warning("Storage ledger already running")
+            return
+
+        if self.reconcile_interval <= 0:
+            logger.info("Storage ledger reconciliation disabled")
+            return
+
+        self.running = True
+        self.task = asyncio.create_task(self._run())
+        logger.info(f"Storage ledger started (reconcile_interval={self.reconcile_interval}s)")
+
+    async def stop(self):
+        """Stop the reconciliation loop"""
+        if not self.running:
+            return
+
+        self.running = False
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        self.task = None
+        logger.info("Storage ledger stopped")
+
+    async def _run(self):
+        """Reconcile every bucket, then wait for the next interval"""
+        while self.running:
+            try:
+                await self.reconcile_all()
+                await asyncio.sleep(self.reconcile_interval)
+            except asyncio.CancelledError:
+                logger.info("Storage ledger cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error in storage ledger: {str(e)}")
+                await asyncio.sleep(self.reconcile_interval)
+
+    async def record_upload(self, bucket: str, size: int) -> bool:
+        """Add a stored object to its bucket's ledger total"""
+        return await self.db_call('record_storage_usage', bucket, size, 1)
+
+    async def delete_file(self, key: str, bucket: Optional[str] = None) -> bool:
+        """Delete an object from MinIO and remove it from the ledger"""
+        bucket = bucket or self.storage_service.data_bucket
+
+        metadata = await self.offload_executor.run('minio', self.storage_service.get_file_metadata, key, bucket)
+        deleted = await self.offload_executor.run('minio', self.storage_service.delete_file, key, bucket)
+
+        if deleted and metadata:
+            await self.db_call('record_storage_usage', bucket, -metadata['size'], -1)
+
+        return deleted
+
+    async def get_usage(self) -> Dict[str, Dict[str, Any]]:
+        """Per-bucket totals for every known bucket (zeros if not yet recorded)"""
+        usage = await self.db_call('get_storage_usage')
+        return {
+            bucket: usage.get(bucket, {
+                'bucket': bucket,
+                'total_size_bytes': 0,
+                'total_size_mb': 0.0,
+                'file_count': 0,
+                'last_reconciled': None
+            })
+            for bucket in self.buckets
+        }
+
+    async def reconcile_all(self) -> bool:
+        """Reconcile each bucket in turn, unless another process already is"""
+        lock = await self.db_call('try_advisory_lock', RECONCILE_LOCK)
+        if not lock:
+            logger.info("Storage ledger reconciliation is running elsewhere; skipped")
+            return False
+
+        try:
+            for bucket in self.buckets:
+                await self.reconcile_bucket(bucket)
+            return True
+        finally:
+            await self.db_call('advisory_unlock', lock)
+
+    async def reconcile_bucket(self, bucket: str) -> bool:
+        """Correct one bucket's ledger rows from a full listing (call with the reconcile lock held)"""
+        started = time.monotonic()
+        try:
+            ledger = await self.db_call('get_bucket_storage_snapshot', bucket)
+            if ledger is None:
+                return False
+
+            # Listing a large bucket takes many pages; no per-call timeout applies
+            usage = await self.offload_executor.run('minio', self.storage_service.scan_usage, bucket, timeout=0)
+
+            drift = usage['total_bytes'] - ledger['total']['total_bytes']
+
+            if not await self.db_call(
+                'apply_storage_reconciliation', bucket, drift,
+                usage['object_count'] - ledger['total']['object_count'],
+                usage_deltas(ledger['contacts'], ledger['documents'])
+            ):
+                return False
+
+            storage_ledger_drift_bytes.labels(bucket=bucket).set(drift)
+
+            duration = time.monotonic() - started
+            storage_reconcile_duration_seconds.labels(bucket=bucket).observe(duration)
+
+            self.last_reconciled[bucket] = {
+                'at': time.time(),
+                'duration_seconds': round(duration, 2),
+                'drift_bytes': drift
+            }
+
+            if drift:
+                logger.warning(f"Storage ledger for {bucket} was off by {drift} bytes; reconciled")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error reconciling storage ledger for {bucket}: {str(e)}")
+            return False
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get reconciliation status"""
+        return {
+            'running': self.running,
+            'reconcile_interval': self.reconcile_interval,
+            'last_reconciled': self.last_reconciled
+        }
@@ -21,6 +21,41 @@ class DocumentResponse(BaseModel):
     contact_id: str
     s3_path: str
 
+class UploadUrlRequest(BaseModel):
+    """Request for a presigned direct-to-storage upload"""
+    contact_id: str = Field(..., description="Associated contact ID")
+    filename: str = Field(..., min_length=1, max_length=255, description="Original file name")
+    size: int = Field(..., ge=0, description="File size in bytes (selects PUT or multipart)")
+    content_type: Optional[str] = Field(None, description="MIME type the client will upload with")
+    document_type: str = Field(..., description="Type of document (proposal, contract, etc.)")
+    sha256: Optional[str] = Field(None, pattern=r'^[0-9a-fA-F]{64}$', description="Hex SHA-256 for storage-side verification (single PUT only)")
+
+class UploadUrlResponse(BaseModel):
+    """Presigned upload instructions"""
+    document_id: str
+    s3_key: str
+    method: str = Field(..., description="'PUT' or 'multipart'")
+    url: Optional[str] = Field(None, description="PUT URL (method 'PUT')")
+    headers: Dict[str, str] = Field(default={}, description="Headers that must be sent with the PUT")
+    upload_id: Optional[str] = Field(None, description="Multipart upload ID (method 'multipart')")
+    part_size: Optional[int] = Field(None, description="Bytes per part; the last part may be smaller")
+    parts: List[Dict[str, Any]] = Field(default=[], description="part_number/url pairs (method 'multipart')")
+    expires_in: int
+
+class UploadedPart(BaseModel):
+    """One uploaded multipart part"""
+    part_number: int = Field(..., ge=1, le=10000)
+    etag: str = Field(..., description="ETag header returned by the part upload")
+
+class UploadCompleteRequest(BaseModel):
+    """Completion of a presigned upload"""
+    contact_id: str = Field(..., description="Contact ID the upload URL was issued for")
+    filename: str = Field(..., min_length=1, max_length=255, description="File name the upload URL was issued for")
+    description: Optional[str] = Field(None, description="Document description")
+    tags: Optional[List[str]] = Field(default=[], description="Document tags")
+    upload_id: Optional[str] = Field(None, description="Multipart upload ID (multipart only)")
+    parts: Optional[List[UploadedPart]] = Field(None, description="Uploaded parts (multipart only)")
+
 class SearchRequest(BaseModel):
     """Search request model (from enhanced_app.py)"""
     query: str = Field(..., min_length=1, description="Search query")
@@ -0,0 +1,254 @@
+# Analysis Pool - Runs CPU-bound document analysis in worker processes
+import os
+import time
+import signal
+import resource
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, List, Union
+from prometheus_client import Counter, Gauge, Histogram
+
+from utils.document_processing import DocumentProcessingService
+from utils.text_extractors import extract_document_text
+
+logger = logging.getLogger(__name__)
+
+analysis_tasks_total = Counter(
+    'document_analysis_tasks_total',
+    'Document analysis tasks by outcome',
+    ['outcome']
+)
+
+analysis_duration_seconds = Histogram(
+    'document_analysis_duration_seconds',
+    'Time from submitting an analysis task to receiving its result',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+
+analysis_in_flight = Gauge(
+    'document_analysis_in_flight',
+    'Analysis tasks submitted to the process pool and not yet finished'
+)
+
+class AnalysisTimeoutError(TimeoutError):
+    """Raised when one analysis task exceeds the per-task time limit"""
+
+class AnalysisPoolSaturatedError(RuntimeError):
+    """Raised when too many analysis tasks are already waiting"""
+
+def _raise_time_limit(signum, frame):
+    raise AnalysisTimeoutError("Analysis time limit exceeded")
+
+def _raise_cpu_limit(signum, frame):
+    raise AnalysisTimeoutError("Analysis CPU time limit exceeded")
+
+def _init_worker(memory_limit: int):
+    """Per-process setup: ignore Ctrl-C (the parent handles it), arm the limit
+    handlers, cap the address space and run every pattern once so the first
+    task pays no setup"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGALRM, _raise_time_limit)
+    signal.signal(signal.SIGXCPU, _raise_cpu_limit)
+    if memory_limit > 0:
+        # Allocations past the cap raise MemoryError in the task instead of waking the OOM killer
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, resource.getrlimit(resource.RLIMIT_AS)[1]))
+    DocumentProcessingService.extract_metadata_from_content('warm-up a@b.co 555-123-4567 http://x.io', 'warm-up.txt')
+
+@contextmanager
+def _task_limits(time_limit: float, cpu_limit: int):
+    """Bound one task by wall-clock time (SIGALRM) and CPU time (SIGXCPU).
+
+    RLIMIT_CPU counts the whole process, so the soft limit is set relative
+    to the CPU time already used and lifted again afterwards.
+    """
+    hard = resource.getrlimit(resource.RLIMIT_CPU)[1]
+    if cpu_limit > 0:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime) + cpu_limit
+        resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+    signal.setitimer(signal.ITIMER_REAL, time_limit)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        if cpu_limit > 0:
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+def analyze_document(data: bytes, content_type: str, filename: str, max_chars: int,
+                     time_limit: float, cpu_limit: int) -> Dict[str, Any]:
+    """Extract text and content metadata from a stored file (runs in a pool worker).
+
+    Binary formats go through their registered extractor; text beyond
+    max_chars is dropped. The task is stopped with AnalysisTimeoutError past
+    time_limit seconds or cpu_limit CPU seconds; the regex engine and the
+    pure-Python parsers check for signals, so this also stops a runaway
+    match or a pathological file.
+    """
+    with _task_limits(time_limit, cpu_limit):
+        extracted = extract_document_text(data, content_type, filename, max_chars)
+        scan = DocumentProcessingService.scan_content(extracted['text_content'])
+
+    metadata = DocumentProcessingService.metadata_from_scan(scan, filename)
+    metadata['extractor'] = extracted['extractor']
+    if 'extraction_error' in extracted:
+        metadata['extraction_error'] = extracted['extraction_error']
+
+    return {
+        'content': extracted['content'],
+        'text_content': extracted['text_content'],
+        'metadata': metadata,
+        # Term frequencies for corpus-aware keyword scoring in the parent
+        'token_counts': scan['token_counts'],
+        'truncated': extracted['truncated']
+    }
+
+def scan_segment(text: str, entity_limit: int, time_limit: float, cpu_limit: int) -> Dict[str, Any]:
+    """scan_content() one segment of a streamed document (runs in a pool worker).
+
+    Entity lists are cut to entity_limit so a segment full of matches stays
+    small on the way back to the parent.
+    """
+    with _task_limits(time_limit, cpu_limit):
+        scan = DocumentProcessingService.scan_content(text)
+
+    scan['entities'] = {name: found[:entity_limit] for name, found in scan['entities'].items()}
+    return scan
+
+class DocumentAnalysisPool:
+    """Process pool for document analysis, so regex-heavy scans neither block
+    the event loop nor hold the GIL that request handling needs.
+
+    Workers are spawned (not forked from a process running threads), compile
+    the patterns once, and are replaced after ANALYSIS_MAX_TASKS_PER_CHILD
+    tasks. A worker that dies (e.g. OOM-killed) breaks the pool; it is then
+    rebuilt and the affected tasks fail.
+    """
+
+    def __init__(self):
+        self.max_workers = int(os.environ.get('ANALYSIS_WORKERS', str(min(4, os.cpu_count() or 1))))
+        self.max_queue = int(os.environ.get('ANALYSIS_MAX_QUEUE', '64'))
+        self.max_chars = int(os.environ.get('ANALYSIS_MAX_CHARS', str(10 * 1024 * 1024)))
+        self.time_limit = float(os.environ.get('ANALYSIS_TIME_LIMIT', '30'))
+        # Per-task CPU seconds and per-process address space (bytes); 0 disables either
+        self.cpu_limit = int(os.environ.get('ANALYSIS_CPU_LIMIT', str(int(self.time_limit))))
+        self.memory_limit = int(os.environ.get('ANALYSIS_MEMORY_LIMIT', str(1024 * 1024 * 1024)))
+        self.max_tasks_per_child = int(os.environ.get('ANALYSIS_MAX_TASKS_PER_CHILD', '500'))
+
+        self.in_flight = 0
+        # Tasks wait here rather than in the pool, so the backstop timeout only covers running time
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self.pool = self._create_pool()
+
+        logger.info(f"Analysis pool: workers={self.max_workers}, time_limit={self.time_limit}s, "
+                    f"cpu_limit={self.cpu_limit}s, memory_limit={self.memory_limit}, max_chars={self.max_chars}")
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(self.memory_limit,),
+            max_tasks_per_child=self.max_tasks_per_child
+        )
+
+    async def analyze(self, data: bytes, content_type: str, filename: str) -> Dict[str, Any]:
+        """Analyze one stored file in the pool.
+
+        Returns {'content', 'text_content', 'metadata', 'token_counts',
+        'truncated'}. Raises AnalysisTimeoutError past the time or CPU
+        limit, MemoryError past the memory limit and
+        AnalysisPoolSaturatedError when the queue is full.
+        """
+        return await self._submit(
+            filename, analyze_document, data, content_type, filename,
+            self.max_chars, self.time_limit, self.cpu_limit
+        )
+
+    async def scan(self, text: str, entity_limit: int) -> Dict[str, Any]:
+        """scan_content() one segment of a streamed document in the pool"""
+        return await self._submit('stream segment', scan_segment, text, entity_limit, self.time_limit, self.cpu_limit)
+
+    async def _submit(self, label: str, func: Callable, *args) -> Dict[str, Any]:
+        """Run one task in the pool under the queue bound and time limit, recording metrics"""
+        if self.in_flight >= self.max_workers + self.max_queue:
+            analysis_tasks_total.labels(outcome='rejected').inc()
+            raise AnalysisPoolSaturatedError(f"Analysis queue full ({self.in_flight} tasks pending)")
+
+        started = time.monotonic()
+        self.in_flight += 1
+        analysis_in_flight.inc()
+        pool = None
+
+        try:
+            async with self._slots:
+                pool = self.pool
+                future = pool.submit(func, *args)
+                # Backstop in case the in-worker timer cannot fire; the grace covers spawning a worker
+                result = await asyncio.wait_for(asyncio.wrap_future(future), self.time_limit + 10)
+
+            analysis_tasks_total.labels(outcome='truncated' if result.get('truncated') else 'success').inc()
+            return result
+
+        except (AnalysisTimeoutError, asyncio.TimeoutError):
+            analysis_tasks_total.labels(outcome='timeout').inc()
+            logger.warning(f"Analysis of {label} exceeded the {self.time_limit}s time or {self.cpu_limit}s CPU limit")
+            raise AnalysisTimeoutError(f"Analysis of {label} exceeded its time limit")
+
+        except MemoryError:
+            analysis_tasks_total.labels(outcome='memory_limit').inc()
+            logger.warning(f"Analysis of {label} exceeded the {self.memory_limit} byte memory limit")
+            raise
+
+        except BrokenProcessPool:
+            analysis_tasks_total.labels(outcome='error').inc()
+            self._rebuild(pool)
+            raise
+
+        except Exception:
+            analysis_tasks_total.labels(outcome='error').inc()
+            raise
+
+        finally:
+            self.in_flight -= 1
+            analysis_in_flight.dec()
+            analysis_duration_seconds.observe(time.monotonic() - started)
+
+    async def analyze_batch(self, documents: List[Dict[str, Any]]) -> List[Union[Dict[str, Any], Exception]]:
+        """Analyze many files ({'data', 'content_type', 'filename'}) across all workers.
+
+        Results are in input order; a failed document yields its exception
+        instead of failing the batch.
+        """
+        return await asyncio.gather(
+            *(self.analyze(doc['data'], doc['content_type'], doc['filename']) for doc in documents),
+            return_exceptions=True
+        )
+
+    def _rebuild(self, broken: ProcessPoolExecutor):
+        """Replace a broken pool once, however many tasks noticed"""
+        if self.pool is not broken:
+            return
+        logger.error("Analysis worker died; rebuilding the process pool")
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.pool = self._create_pool()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get pool configuration and occupancy"""
+        return {
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'in_flight': self.in_flight,
+            'time_limit': self.time_limit,
+            'cpu_limit': self.cpu_limit,
+            'memory_limit': self.memory_limit,
+            'max_chars': self.max_chars
+        }
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        logger.info("Analysis pool shut down")
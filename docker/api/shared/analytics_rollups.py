@@ -0,0 +1,35 @@
+# Analytics Rollups - Shapes trigger-maintained counters into the analytics response
+from typing import Dict, Any, Iterable
+from datetime import datetime
+
+ROLLUP_SQL = """
+    SELECT metric, dimension, SUM(count) AS count
+    FROM analytics_rollups
+    GROUP BY metric, dimension
+"""
+
+PROCESSING_STATUSES = ('pending', 'processing', 'completed', 'failed')
+
+def build_analytics(rows: Iterable[Any]) -> Dict[str, Any]:
+    """Turn (metric, dimension, count) rows into the /analytics/insights payload"""
+    totals = {'contacts': 0, 'documents': 0}
+    statuses = {status: 0 for status in PROCESSING_STATUSES}
+    document_types = {}
+
+    for row in rows:
+        metric, dimension, count = row['metric'], row['dimension'], int(row['count'])
+
+        if metric in totals and dimension == 'total':
+            totals[metric] = count
+        elif metric == 'document_status' and dimension in statuses:
+            statuses[dimension] = count
+        elif metric == 'document_type' and count > 0:
+            document_types[dimension] = count
+
+    return {
+        'total_contacts': totals['contacts'],
+        'total_documents': totals['documents'],
+        'document_types': document_types,
+        'processing_stats': statuses,
+        'timestamp': datetime.utcnow().isoformat() + 'Z'
+    }
@@ -0,0 +1,924 @@
+# Async PostgreSQL Database Service - asyncpg twin of PostgreSQLService
+import os
+import logging
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from datetime import datetime, timezone
+import asyncpg
+
+from shared import json_codec
+from shared.analytics_rollups import ROLLUP_SQL, build_analytics
+from shared.storage_usage import format_usage, build_contact_usage
+from shared.visitor_counter import ApproximateCounter, INCREMENT_SHARD_SQL, SUM_SHARDS_SQL, pick_shard
+from utils.document_processing import DocumentProcessingService
+
+logger = logging.getLogger(__name__)
+
+def _to_datetime(value: Any) -> Optional[datetime]:
+    """Convert ISO-8601 strings (with trailing 'Z') to aware datetimes for asyncpg"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+async def _init_connection(conn):
+    """Register JSON codecs so JSONB columns round-trip as Python objects"""
+    for type_name in ('json', 'jsonb'):
+        await conn.set_type_codec(
+            type_name,
+            encoder=json_codec.dumps,
+            decoder=json_codec.loads,
+            schema='pg_catalog'
+        )
+
+class AsyncPostgreSQLService:
+    """Native asyncio PostgreSQL service with the same surface as PostgreSQLService"""
+
+    def __init__(self):
+        # Same connection parameters as the psycopg2 service
+        self.db_host = os.environ.get('DB_HOST', 'postgresql')
+        self.db_port = int(os.environ.get('DB_PORT', '5432'))
+        self.db_name = os.environ.get('DB_NAME', 'pretamane_db')
+        self.db_user = os.environ.get('DB_USER', 'app_user')
+        self.db_password = os.environ.get('DB_PASSWORD')
+
+        if not self.db_password:
+            raise ValueError("DB_PASSWORD environment variable not set")
+
+        self.min_size = int(os.environ.get('DB_POOL_MIN_SIZE', '2'))
+        self.max_size = int(os.environ.get('DB_POOL_MAX_SIZE', '10'))
+        self.command_timeout = float(os.environ.get('DB_COMMAND_TIMEOUT', '30'))
+
+        # Pool is created in connect() because it needs a running event loop
+        self.pool: Optional[asyncpg.Pool] = None
+
+        # Cached, monotonic view of the sharded visitor counter
+        self.visitor_counter = ApproximateCounter()
+
+    async def connect(self):
+        """Create the asyncpg connection pool"""
+        if self.pool is not None:
+            return
+
+        self.pool = await asyncpg.create_pool(
+            host=self.db_host,
+            port=self.db_port,
+            database=self.db_name,
+            user=self.db_user,
+            password=self.db_password,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            command_timeout=self.command_timeout,
+            init=_init_connection
+        )
+
+        logger.info(f"asyncpg connection pool initialized (min={self.min_size}, max={self.max_size})")
+
+    async def ping(self) -> bool:
+        """Check connectivity with a trivial query (raises on failure)"""
+        await self.pool.fetchval("SELECT 1")
+        return True
+
+    async def create_contact_record(self, contact_data: Dict[str, Any], notification: Optional[Dict[str, Any]] = None) -> str:
+        """Create contact record (replaces DynamoDB put_item).
+
+        If notification is given ({'event_type': ..., 'payload': {...}}) it is
+        written to email_outbox in the same transaction as the contact row.
+        """
+        try:
+            async with self.pool.acquire() as conn, conn.transaction():
+                contact_id = await self._insert_contact(conn, contact_data)
+
+                if notification:
+                    await conn.execute("""
+                        INSERT INTO email_outbox (event_type, aggregate_id, payload)
+                        VALUES ($1, $2, $3)
+                    """, notification['event_type'], contact_id, notification['payload'])
+
+            logger.info(f"Created contact record: {contact_id}")
+            return contact_id
+
+        except Exception as e:
+            logger.error(f"Error creating contact record: {str(e)}")
+            raise
+
+    async def _insert_contact(self, conn, contact_data: Dict[str, Any]) -> str:
+        """Insert a contact_submissions row on the given connection"""
+        return await conn.fetchval("""
+            INSERT INTO contact_submissions (
+                id, name, email, company, service, budget, message,
+                timestamp, status, source, user_agent, page_url,
+                document_processing_enabled, search_capabilities
+            ) VALUES (
+                $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14
+            )
+            RETURNING id
+        """,
+            contact_data['id'],
+            contact_data['name'],
+            contact_data['email'],
+            contact_data.get('company', ''),
+            contact_data.get('service', ''),
+            contact_data.get('budget', ''),
+            contact_data['message'],
+            _to_datetime(contact_data['timestamp']),
+            contact_data.get('status', 'new'),
+            contact_data.get('source', 'website'),
+            contact_data.get('userAgent', ''),
+            contact_data.get('pageUrl', ''),
+            contact_data.get('document_processing_enabled', True),
+            contact_data.get('search_capabilities', True)
+        )
+
+    async def update_visitor_count(self) -> int:
+        """Increment a random visitor counter shard and return the approximate total"""
+        try:
+            await self.pool.execute(INCREMENT_SHARD_SQL.format(shard='$1'), pick_shard())
+
+            if self.visitor_counter.is_stale():
+                return self.visitor_counter.observe(await self.pool.fetchval(SUM_SHARDS_SQL))
+
+            return self.visitor_counter.increment()
+
+        except Exception as e:
+            logger.error(f"Error updating visitor count: {str(e)}")
+            return self.visitor_counter.value
+
+    async def get_visitor_count(self) -> int:
+        """Get visitor count (approximate, monotonic, cached for VISITOR_COUNT_CACHE_TTL)"""
+        if not self.visitor_counter.is_stale():
+            return self.visitor_counter.value
+
+        try:
+            return self.visitor_counter.observe(await self.pool.fetchval(SUM_SHARDS_SQL))
+        except Exception as e:
+            logger.error(f"Error getting visitor count: {str(e)}")
+            return self.visitor_counter.value
+
+    async def create_document_record(self, document_data: Dict[str, Any]) -> str:
+        """Create document record (replaces DynamoDB put_item)"""
+        try:
+            document_id = await self.pool.fetchval("""
+                INSERT INTO documents (
+                    id, contact_id, filename, size, content_type, document_type,
+                    description, tags, upload_timestamp, processing_status,
+                    s3_bucket, s3_key, efs_path, file_hash
+                ) VALUES (
+                    $1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14
+                )
+                RETURNING id
+            """,
+                document_data['id'],
+                document_data['contact_id'],
+                document_data['filename'],
+                document_data['size'],
+                document_data['content_type'],
+                document_data['document_type'],
+                document_data.get('description', ''),
+                document_data.get('tags', []),
+                _to_datetime(document_data['upload_timestamp']),
+                document_data.get('processing_status', 'pending'),
+                document_data.get('s3_bucket', ''),
+                document_data.get('s3_key', ''),
+                document_data.get('efs_path', ''),
+                document_data.get('file_hash', '')
+            )
+
+            logger.info(f"Created document record: {document_id}")
+            return str(document_id)
+
+        except Exception as e:
+            logger.error(f"Error creating document record: {str(e)}")
+            raise
+
+    async def update_document_status(self, document_id: str, status: str, metadata: Optional[Dict] = None) -> bool:
+        """Update document processing status"""
+        try:
+            now = datetime.now(timezone.utc)
+
+            if metadata:
+                await self.pool.execute("""
+                    UPDATE documents
+                    SET processing_status = $1,
+                        processing_timestamp = $2,
+                        processing_metadata = $3
+                    WHERE id = $4
+                """, status, now, metadata, document_id)
+            else:
+                await self.pool.execute("""
+                    UPDATE documents
+                    SET processing_status = $1,
+                        processing_timestamp = $2
+                    WHERE id = $3
+                """, status, now, document_id)
+
+            logger.info(f"Updated document {document_id} status to {status}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error updating document status: {str(e)}")
+            return False
+
+    async def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Get one document record by ID"""
+        try:
+            row = await self.pool.fetchrow("""
+                SELECT
+                    id::text as document_id,
+                    contact_id,
+                    filename,
+                    size,
+                    content_type,
+                    document_type,
+                    processing_status,
+                    upload_timestamp,
+                    s3_bucket,
+                    s3_key,
+                    file_hash
+                FROM documents
+                WHERE id = $1::uuid
+            """, document_id)
+
+            return dict(row) if row else None
+
+        except Exception as e:
+            logger.error(f"Error getting document: {str(e)}")
+            return None
+
+    async def get_contact_documents(self, contact_id: str) -> List[Dict[str, Any]]:
+        """Get all documents for a contact"""
+        try:
+            rows = await self.pool.fetch("""
+                SELECT
+                    id::text as document_id,
+                    filename,
+                    document_type,
+                    description,
+                    tags,
+                    upload_timestamp,
+                    processing_status,
+                    size
+                FROM documents
+                WHERE contact_id = $1
+                ORDER BY upload_timestamp DESC
+            """, contact_id)
+
+            return [dict(row) for row in rows]
+
+        except Exception as e:
+            logger.error(f"Error getting contact documents: {str(e)}")
+            return []
+
+    async def enrich_contact_data(self, contact_id: str, document_metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Enrich contact data with document insights"""
+        try:
+            document_insights = {
+                'total_documents': 1,
+                'document_types': [document_metadata.get('document_type', 'unknown')],
+                'total_size': document_metadata.get('size', 0),
+                'last_document_upload': document_metadata.get('upload_timestamp'),
+                'processing_status': document_metadata.get('processing_status', 'pending'),
+                'content_analysis': {
+                    'has_business_content': document_metadata.get('has_business_keywords', False),
+                    'complexity_score': DocumentProcessingService.calculate_complexity_score(document_metadata),
+                    'confidence_level': 'high' if document_metadata.get('word_count', 0) > 100 else 'medium'
+                }
+            }
+
+            await self.pool.execute("""
+                UPDATE contact_submissions
+                SET document_insights = $1,
+                    last_updated = $2
+                WHERE id = $3
+            """, document_insights, datetime.now(timezone.utc), contact_id)
+
+            logger.info(f"Enriched contact {contact_id} with document insights")
+            return document_insights
+
+        except Exception as e:
+            logger.error(f"Error enriching contact data: {str(e)}")
+            return {}
+
+    async def search_documents(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Search documents using PostgreSQL full-text search"""
+        try:
+            pattern = f'%{query}%'
+            rows = await self.pool.fetch("""
+                SELECT
+                    id::text as document_id,
+                    filename,
+                    contact_id,
+                    document_type,
+                    description,
+                    tags,
+                    upload_timestamp,
+                    processing_status,
+                    size
+                FROM documents
+                WHERE
+                    filename ILIKE $1 OR
+                    description ILIKE $1 OR
+                    document_type ILIKE $1
+                ORDER BY upload_timestamp DESC
+                LIMIT $2
+            """, pattern, limit)
+
+            return [dict(row) for row in rows]
+
+        except Exception as e:
+            logger.error(f"Error searching documents: {str(e)}")
+            return []
+
+    async def get_analytics_data(self) -> Dict[str, Any]:
+        """Get system analytics from the analytics_rollups counters (replaces DynamoDB scan)"""
+        try:
+            # Read trigger-maintained rollups instead of scanning the base tables
+            return build_analytics(await self.pool.fetch(ROLLUP_SQL))
+
+        except Exception as e:
+            logger.error(f"Error getting analytics data: {str(e)}")
+            return {
+                'total_contacts': 0,
+                'total_documents': 0,
+                'document_types': {},
+                'processing_stats': {},
+                'timestamp': datetime.utcnow().isoformat() + 'Z'
+            }
+
+    async def claim_outbox_messages(self, limit: int, lease_seconds: int) -> List[Dict[str, Any]]:
+        """Lease a batch of due outbox messages (safe across workers via SKIP LOCKED)"""
+        try:
+            rows = await self.pool.fetch("""
+                UPDATE email_outbox
+                SET status = 'sending',
+                    attempts = attempts + 1,
+                    locked_until = NOW() + make_interval(secs => $1)
+                WHERE id IN (
+                    SELECT id FROM email_outbox
+                    WHERE (status = 'pending' AND next_attempt_at <= NOW())
+                       OR (status = 'sending' AND locked_until < NOW())
+                    ORDER BY next_attempt_at
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, event_type, aggregate_id, payload, attempts
+            """, float(lease_seconds), limit)
+
+            return [dict(row) for row in rows]
+
+        except Exception as e:
+            logger.error(f"Error claiming outbox messages: {str(e)}")
+            return []
+
+    async def mark_outbox_sent(self, message_ids: List[int]) -> bool:
+        """Mark outbox messages as delivered"""
+        try:
+            await self.pool.execute("""
+                UPDATE email_outbox
+                SET status = 'sent',
+                    sent_at = NOW(),
+                    locked_until = NULL,
+                    last_error = NULL
+                WHERE id = ANY($1::bigint[])
+            """, list(message_ids))
+            return True
+
+        except Exception as e:
+            logger.error(f"Error marking outbox messages sent: {str(e)}")
+            return False
+
+    async def mark_outbox_failed(self, message_id: int, error: str, retry_in: float, max_attempts: int) -> bool:
+        """Schedule a retry for a failed outbox message, or dead-letter it after max_attempts"""
+        try:
+            await self.pool.execute("""
+                UPDATE email_outbox
+                SET status = CASE WHEN attempts >= $1 THEN 'dead' ELSE 'pending' END,
+                    next_attempt_at = NOW() + make_interval(secs => $2),
+                    locked_until = NULL,
+                    last_error = $3
+                WHERE id = $4
+            """, max_attempts, float(retry_in), error[:1000], message_id)
+            return True
+
+        except Exception as e:
+            logger.error(f"Error marking outbox message failed: {str(e)}")
+            return False
+
+    async def record_storage_usage(self, bucket: str, delta_bytes: int, delta_objects: int) -> bool:
+        """Apply an object upload (+) or delete (-) to a bucket's ledger total"""
+        try:
+            await self.pool.execute(
+                "SELECT record_storage_usage($1, $2, $3)",
+                bucket, delta_bytes, delta_objects
+            )
+            return True
+
+        except Exception as e:
+            logger.error(f"Error recording storage usage: {str(e)}")
+            return False
+
+    async def get_bucket_storage_snapshot(self, bucket: str) -> Optional[Dict[str, Any]]:
+        """A bucket's ledger total, per-contact rows and per-contact document totals, read from one snapshot"""
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction(isolation='repeatable_read', readonly=True):
+                    total = await conn.fetchrow("""
+                        SELECT total_bytes, object_count
+                        FROM storage_bucket_usage
+                        WHERE bucket = $1
+                    """, bucket)
+                    rows = await conn.fetch("""
+                        SELECT contact_id, total_bytes, object_count
+                        FROM storage_usage
+                        WHERE bucket = $1
+                    """, bucket)
+                    documents = await conn.fetch("""
+                        SELECT contact_id, SUM(size) AS total_bytes, COUNT(*) AS object_count
+                        FROM documents
+                        WHERE s3_bucket = $1
+                        GROUP BY contact_id
+                    """, bucket)
+
+            return {
+                'total': dict(total) if total else {'total_bytes': 0, 'object_count': 0},
+                'contacts': {row['contact_id']: {'total_bytes': row['total_bytes'], 'object_count': row['object_count']}
+                             for row in rows},
+                'documents': {row['contact_id']: {'total_bytes': int(row['total_bytes']), 'object_count': row['object_count']}
+                              for row in documents}
+            }
+
+        except Exception as e:
+            logger.error(f"Error getting bucket storage snapshot: {str(e)}")
+            return None
+
+    async def apply_storage_reconciliation(self, bucket: str, total_bytes: int, total_objects: int,
+                                           contact_deltas: List[Tuple[str, int, int]]) -> bool:
+        """Add reconciliation deltas to a bucket's ledger rows and mark them reconciled"""
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute("""
+                        INSERT INTO storage_bucket_usage (bucket, total_bytes, object_count, last_updated, last_reconciled)
+                        VALUES ($1, GREATEST($2, 0), GREATEST($3, 0), NOW(), NOW())
+                        ON CONFLICT (bucket) DO UPDATE
+                        SET total_bytes = GREATEST(storage_bucket_usage.total_bytes + $2, 0),
+                            object_count = GREATEST(storage_bucket_usage.object_count + $3, 0),
+                            last_updated = NOW(),
+                            last_reconciled = NOW()
+                    """, bucket, total_bytes, total_objects)
+                    await conn.executemany("""
+                        INSERT INTO storage_usage (bucket, contact_id, total_bytes, object_count, last_updated)
+                        VALUES ($1, $2, GREATEST($3, 0), GREATEST($4, 0), NOW())
+                        ON CONFLICT (bucket, contact_id) DO UPDATE
+                        SET total_bytes = GREATEST(storage_usage.total_bytes + $3, 0),
+                            object_count = GREATEST(storage_usage.object_count + $4, 0),
+                            last_updated = NOW()
+                    """, [(bucket, contact_id, delta_bytes, delta_objects)
+                          for contact_id, delta_bytes, delta_objects in contact_deltas])
+                    await conn.execute(
+                        "UPDATE storage_usage SET last_reconciled = NOW() WHERE bucket = $1", bucket
+                    )
+            return True
+
+        except Exception as e:
+            logger.error(f"Error applying storage reconciliation: {str(e)}")
+            return False
+
+    async def get_storage_usage(self) -> Dict[str, Dict[str, Any]]:
+        """Get per-bucket totals from the storage usage ledger"""
+        try:
+            rows = await self.pool.fetch("""
+                SELECT bucket, total_bytes, object_count, last_reconciled
+                FROM storage_bucket_usage
+            """)
+
+            return {row['bucket']: format_usage(row) for row in rows}
+
+        except Exception as e:
+            logger.error(f"Error getting storage usage: {str(e)}")
+            return {}
+
+    async def get_contact_storage_usage(self, contact_id: str) -> Dict[str, Any]:
+        """Get a contact's storage totals across buckets from the ledger"""
+        try:
+            rows = await self.pool.fetch("""
+                SELECT bucket, total_bytes, object_count, last_reconciled
+                FROM storage_usage
+                WHERE contact_id = $1
+            """, contact_id)
+
+            return build_contact_usage(contact_id, rows)
+
+        except Exception as e:
+            logger.error(f"Error getting contact storage usage: {str(e)}")
+            return build_contact_usage(contact_id, [])
+
+    async def get_content_blob(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """Get the stored blob for a file hash"""
+        try:
+            row = await self.pool.fetchrow("""
+                SELECT sha256, bucket, s3_key, size, ref_count, deleting
+                FROM content_blobs
+                WHERE sha256 = $1
+            """, sha256)
+
+            return dict(row) if row else None
+
+        except Exception as e:
+            logger.error(f"Error getting content blob: {str(e)}")
+            return None
+
+    async def register_content_blob(self, sha256: str, bucket: str, s3_key: str, size: int,
+                                    content_type: str) -> Optional[Dict[str, Any]]:
+        """Create a blob's row if needed (None while it is being deleted).
+
+        References are taken by a trigger when the document row is inserted.
+        An unreferenced blob restarts its grace period here, so the garbage
+        collector leaves it alone until that insert.
+        """
+        try:
+            row = await self.pool.fetchrow("""
+                INSERT INTO content_blobs (sha256, bucket, s3_key, size, content_type, ref_count, released_at)
+                VALUES ($1, $2, $3, $4, $5, 0, NOW())
+                ON CONFLICT (sha256) DO UPDATE
+                SET released_at = CASE WHEN content_blobs.ref_count = 0 THEN NOW() ELSE content_blobs.released_at END
+                WHERE NOT content_blobs.deleting
+                RETURNING bucket, s3_key, ref_count, (xmax = 0) AS created
+            """, sha256, bucket, s3_key, size, content_type)
+
+            return dict(row) if row else None
+
+        except Exception as e:
+            logger.error(f"Error registering content blob: {str(e)}")
+            return None
+
+    async def claim_orphan_blobs(self, grace_seconds: float, limit: int) -> List[Dict[str, Any]]:
+        """Mark unreferenced blobs past the grace period for deletion and return them"""
+        try:
+            rows = await self.pool.fetch("""
+                UPDATE content_blobs
+                SET deleting = TRUE
+                WHERE sha256 IN (
+                    SELECT sha256 FROM content_blobs
+                    WHERE ref_count = 0
+                      AND released_at < NOW() - make_interval(secs => $1)
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING sha256, bucket, s3_key
+            """, float(grace_seconds), limit)
+
+            return [dict(row) for row in rows]
+
+        except Exception as e:
+            logger.error(f"Error claiming orphan blobs: {str(e)}")
+            return []
+
+    async def delete_content_blobs(self, hashes: List[str]) -> bool:
+        """Remove blob rows whose objects have been deleted"""
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    deleted = await conn.fetch(
+                        "DELETE FROM content_blobs WHERE sha256 = ANY($1::text[]) AND deleting RETURNING sha256",
+                        list(hashes)
+                    )
+                    # Cached extraction results go with the bytes they describe
+                    await conn.execute(
+                        "DELETE FROM extraction_results WHERE sha256 = ANY($1::text[])",
+                        [row['sha256'] for row in deleted]
+                    )
+            return True
+
+        except Exception as e:
+            logger.error(f"Error deleting content blobs: {str(e)}")
+            return False
+
+    async def copy_document_results(self, document_id: str, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Copy processing results from a completed document with the same file hash"""
+        try:
+            row = await self.pool.fetchrow("""
+                UPDATE documents d
+                SET processing_status = s.processing_status,
+                    processing_metadata = s.processing_metadata,
+                    complexity_score = s.complexity_score,
+                    processing_timestamp = NOW()
+                FROM (
+                    SELECT id, processing_status, processing_metadata, complexity_score
+                    FROM documents
+                    WHERE file_hash = $1
+                      AND id <> $2::uuid
+                      AND processing_status = 'completed'
+                    ORDER BY processing_timestamp DESC NULLS LAST
+                    LIMIT 1
+                ) s
+                WHERE d.id = $2::uuid
+                RETURNING s.id::text AS source_id, d.processing_metadata, d.complexity_score, d.processing_timestamp
+            """, file_hash, document_id)
+
+            return dict(row) if row else None
+
+        except Exception as e:
+            logger.error(f"Error copying document results: {str(e)}")
+            return None
+
+    async def enqueue_processing_jobs(self, objects: List[Tuple[str, str]], source: str) -> int:
+        """Queue processing for (bucket, key) objects.
+
+        An object with a pending job is skipped; one whose job is being
+        processed has it re-armed to run again once that run finishes.
+        """
+        try:
+            rows = await self.pool.fetch("""
+                INSERT INTO processing_jobs (bucket, s3_key, source)
+                SELECT DISTINCT bucket, s3_key, $1
+                FROM unnest($2::text[], $3::text[]) AS o(bucket, s3_key)
+                ON CONFLICT (bucket, s3_key) WHERE status IN ('pending', 'processing') DO UPDATE
+                SET requeue = TRUE
+                WHERE processing_jobs.status = 'processing'
+                RETURNING id
+            """, source, [bucket for bucket, _ in objects], [key for _, key in objects])
+
+            return len(rows)
+
+        except Exception as e:
+            logger.error(f"Error enqueuing processing jobs: {str(e)}")
+            return 0
+
+    async def enqueue_pending_documents(self, min_age_seconds: float) -> int:
+        """Queue jobs for documents pending longer than min_age_seconds without one"""
+        try:
+            return await self.pool.fetchval(
+                "SELECT enqueue_pending_documents(make_interval(secs => $1))",
+                float(min_age_seconds)
+            )
+
+        except Exception as e:
+            logger.error(f"Error enqueuing pending documents: {str(e)}")
+            return 0
+
+    async def claim_processing_jobs(self, limit: int, lease_seconds: int) -> List[Dict[str, Any]]:
+        """Lease due processing jobs, including ones whose lease expired (safe across replicas via SKIP LOCKED)"""
+        try:
+            rows = await self.pool.fetch("""
+                UPDATE processing_jobs
+                SET status = 'processing',
+                    attempts = attempts + 1,
+                    requeue = FALSE,
+                    locked_until = NOW() + make_interval(secs => $1)
+                WHERE id IN (
+                    SELECT id FROM processing_jobs
+                    WHERE (status = 'pending' AND next_attempt_at <= NOW())
+                       OR (status = 'processing' AND locked_until < NOW())
+                    ORDER BY next_attempt_at
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, bucket, s3_key, source, attempts
+            """, float(lease_seconds), limit)
+
+            return [dict(row) for row in rows]
+
+        except Exception as e:
+            logger.error(f"Error claiming processing jobs: {str(e)}")
+            return []
+
+    async def extend_processing_lease(self, job_id: int, attempts: int, lease_seconds: int) -> bool:
+        """Renew a job lease; False if the lease was lost to another worker"""
+        try:
+            status = await self.pool.execute("""
+                UPDATE processing_jobs
+                SET locked_until = NOW() + make_interval(secs => $1)
+                WHERE id = $2 AND attempts = $3 AND status = 'processing'
+            """, float(lease_seconds), job_id, attempts)
+            return status == 'UPDATE 1'
+
+        except Exception as e:
+            logger.error(f"Error extending processing lease: {str(e)}")
+            return False
+
+    async def complete_processing_job(self, job_id: int, attempts: int) -> bool:
+        """Mark a leased job as done (or due again if it was re-armed); False if the lease was lost"""
+        try:
+            status = await self.pool.execute("""
+                UPDATE processing_jobs
+                SET status = CASE WHEN requeue THEN 'pending' ELSE 'completed' END,
+                    completed_at = CASE WHEN requeue THEN NULL ELSE NOW() END,
+                    next_attempt_at = NOW(),
+                    requeue = FALSE,
+                    locked_until = NULL,
+                    last_error = NULL
+                WHERE id = $1 AND attempts = $2 AND status = 'processing'
+            """, job_id, attempts)
+            return status == 'UPDATE 1'
+
+        except Exception as e:
+            logger.error(f"Error completing processing job: {str(e)}")
+            return False
+
+    async def fail_processing_job(self, job_id: int, attempts: int, error: str, retry_in: float, max_attempts: int) -> bool:
+        """Schedule a retry for a leased job, or dead-letter it after max_attempts"""
+        try:
+            status = await self.pool.execute("""
+                UPDATE processing_jobs
+                SET status = CASE WHEN attempts >= $1 AND NOT requeue THEN 'dead' ELSE 'pending' END,
+                    next_attempt_at = NOW() + make_interval(secs => $2),
+                    requeue = FALSE,
+                    locked_until = NULL,
+                    last_error = $3
+                WHERE id = $4 AND attempts = $5 AND status = 'processing'
+            """, max_attempts, float(retry_in), error[:1000], job_id, attempts)
+            return status == 'UPDATE 1'
+
+        except Exception as e:
+            logger.error(f"Error failing processing job: {str(e)}")
+            return False
+
+    async def get_object_documents(self, bucket: str, s3_key: str) -> List[Dict[str, Any]]:
+        """Get every document stored at one object (raises on failure)"""
+        rows = await self.pool.fetch("""
+            SELECT
+                id::text as document_id,
+                contact_id,
+                filename,
+                size,
+                content_type,
+                document_type,
+                upload_timestamp,
+                processing_status,
+                s3_bucket,
+                s3_key,
+                file_hash
+            FROM documents
+            WHERE s3_bucket = $1 AND s3_key = $2
+        """, bucket, s3_key)
+
+        return [dict(row) for row in rows]
+
+    async def complete_document_processing(self, document_id: str, metadata: Dict[str, Any], complexity_score: float) -> bool:
+        """Store processing results and mark a document completed"""
+        try:
+            await self.pool.execute("""
+                UPDATE documents
+                SET processing_status = 'completed',
+                    processing_timestamp = NOW(),
+                    processing_metadata = $1,
+                    complexity_score = $2
+                WHERE id = $3
+            """, metadata, complexity_score, document_id)
+
+            logger.info(f"Completed processing of document {document_id}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error completing document processing: {str(e)}")
+            return False
+
+    async def record_document_terms(self, document_key: str, terms: List[str]) -> bool:
+        """Add one document's distinct terms to the keyword document frequencies.
+
+        False if the document was already counted or the update failed.
+        """
+        try:
+            return await self.pool.fetchval(
+                "SELECT record_document_terms($1, $2)", document_key, terms
+            )
+
+        except Exception as e:
+            logger.error(f"Error recording document terms: {str(e)}")
+            return False
+
+    async def get_keyword_document_frequencies(self, min_count: int) -> Optional[Dict[str, Any]]:
+        """Corpus size and the document frequency of every term in at least min_count documents"""
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction(isolation='repeatable_read', readonly=True):
+                    document_count = await conn.fetchval("SELECT COUNT(*) FROM keyword_corpus_documents")
+                    rows = await conn.fetch("""
+                        SELECT term, document_count
+                        FROM keyword_document_frequency
+                        WHERE document_count >= $1
+                    """, min_count)
+
+            return {
+                'document_count': document_count,
+                'frequencies': {row['term']: row['document_count'] for row in rows}
+            }
+
+        except Exception as e:
+            logger.error(f"Error getting keyword document frequencies: {str(e)}")
+            return None
+
+    async def get_extraction_result(self, sha256: str, extractor_version: str, content_type: str,
+                                    file_extension: str) -> Optional[Dict[str, Any]]:
+        """Cached analysis of a file hash under a declared type (counting the hit), or None"""
+        try:
+            row = await self.pool.fetchrow("""
+                UPDATE extraction_results
+                SET hit_count = hit_count + 1,
+                    last_hit_at = NOW()
+                WHERE sha256 = $1 AND extractor_version = $2
+                  AND content_type = $3 AND file_extension = $4
+                RETURNING content, text_content, metadata, complexity_score
+            """, sha256, extractor_version, content_type, file_extension)
+
+            return dict(row) if row else None
+
+        except Exception as e:
+            logger.error(f"Error getting extraction result: {str(e)}")
+            return None
+
+    async def store_extraction_result(self, sha256: str, extractor_version: str, content_type: str,
+                                      file_extension: str, content: Optional[str], text_content: str,
+                                      metadata: Dict[str, Any], complexity_score: float) -> bool:
+        """Cache the analysis of a file hash under a declared type; the first stored result is kept"""
+        try:
+            await self.pool.execute("""
+                INSERT INTO extraction_results (
+                    sha256, extractor_version, content_type, file_extension,
+                    content, text_content, metadata, complexity_score
+                ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                ON CONFLICT (sha256, extractor_version, content_type, file_extension) DO NOTHING
+            """, sha256, extractor_version, content_type, file_extension,
+                content, text_content, metadata, complexity_score)
+            return True
+
+        except Exception as e:
+            logger.error(f"Error storing extraction result: {str(e)}")
+            return False
+
+    async def _dedicated_connection(self) -> asyncpg.Connection:
+        """Open a dedicated connection outside the pool (for sessions held a long time)"""
+        return await asyncpg.connect(
+            host=self.db_host,
+            port=self.db_port,
+            database=self.db_name,
+            user=self.db_user,
+            password=self.db_password
+        )
+
+    async def try_advisory_lock(self, name: str) -> Optional[Dict[str, Any]]:
+        """Take a session advisory lock on a dedicated connection; None if another session holds it.
+
+        The connection is opened outside the pool, since the lock may be held
+        for minutes while callers keep needing pooled connections.
+        """
+        conn = None
+        try:
+            conn = await self._dedicated_connection()
+            if await conn.fetchval("SELECT pg_try_advisory_lock(hashtext($1))", name):
+                return {'name': name, 'connection': conn}
+
+        except Exception as e:
+            logger.error(f"Error taking advisory lock {name}: {str(e)}")
+
+        if conn:
+            await conn.close()
+        return None
+
+    async def advisory_unlock(self, handle: Dict[str, Any]) -> bool:
+        """Release an advisory lock and close its connection"""
+        try:
+            await handle['connection'].execute("SELECT pg_advisory_unlock(hashtext($1))", handle['name'])
+            return True
+
+        except Exception as e:
+            logger.error(f"Error releasing advisory lock {handle['name']}: {str(e)}")
+            return False
+        finally:
+            # Closing the session also drops a lock the unlock missed
+            await handle['connection'].close()
+
+    async def listen(self, channel: str, callback: Callable[[str], None]) -> Optional[Dict[str, Any]]:
+        """Pass NOTIFY payloads on a channel to callback, on the event loop.
+
+        Uses its own connection outside the pool (pooled connections drop their
+        listeners on release). Notifications stop if that connection drops, so
+        callers should keep polling as a fallback. Returns a handle for
+        unlisten(), or None on failure.
+        """
+        try:
+            conn = await self._dedicated_connection()
+            await conn.add_listener(channel, lambda _conn, _pid, _channel, payload: callback(payload))
+
+            logger.info(f"Listening for notifications on {channel}")
+            return {'channel': channel, 'connection': conn}
+
+        except Exception as e:
+            logger.error(f"Error listening on {channel}: {str(e)}")
+            return None
+
+    async def unlisten(self, handle: Dict[str, Any]) -> bool:
+        """Stop a listener started by listen()"""
+        try:
+            await handle['connection'].close()
+            return True
+
+        except Exception as e:
+            logger.error(f"Error closing listener on {handle['channel']}: {str(e)}")
+            return False
+
+    async def close(self):
+        """Close all connections in pool"""
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+            logger.info("asyncpg connection pool closed")
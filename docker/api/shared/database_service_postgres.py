@@ -1,14 +1,32 @@
 # PostgreSQL Database Service - Replaces DynamoDB
 import os
+import select
 import logging
-from typing import Dict, Any, List, Optional
+import threading
+from typing import Dict, Any, Callable, List, Optional, Tuple
 from datetime import datetime
 import psycopg2
-from psycopg2.extras import RealDictCursor, Json
-from psycopg2.pool import SimpleConnectionPool
+from psycopg2 import sql
+from psycopg2.extras import RealDictCursor, Json, register_default_json, register_default_jsonb
+from psycopg2.pool import ThreadedConnectionPool
+
+from shared import json_codec
+from shared.offload_executor import DEFAULT_BACKENDS
+
+from shared.analytics_rollups import ROLLUP_SQL, build_analytics
+from shared.storage_usage import format_usage, build_contact_usage
+from shared.visitor_counter import ApproximateCounter, INCREMENT_SHARD_SQL, SUM_SHARDS_SQL, pick_shard
 
 logger = logging.getLogger(__name__)
 
+# Decode JSON/JSONB columns with the shared codec
+register_default_json(globally=True, loads=json_codec.loads)
+register_default_jsonb(globally=True, loads=json_codec.loads)
+
+def _json(value: Any) -> Json:
+    """Adapt a Python value for a JSONB parameter using the shared codec"""
+    return Json(value, dumps=json_codec.dumps)
+
 class PostgreSQLService:
     """PostgreSQL database service replacing DynamoDB"""
     
@@ -23,10 +41,17 @@ class PostgreSQLService:
         if not self.db_password:
             raise ValueError("DB_PASSWORD environment variable not set")
         
+        # Methods run on the 'postgres' offload threads, so the pool must be
+        # thread-safe and never smaller than that pool: an exhausted psycopg2
+        # pool raises instead of waiting. The headroom covers calls made
+        # outside the offload pool (startup, background threads).
+        offload_workers = int(os.environ.get('OFFLOAD_POSTGRES_WORKERS', DEFAULT_BACKENDS['postgres'][0]))
+        self.max_connections = max(int(os.environ.get('DB_POOL_MAX_SIZE', '10')), offload_workers + 2)
+        
         # Connection pool with individual parameters (avoids URL encoding issues)
-        self.pool = SimpleConnectionPool(
+        self.pool = ThreadedConnectionPool(
             minconn=1,
-            maxconn=10,
+            maxconn=self.max_connections,
             host=self.db_host,
             port=self.db_port,
             database=self.db_name,
@@ -34,7 +59,20 @@ class PostgreSQLService:
             password=self.db_password
         )
         
-        logger.info("PostgreSQL connection pool initialized")
+        # Cached, monotonic view of the sharded visitor counter
+        self.visitor_counter = ApproximateCounter()
+        
+        logger.info(f"PostgreSQL connection pool initialized (maxconn={self.max_connections})")
+    
+    def _dedicated_connection(self):
+        """Open a dedicated connection outside the pool (for sessions held a long time)"""
+        return psycopg2.connect(
+            host=self.db_host,
+            port=self.db_port,
+            database=self.db_name,
+            user=self.db_user,
+            password=self.db_password
+        )
     
     def get_connection(self):
         """Get connection from pool"""
@@ -44,8 +82,26 @@ class PostgreSQLService:
         """Return connection to pool"""
         self.pool.putconn(conn)
     
-    def create_contact_record(self, contact_data: Dict[str, Any]) -> str:
-        """Create contact record (replaces DynamoDB put_item)"""
+    def ping(self) -> bool:
+        """Check connectivity with a trivial query (raises on failure)"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            return True
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def create_contact_record(self, contact_data: Dict[str, Any], notification: Optional[Dict[str, Any]] = None) -> str:
+        """Create contact record (replaces DynamoDB put_item).
+        
+        If notification is given ({'event_type': ..., 'payload': {...}}) it is
+        written to email_outbox in the same transaction as the contact row.
+        """
         conn = None
         try:
             conn = self.get_connection()
@@ -78,6 +134,13 @@ class PostgreSQLService:
             ))
             
             contact_id = cur.fetchone()[0]
+            
+            if notification:
+                cur.execute("""
+                    INSERT INTO email_outbox (event_type, aggregate_id, payload)
+                    VALUES (%s, %s, %s)
+                """, (notification['event_type'], contact_id, _json(notification['payload'])))
+            
             conn.commit()
             
             logger.info(f"Created contact record: {contact_id}")
@@ -94,43 +157,49 @@ class PostgreSQLService:
                 self.return_connection(conn)
     
     def update_visitor_count(self) -> int:
-        """Update visitor counter (replaces DynamoDB atomic counter)"""
+        """Increment a random visitor counter shard and return the approximate total"""
         conn = None
         try:
             conn = self.get_connection()
             cur = conn.cursor()
             
-            cur.execute("SELECT increment_visitor_count()")
-            visitor_count = cur.fetchone()[0]
-            conn.commit()
+            cur.execute(INCREMENT_SHARD_SQL.format(shard='%s'), (pick_shard(),))
             
-            return visitor_count
+            if self.visitor_counter.is_stale():
+                cur.execute(SUM_SHARDS_SQL)
+                total = cur.fetchone()[0]
+                conn.commit()
+                return self.visitor_counter.observe(total)
+            
+            conn.commit()
+            return self.visitor_counter.increment()
             
         except Exception as e:
             if conn:
                 conn.rollback()
             logger.error(f"Error updating visitor count: {str(e)}")
-            return 0
+            return self.visitor_counter.value
         finally:
             if conn:
                 cur.close()
                 self.return_connection(conn)
     
     def get_visitor_count(self) -> int:
-        """Get current visitor count"""
+        """Get visitor count (approximate, monotonic, cached for VISITOR_COUNT_CACHE_TTL)"""
+        if not self.visitor_counter.is_stale():
+            return self.visitor_counter.value
+        
         conn = None
         try:
             conn = self.get_connection()
             cur = conn.cursor()
             
-            cur.execute("SELECT count FROM website_visitors WHERE id = 'visitor_count'")
-            result = cur.fetchone()
-            
-            return result[0] if result else 0
+            cur.execute(SUM_SHARDS_SQL)
+            return self.visitor_counter.observe(cur.fetchone()[0])
             
         except Exception as e:
             logger.error(f"Error getting visitor count: {str(e)}")
-            return 0
+            return self.visitor_counter.value
         finally:
             if conn:
                 cur.close()
@@ -160,7 +229,7 @@ class PostgreSQLService:
                 document_data['content_type'],
                 document_data['document_type'],
                 document_data.get('description', ''),
-                Json(document_data.get('tags', [])),
+                _json(document_data.get('tags', [])),
                 document_data['upload_timestamp'],
                 document_data.get('processing_status', 'pending'),
                 document_data.get('s3_bucket', ''),
@@ -199,7 +268,7 @@ class PostgreSQLService:
                         processing_timestamp = %s,
                         processing_metadata = %s
                     WHERE id = %s
-                """, (status, datetime.utcnow(), Json(metadata), document_id))
+                """, (status, datetime.utcnow(), _json(metadata), document_id))
             else:
                 cur.execute("""
                     UPDATE documents 
@@ -222,6 +291,41 @@ class PostgreSQLService:
                 cur.close()
                 self.return_connection(conn)
     
+    def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Get one document record by ID"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cur.execute("""
+                SELECT 
+                    id::text as document_id,
+                    contact_id,
+                    filename,
+                    size,
+                    content_type,
+                    document_type,
+                    processing_status,
+                    upload_timestamp,
+                    s3_bucket,
+                    s3_key,
+                    file_hash
+                FROM documents
+                WHERE id = %s
+            """, (document_id,))
+            
+            row = cur.fetchone()
+            return dict(row) if row else None
+            
+        except Exception as e:
+            logger.error(f"Error getting document: {str(e)}")
+            return None
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
     def get_contact_documents(self, contact_id: str) -> List[Dict[str, Any]]:
         """Get all documents for a contact"""
         conn = None
@@ -282,7 +386,7 @@ class PostgreSQLService:
                 SET document_insights = %s,
                     last_updated = %s
                 WHERE id = %s
-            """, (Json(document_insights), datetime.utcnow(), contact_id))
+            """, (_json(document_insights), datetime.utcnow(), contact_id))
             
             conn.commit()
             logger.info(f"Enriched contact {contact_id} with document insights")
@@ -337,48 +441,15 @@ class PostgreSQLService:
                 self.return_connection(conn)
     
     def get_analytics_data(self) -> Dict[str, Any]:
-        """Get system analytics (replaces DynamoDB scan)"""
+        """Get system analytics from the analytics_rollups counters (replaces DynamoDB scan)"""
         conn = None
         try:
             conn = self.get_connection()
             cur = conn.cursor(cursor_factory=RealDictCursor)
             
-            # Get contact count
-            cur.execute("SELECT COUNT(*) as count FROM contact_submissions")
-            total_contacts = cur.fetchone()['count']
-            
-            # Get document statistics
-            cur.execute("""
-                SELECT 
-                    COUNT(*) as total_documents,
-                    COUNT(CASE WHEN processing_status = 'pending' THEN 1 END) as pending,
-                    COUNT(CASE WHEN processing_status = 'processing' THEN 1 END) as processing,
-                    COUNT(CASE WHEN processing_status = 'completed' THEN 1 END) as completed,
-                    COUNT(CASE WHEN processing_status = 'failed' THEN 1 END) as failed
-                FROM documents
-            """)
-            doc_stats = cur.fetchone()
-            
-            # Get document types
-            cur.execute("""
-                SELECT document_type, COUNT(*) as count
-                FROM documents
-                GROUP BY document_type
-            """)
-            doc_types = {row['document_type']: row['count'] for row in cur.fetchall()}
-            
-            return {
-                'total_contacts': total_contacts,
-                'total_documents': doc_stats['total_documents'],
-                'document_types': doc_types,
-                'processing_stats': {
-                    'pending': doc_stats['pending'],
-                    'processing': doc_stats['processing'],
-                    'completed': doc_stats['completed'],
-                    'failed': doc_stats['failed']
-                },
-                'timestamp': datetime.utcnow().isoformat() + 'Z'
-            }
+            # Read trigger-maintained rollups instead of scanning the base tables
+            cur.execute(ROLLUP_SQL)
+            return build_analytics(cur.fetchall())
             
         except Exception as e:
             logger.error(f"Error getting analytics data: {str(e)}")
@@ -394,6 +465,885 @@ class PostgreSQLService:
                 cur.close()
                 self.return_connection(conn)
     
+    def claim_outbox_messages(self, limit: int, lease_seconds: int) -> List[Dict[str, Any]]:
+        """Lease a batch of due outbox messages (safe across workers via SKIP LOCKED)"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cur.execute("""
+                UPDATE email_outbox
+                SET status = 'sending',
+                    attempts = attempts + 1,
+                    locked_until = NOW() + make_interval(secs => %s)
+                WHERE id IN (
+                    SELECT id FROM email_outbox
+                    WHERE (status = 'pending' AND next_attempt_at <= NOW())
+                       OR (status = 'sending' AND locked_until < NOW())
+                    ORDER BY next_attempt_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, event_type, aggregate_id, payload, attempts
+            """, (lease_seconds, limit))
+            
+            messages = [dict(row) for row in cur.fetchall()]
+            conn.commit()
+            return messages
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error claiming outbox messages: {str(e)}")
+            return []
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def mark_outbox_sent(self, message_ids: List[int]) -> bool:
+        """Mark outbox messages as delivered"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            cur.execute("""
+                UPDATE email_outbox
+                SET status = 'sent',
+                    sent_at = NOW(),
+                    locked_until = NULL,
+                    last_error = NULL
+                WHERE id = ANY(%s)
+            """, (list(message_ids),))
+            
+            conn.commit()
+            return True
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error marking outbox messages sent: {str(e)}")
+            return False
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def mark_outbox_failed(self, message_id: int, error: str, retry_in: float, max_attempts: int) -> bool:
+        """Schedule a retry for a failed outbox message, or dead-letter it after max_attempts"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            cur.execute("""
+                UPDATE email_outbox
+                SET status = CASE WHEN attempts >= %s THEN 'dead' ELSE 'pending' END,
+                    next_attempt_at = NOW() + make_interval(secs => %s),
+                    locked_until = NULL,
+                    last_error = %s
+                WHERE id = %s
+            """, (max_attempts, retry_in, error[:1000], message_id))
+            
+            conn.commit()
+            return True
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error marking outbox message failed: {str(e)}")
+            return False
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def record_storage_usage(self, bucket: str, delta_bytes: int, delta_objects: int) -> bool:
+        """Apply an object upload (+) or delete (-) to a bucket's ledger total"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            cur.execute(
+                "SELECT record_storage_usage(%s, %s, %s)",
+                (bucket, delta_bytes, delta_objects)
+            )
+            
+            conn.commit()
+            return True
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error recording storage usage: {str(e)}")
+            return False
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def get_bucket_storage_snapshot(self, bucket: str) -> Optional[Dict[str, Any]]:
+        """A bucket's ledger total, per-contact rows and per-contact document totals, read from one snapshot"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            cur.execute("""
+                SELECT total_bytes, object_count
+                FROM storage_bucket_usage
+                WHERE bucket = %s
+            """, (bucket,))
+            total = cur.fetchone()
+            
+            cur.execute("""
+                SELECT contact_id, total_bytes, object_count
+                FROM storage_usage
+                WHERE bucket = %s
+            """, (bucket,))
+            rows = cur.fetchall()
+            
+            cur.execute("""
+                SELECT contact_id, SUM(size) AS total_bytes, COUNT(*) AS object_count
+                FROM documents
+                WHERE s3_bucket = %s
+                GROUP BY contact_id
+            """, (bucket,))
+            documents = cur.fetchall()
+            
+            conn.commit()
+            return {
+                'total': dict(total) if total else {'total_bytes': 0, 'object_count': 0},
+                'contacts': {row['contact_id']: {'total_bytes': row['total_bytes'], 'object_count': row['object_count']}
+                             for row in rows},
+                'documents': {row['contact_id']: {'total_bytes': int(row['total_bytes']), 'object_count': row['object_count']}
+                              for row in documents}
+            }
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error getting bucket storage snapshot: {str(e)}")
+            return None
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def apply_storage_reconciliation(self, bucket: str, total_bytes: int, total_objects: int,
+                                     contact_deltas: List[Tuple[str, int, int]]) -> bool:
+        """Add reconciliation deltas to a bucket's ledger rows and mark them reconciled"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            cur.execute("""
+                INSERT INTO storage_bucket_usage (bucket, total_bytes, object_count, last_updated, last_reconciled)
+                VALUES (%(bucket)s, GREATEST(%(bytes)s, 0), GREATEST(%(objects)s, 0), NOW(), NOW())
+                ON CONFLICT (bucket) DO UPDATE
+                SET total_bytes = GREATEST(storage_bucket_usage.total_bytes + %(bytes)s, 0),
+                    object_count = GREATEST(storage_bucket_usage.object_count + %(objects)s, 0),
+                    last_updated = NOW(),
+                    last_reconciled = NOW()
+            """, {'bucket': bucket, 'bytes': total_bytes, 'objects': total_objects})
+            cur.executemany("""
+                INSERT INTO storage_usage (bucket, contact_id, total_bytes, object_count, last_updated)
+                VALUES (%(bucket)s, %(contact_id)s, GREATEST(%(bytes)s, 0), GREATEST(%(objects)s, 0), NOW())
+                ON CONFLICT (bucket, contact_id) DO UPDATE
+                SET total_bytes = GREATEST(storage_usage.total_bytes + %(bytes)s, 0),
+                    object_count = GREATEST(storage_usage.object_count + %(objects)s, 0),
+                    last_updated = NOW()
+            """, [{'bucket': bucket, 'contact_id': contact_id, 'bytes': delta_bytes, 'objects': delta_objects}
+                  for contact_id, delta_bytes, delta_objects in contact_deltas])
+            cur.execute("UPDATE storage_usage SET last_reconciled = NOW() WHERE bucket = %s", (bucket,))
+            
+            conn.commit()
+            return True
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error applying storage reconciliation: {str(e)}")
+            return False
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def get_storage_usage(self) -> Dict[str, Dict[str, Any]]:
+        """Get per-bucket totals from the storage usage ledger"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cur.execute("""
+                SELECT bucket, total_bytes, object_count, last_reconciled
+                FROM storage_bucket_usage
+            """)
+            
+            return {row['bucket']: format_usage(row) for row in cur.fetchall()}
+            
+        except Exception as e:
+            logger.error(f"Error getting storage usage: {str(e)}")
+            return {}
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def get_contact_storage_usage(self, contact_id: str) -> Dict[str, Any]:
+        """Get a contact's storage totals across buckets from the ledger"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cur.execute("""
+                SELECT bucket, total_bytes, object_count, last_reconciled
+                FROM storage_usage
+                WHERE contact_id = %s
+            """, (contact_id,))
+            
+            return build_contact_usage(contact_id, cur.fetchall())
+            
+        except Exception as e:
+            logger.error(f"Error getting contact storage usage: {str(e)}")
+            return build_contact_usage(contact_id, [])
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def get_content_blob(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """Get the stored blob for a file hash"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cur.execute("""
+                SELECT sha256, bucket, s3_key, size, ref_count, deleting
+                FROM content_blobs
+                WHERE sha256 = %s
+            """, (sha256,))
+            
+            row = cur.fetchone()
+            return dict(row) if row else None
+            
+        except Exception as e:
+            logger.error(f"Error getting content blob: {str(e)}")
+            return None
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def register_content_blob(self, sha256: str, bucket: str, s3_key: str, size: int,
+                              content_type: str) -> Optional[Dict[str, Any]]:
+        """Create a blob's row if needed (None while it is being deleted).
+        
+        References are taken by a trigger when the document row is inserted.
+        An unreferenced blob restarts its grace period here, so the garbage
+        collector leaves it alone until that insert.
+        """
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cur.execute("""
+                INSERT INTO content_blobs (sha256, bucket, s3_key, size, content_type, ref_count, released_at)
+                VALUES (%s, %s, %s, %s, %s, 0, NOW())
+                ON CONFLICT (sha256) DO UPDATE
+                SET released_at = CASE WHEN content_blobs.ref_count = 0 THEN NOW() ELSE content_blobs.released_at END
+                WHERE NOT content_blobs.deleting
+                RETURNING bucket, s3_key, ref_count, (xmax = 0) AS created
+            """, (sha256, bucket, s3_key, size, content_type))
+            
+            row = cur.fetchone()
+            conn.commit()
+            return dict(row) if row else None
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error registering content blob: {str(e)}")
+            return None
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def claim_orphan_blobs(self, grace_seconds: float, limit: int) -> List[Dict[str, Any]]:
+        """Mark unreferenced blobs past the grace period for deletion and return them"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cur.execute("""
+                UPDATE content_blobs
+                SET deleting = TRUE
+                WHERE sha256 IN (
+                    SELECT sha256 FROM content_blobs
+                    WHERE ref_count = 0
+                      AND released_at < NOW() - make_interval(secs => %s)
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING sha256, bucket, s3_key
+            """, (grace_seconds, limit))
+            
+            blobs = [dict(row) for row in cur.fetchall()]
+            conn.commit()
+            return blobs
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error claiming orphan blobs: {str(e)}")
+            return []
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def delete_content_blobs(self, hashes: List[str]) -> bool:
+        """Remove blob rows whose objects have been deleted"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            cur.execute(
+                "DELETE FROM content_blobs WHERE sha256 = ANY(%s) AND deleting RETURNING sha256",
+                (list(hashes),)
+            )
+            # Cached extraction results go with the bytes they describe
+            cur.execute(
+                "DELETE FROM extraction_results WHERE sha256 = ANY(%s)",
+                ([row[0] for row in cur.fetchall()],)
+            )
+            
+            conn.commit()
+            return True
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error deleting content blobs: {str(e)}")
+            return False
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def copy_document_results(self, document_id: str, file_hash: str) -> Optional[Dict[str, Any]]:
+        """Copy processing results from a completed document with the same file hash"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cur.execute("""
+                UPDATE documents d
+                SET processing_status = s.processing_status,
+                    processing_metadata = s.processing_metadata,
+                    complexity_score = s.complexity_score,
+                    processing_timestamp = NOW()
+                FROM (
+                    SELECT id, processing_status, processing_metadata, complexity_score
+                    FROM documents
+                    WHERE file_hash = %s
+                      AND id <> %s
+                      AND processing_status = 'completed'
+                    ORDER BY processing_timestamp DESC NULLS LAST
+                    LIMIT 1
+                ) s
+                WHERE d.id = %s
+                RETURNING s.id::text AS source_id, d.processing_metadata, d.complexity_score, d.processing_timestamp
+            """, (file_hash, document_id, document_id))
+            
+            row = cur.fetchone()
+            conn.commit()
+            return dict(row) if row else None
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error copying document results: {str(e)}")
+            return None
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def enqueue_processing_jobs(self, objects: List[Tuple[str, str]], source: str) -> int:
+        """Queue processing for (bucket, key) objects.
+        
+        An object with a pending job is skipped; one whose job is being
+        processed has it re-armed to run again once that run finishes.
+        """
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            cur.execute("""
+                INSERT INTO processing_jobs (bucket, s3_key, source)
+                SELECT DISTINCT bucket, s3_key, %s
+                FROM unnest(%s::text[], %s::text[]) AS o(bucket, s3_key)
+                ON CONFLICT (bucket, s3_key) WHERE status IN ('pending', 'processing') DO UPDATE
+                SET requeue = TRUE
+                WHERE processing_jobs.status = 'processing'
+            """, (source, [bucket for bucket, _ in objects], [key for _, key in objects]))
+            
+            queued = cur.rowcount
+            conn.commit()
+            return queued
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error enqueuing processing jobs: {str(e)}")
+            return 0
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def enqueue_pending_documents(self, min_age_seconds: float) -> int:
+        """Queue jobs for documents pending longer than min_age_seconds without one"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            cur.execute(
+                "SELECT enqueue_pending_documents(make_interval(secs => %s))",
+                (min_age_seconds,)
+            )
+            
+            queued = cur.fetchone()[0]
+            conn.commit()
+            return queued
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error enqueuing pending documents: {str(e)}")
+            return 0
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def claim_processing_jobs(self, limit: int, lease_seconds: int) -> List[Dict[str, Any]]:
+        """Lease due processing jobs, including ones whose lease expired (safe across replicas via SKIP LOCKED)"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cur.execute("""
+                UPDATE processing_jobs
+                SET status = 'processing',
+                    attempts = attempts + 1,
+                    requeue = FALSE,
+                    locked_until = NOW() + make_interval(secs => %s)
+                WHERE id IN (
+                    SELECT id FROM processing_jobs
+                    WHERE (status = 'pending' AND next_attempt_at <= NOW())
+                       OR (status = 'processing' AND locked_until < NOW())
+                    ORDER BY next_attempt_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, bucket, s3_key, source, attempts
+            """, (lease_seconds, limit))
+            
+            jobs = [dict(row) for row in cur.fetchall()]
+            conn.commit()
+            return jobs
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error claiming processing jobs: {str(e)}")
+            return []
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def extend_processing_lease(self, job_id: int, attempts: int, lease_seconds: int) -> bool:
+        """Renew a job lease; False if the lease was lost to another worker"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            cur.execute("""
+                UPDATE processing_jobs
+                SET locked_until = NOW() + make_interval(secs => %s)
+                WHERE id = %s AND attempts = %s AND status = 'processing'
+            """, (lease_seconds, job_id, attempts))
+            
+            extended = cur.rowcount == 1
+            conn.commit()
+            return extended
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error extending processing lease: {str(e)}")
+            return False
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def complete_processing_job(self, job_id: int, attempts: int) -> bool:
+        """Mark a leased job as done (or due again if it was re-armed); False if the lease was lost"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            cur.execute("""
+                UPDATE processing_jobs
+                SET status = CASE WHEN requeue THEN 'pending' ELSE 'completed' END,
+                    completed_at = CASE WHEN requeue THEN NULL ELSE NOW() END,
+                    next_attempt_at = NOW(),
+                    requeue = FALSE,
+                    locked_until = NULL,
+                    last_error = NULL
+                WHERE id = %s AND attempts = %s AND status = 'processing'
+            """, (job_id, attempts))
+            
+            completed = cur.rowcount == 1
+            conn.commit()
+            return completed
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error completing processing job: {str(e)}")
+            return False
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def fail_processing_job(self, job_id: int, attempts: int, error: str, retry_in: float, max_attempts: int) -> bool:
+        """Schedule a retry for a leased job, or dead-letter it after max_attempts"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            cur.execute("""
+                UPDATE processing_jobs
+                SET status = CASE WHEN attempts >= %s AND NOT requeue THEN 'dead' ELSE 'pending' END,
+                    next_attempt_at = NOW() + make_interval(secs => %s),
+                    requeue = FALSE,
+                    locked_until = NULL,
+                    last_error = %s
+                WHERE id = %s AND attempts = %s AND status = 'processing'
+            """, (max_attempts, retry_in, error[:1000], job_id, attempts))
+            
+            failed = cur.rowcount == 1
+            conn.commit()
+            return failed
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error failing processing job: {str(e)}")
+            return False
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def get_object_documents(self, bucket: str, s3_key: str) -> List[Dict[str, Any]]:
+        """Get every document stored at one object (raises on failure)"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cur.execute("""
+                SELECT 
+                    id::text as document_id,
+                    contact_id,
+                    filename,
+                    size,
+                    content_type,
+                    document_type,
+                    upload_timestamp,
+                    processing_status,
+                    s3_bucket,
+                    s3_key,
+                    file_hash
+                FROM documents
+                WHERE s3_bucket = %s AND s3_key = %s
+            """, (bucket, s3_key))
+            
+            return [dict(row) for row in cur.fetchall()]
+            
+        except Exception as e:
+            logger.error(f"Error getting object documents: {str(e)}")
+            raise
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def complete_document_processing(self, document_id: str, metadata: Dict[str, Any], complexity_score: float) -> bool:
+        """Store processing results and mark a document completed"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            cur.execute("""
+                UPDATE documents
+                SET processing_status = 'completed',
+                    processing_timestamp = NOW(),
+                    processing_metadata = %s,
+                    complexity_score = %s
+                WHERE id = %s
+            """, (_json(metadata), complexity_score, document_id))
+            
+            conn.commit()
+            logger.info(f"Completed processing of document {document_id}")
+            return True
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error completing document processing: {str(e)}")
+            return False
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def record_document_terms(self, document_key: str, terms: List[str]) -> bool:
+        """Add one document's distinct terms to the keyword document frequencies.
+        
+        False if the document was already counted or the update failed.
+        """
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            cur.execute("SELECT record_document_terms(%s, %s::text[])", (document_key, terms))
+            counted = cur.fetchone()[0]
+            
+            conn.commit()
+            return counted
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error recording document terms: {str(e)}")
+            return False
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def get_keyword_document_frequencies(self, min_count: int) -> Optional[Dict[str, Any]]:
+        """Corpus size and the document frequency of every term in at least min_count documents"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            # One snapshot for both reads, so the counts agree with each other
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            cur.execute("SELECT COUNT(*) FROM keyword_corpus_documents")
+            document_count = cur.fetchone()[0]
+            
+            cur.execute("""
+                SELECT term, document_count
+                FROM keyword_document_frequency
+                WHERE document_count >= %s
+            """, (min_count,))
+            frequencies = dict(cur.fetchall())
+            
+            conn.commit()
+            return {'document_count': document_count, 'frequencies': frequencies}
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error getting keyword document frequencies: {str(e)}")
+            return None
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def get_extraction_result(self, sha256: str, extractor_version: str, content_type: str,
+                              file_extension: str) -> Optional[Dict[str, Any]]:
+        """Cached analysis of a file hash under a declared type (counting the hit), or None"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor(cursor_factory=RealDictCursor)
+            
+            cur.execute("""
+                UPDATE extraction_results
+                SET hit_count = hit_count + 1,
+                    last_hit_at = NOW()
+                WHERE sha256 = %s AND extractor_version = %s
+                  AND content_type = %s AND file_extension = %s
+                RETURNING content, text_content, metadata, complexity_score
+            """, (sha256, extractor_version, content_type, file_extension))
+            
+            row = cur.fetchone()
+            conn.commit()
+            return dict(row) if row else None
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error getting extraction result: {str(e)}")
+            return None
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def store_extraction_result(self, sha256: str, extractor_version: str, content_type: str,
+                                file_extension: str, content: Optional[str], text_content: str,
+                                metadata: Dict[str, Any], complexity_score: float) -> bool:
+        """Cache the analysis of a file hash under a declared type; the first stored result is kept"""
+        conn = None
+        try:
+            conn = self.get_connection()
+            cur = conn.cursor()
+            
+            cur.execute("""
+                INSERT INTO extraction_results (
+                    sha256, extractor_version, content_type, file_extension,
+                    content, text_content, metadata, complexity_score
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (sha256, extractor_version, content_type, file_extension) DO NOTHING
+            """, (sha256, extractor_version, content_type, file_extension,
+                  content, text_content, _json(metadata), complexity_score))
+            
+            conn.commit()
+            return True
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error storing extraction result: {str(e)}")
+            return False
+        finally:
+            if conn:
+                cur.close()
+                self.return_connection(conn)
+    
+    def try_advisory_lock(self, name: str) -> Optional[Dict[str, Any]]:
+        """Take a session advisory lock on a dedicated connection; None if another session holds it.
+        
+        The connection is opened outside the pool, since the lock may be held
+        for minutes while callers keep needing pooled connections.
+        """
+        conn = None
+        try:
+            conn = self._dedicated_connection()
+            cur = conn.cursor()
+            cur.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (name,))
+            locked = cur.fetchone()[0]
+            cur.close()
+            conn.commit()
+            
+            if locked:
+                return {'name': name, 'connection': conn}
+            
+        except Exception as e:
+            if conn:
+                conn.rollback()
+            logger.error(f"Error taking advisory lock {name}: {str(e)}")
+        
+        if conn:
+            conn.close()
+        return None
+    
+    def advisory_unlock(self, handle: Dict[str, Any]) -> bool:
+        """Release an advisory lock and close its connection"""
+        conn = handle['connection']
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT pg_advisory_unlock(hashtext(%s))", (handle['name'],))
+            cur.close()
+            conn.commit()
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error releasing advisory lock {handle['name']}: {str(e)}")
+            return False
+        finally:
+            # Closing the session also drops a lock the unlock missed
+            conn.close()
+    
+    def listen(self, channel: str, callback: Callable[[str], None]) -> Optional[Dict[str, Any]]:
+        """Pass NOTIFY payloads on a channel to callback, from a background thread.
+        
+        Uses its own autocommit connection outside the pool. If that connection
+        drops, the thread logs the error and exits; callers should keep polling
+        as a fallback. Returns a handle for unlisten(), or None on failure.
+        """
+        try:
+            conn = self._dedicated_connection()
+            conn.autocommit = True
+            
+            with conn.cursor() as cur:
+                cur.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+            
+        except Exception as e:
+            logger.error(f"Error listening on {channel}: {str(e)}")
+            return None
+        
+        stop = threading.Event()
+        
+        def run():
+            try:
+                while not stop.is_set():
+                    if select.select([conn], [], [], 1.0)[0]:
+                        conn.poll()
+                        while conn.notifies:
+                            callback(conn.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error(f"Listener on {channel} stopped: {str(e)}")
+            finally:
+                conn.close()
+        
+        thread = threading.Thread(target=run, name=f"pg-listen-{channel}", daemon=True)
+        thread.start()
+        
+        logger.info(f"Listening for notifications on {channel}")
+        return {'channel': channel, 'stop': stop, 'thread': thread}
+    
+    def unlisten(self, handle: Dict[str, Any]) -> bool:
+        """Stop a listener started by listen()"""
+        handle['stop'].set()
+        handle['thread'].join(timeout=5)
+        return not handle['thread'].is_alive()
+    
     def _calculate_complexity_score(self, metadata: Dict[str, Any]) -> float:
         """Calculate document complexity score"""
         score = 0.0
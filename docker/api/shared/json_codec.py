@@ -0,0 +1,51 @@
+# JSON Codec - Shared fast JSON encode/decode for API responses and JSONB columns
+import os
+import json
+import uuid
+from decimal import Decimal
+from datetime import datetime, date, time
+from typing import Any
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.opensource.txt
+    orjson = None
+
+# Opt-in: FAST_JSON=true switches responses and JSONB to orjson when it is installed
+FAST_JSON = os.environ.get('FAST_JSON', 'false').lower() == 'true'
+USE_ORJSON = FAST_JSON and orjson is not None
+
+def _default(obj: Any) -> Any:
+    """Types neither encoder handles natively, plus the ones only orjson does"""
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps_bytes(obj: Any) -> bytes:
+    """Encode to compact UTF-8 JSON bytes"""
+    if USE_ORJSON:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def dumps(obj: Any) -> str:
+    """Encode to a JSON string (used as the JSONB adapter)"""
+    return dumps_bytes(obj).decode('utf-8')
+
+def loads(data) -> Any:
+    """Decode JSON text or bytes (used as the JSONB decoder)"""
+    if USE_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with the shared codec (datetime/UUID/Decimal handled uniformly)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
@@ -0,0 +1,176 @@
+# Offload Executor - Bounded thread pools for blocking SDK calls (boto3, meilisearch, SES, psycopg2)
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Per-backend offload metrics
+offload_queue_depth = Gauge(
+    'offload_queue_depth',
+    'Blocking calls waiting for a worker thread',
+    ['backend']
+)
+
+offload_in_flight = Gauge(
+    'offload_in_flight',
+    'Blocking calls currently running on a worker thread',
+    ['backend']
+)
+
+offload_wait_seconds = Histogram(
+    'offload_wait_seconds',
+    'Time a blocking call waited for a worker thread',
+    ['backend']
+)
+
+offload_call_duration_seconds = Histogram(
+    'offload_call_duration_seconds',
+    'Time a blocking call spent running on a worker thread',
+    ['backend']
+)
+
+offload_calls_total = Counter(
+    'offload_calls_total',
+    'Blocking calls by outcome',
+    ['backend', 'outcome']
+)
+
+# Default sizing per backend: (max_workers, max_queue, timeout seconds)
+DEFAULT_BACKENDS = {
+    'postgres': (10, 100, 30.0),
+    'minio': (8, 32, 120.0),
+    'meilisearch': (8, 64, 10.0),
+    'ses': (4, 64, 15.0),
+}
+
+class BackendSaturatedError(RuntimeError):
+    """Raised when a backend's offload queue is full"""
+
+class BackendExecutor:
+    """Thread pool with a concurrency limit, bounded queue and per-call timeout for one backend"""
+
+    def __init__(self, name: str, max_workers: int, max_queue: int, timeout: Optional[float]):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"offload-{name}")
+        self.queued = 0
+        self.running = 0
+        self._lock = threading.Lock()
+
+    def _execute(self, enqueued_at: float, func: Callable, args, kwargs):
+        """Run func on a worker thread, recording wait and run time"""
+        started_at = time.monotonic()
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        offload_queue_depth.labels(backend=self.name).dec()
+        offload_in_flight.labels(backend=self.name).inc()
+        offload_wait_seconds.labels(backend=self.name).observe(started_at - enqueued_at)
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+            offload_in_flight.labels(backend=self.name).dec()
+            offload_call_duration_seconds.labels(backend=self.name).observe(time.monotonic() - started_at)
+
+    async def run(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run a blocking callable on this backend's pool and await the result.
+
+        A timed-out call is abandoned by the caller but the worker thread
+        keeps running it to completion; SDK-level timeouts should still be set.
+        timeout overrides the backend default for this call (0 disables it).
+        """
+        if self.queued >= self.max_queue:
+            offload_calls_total.labels(backend=self.name, outcome='rejected').inc()
+            raise BackendSaturatedError(f"{self.name} offload queue full ({self.max_queue} waiting)")
+
+        with self._lock:
+            self.queued += 1
+        offload_queue_depth.labels(backend=self.name).inc()
+
+        submitted = self.pool.submit(self._execute, time.monotonic(), func, args, kwargs)
+
+        try:
+            result = await asyncio.wait_for(
+                asyncio.wrap_future(submitted),
+                (timeout if timeout is not None else self.timeout) or None
+            )
+            offload_calls_total.labels(backend=self.name, outcome='success').inc()
+            return result
+        except asyncio.TimeoutError:
+            offload_calls_total.labels(backend=self.name, outcome='timeout').inc()
+            logger.warning(f"Offloaded {self.name} call {getattr(func, '__name__', func)} timed out")
+            raise
+        except Exception:
+            offload_calls_total.labels(backend=self.name, outcome='error').inc()
+            raise
+        finally:
+            # Calls cancelled before a worker picked them up never reach _execute
+            if submitted.cancelled():
+                with self._lock:
+                    self.queued -= 1
+                offload_queue_depth.labels(backend=self.name).dec()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get current pool occupancy"""
+        return {
+            'max_workers': self.max_workers,
+            'max_queue': self.max_queue,
+            'timeout': self.timeout,
+            'queued': self.queued,
+            'running': self.running
+        }
+
+    def shutdown(self):
+        """Stop accepting work and release worker threads"""
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+class OffloadExecutor:
+    """Registry of per-backend executors so a slow backend cannot starve the others.
+
+    Sizing is read from OFFLOAD_<BACKEND>_WORKERS, OFFLOAD_<BACKEND>_QUEUE and
+    OFFLOAD_<BACKEND>_TIMEOUT (seconds, 0 disables the timeout).
+    """
+
+    def __init__(self):
+        self.backends: Dict[str, BackendExecutor] = {}
+
+        for name, (workers, queue, timeout) in DEFAULT_BACKENDS.items():
+            self.register(name, workers, queue, timeout)
+
+    def register(self, name: str, max_workers: int, max_queue: int, timeout: Optional[float]) -> BackendExecutor:
+        """Register a backend, applying environment overrides"""
+        prefix = f"OFFLOAD_{name.upper()}"
+        max_workers = int(os.environ.get(f"{prefix}_WORKERS", max_workers))
+        max_queue = int(os.environ.get(f"{prefix}_QUEUE", max_queue))
+        timeout = float(os.environ.get(f"{prefix}_TIMEOUT", timeout or 0)) or None
+
+        executor = BackendExecutor(name, max_workers, max_queue, timeout)
+        self.backends[name] = executor
+
+        logger.info(f"Offload backend '{name}': workers={max_workers}, queue={max_queue}, timeout={timeout}")
+        return executor
+
+    async def run(self, backend: str, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable on the named backend's pool"""
+        return await self.backends[backend].run(func, *args, **kwargs)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get occupancy for every backend"""
+        return {name: executor.get_stats() for name, executor in self.backends.items()}
+
+    def shutdown(self):
+        """Shut down all backend pools"""
+        for executor in self.backends.values():
+            executor.shutdown()
+        logger.info("Offload executors shut down")
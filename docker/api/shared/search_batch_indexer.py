@@ -0,0 +1,255 @@
+# Meilisearch Batch Indexer - Coalesces single-document writes into batched tasks
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime
+from prometheus_client import Counter, Gauge, Histogram
+
+from shared.search_service_meilisearch import MeilisearchService
+from shared.offload_executor import OffloadExecutor
+
+logger = logging.getLogger(__name__)
+
+# Queued by stop(): the flush loop submits the batch it holds and exits
+_STOP = object()
+
+search_index_queue_depth = Gauge(
+    'search_index_queue_depth',
+    'Documents waiting to be batched for Meilisearch'
+)
+
+search_index_pending_tasks = Gauge(
+    'search_index_pending_tasks',
+    'Submitted Meilisearch indexing tasks not yet finished'
+)
+
+search_index_batch_size = Histogram(
+    'search_index_batch_size',
+    'Documents per Meilisearch indexing batch',
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+)
+
+search_index_documents_total = Counter(
+    'search_index_documents_total',
+    'Documents indexed in Meilisearch by outcome',
+    ['outcome']
+)
+
+class MeilisearchBatchIndexer:
+    """Queue that coalesces documents into Meilisearch batches by size or time window.
+
+    enqueue() returns as soon as the document is queued. A flush loop submits
+    a batch when MEILI_BATCH_SIZE documents are waiting or MEILI_BATCH_WINDOW
+    seconds have passed since the first one, without waiting for the task.
+    A second loop polls submitted task UIDs and reports failures. A task
+    Meilisearch no longer knows (404, e.g. pruned) or whose status cannot be
+    read MEILI_TASK_MAX_ERRORS times in a row is dropped as 'lost'.
+    """
+
+    def __init__(self, search_service: MeilisearchService, offload_executor: OffloadExecutor):
+        self.search_service = search_service
+        self.offload_executor = offload_executor
+
+        # Configuration
+        self.batch_size = int(os.environ.get('MEILI_BATCH_SIZE', '500'))
+        self.batch_window = float(os.environ.get('MEILI_BATCH_WINDOW', '0.5'))
+        self.task_poll_interval = float(os.environ.get('MEILI_TASK_POLL_INTERVAL', '1'))
+        self.task_max_errors = int(os.environ.get('MEILI_TASK_MAX_ERRORS', '5'))
+        max_queue = int(os.environ.get('MEILI_INDEX_QUEUE_SIZE', '10000'))
+
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.pending_tasks: Dict[int, Dict[str, Any]] = {}
+        self.recent_failures = deque(maxlen=50)
+
+        self.running = False
+        self.flush_task = None
+        self.track_task = None
+
+    async def start(self):
+        """Start the flush and task-tracking loops"""
+        if self.running:
+            logger.warning("Meilisearch batch indexer already running")
+            return
+
+        self.running = True
+        self.flush_task = asyncio.create_task(self._flush_loop())
+        self.track_task = asyncio.create_task(self._track_loop())
+        logger.info(f"Meilisearch batch indexer started (batch={self.batch_size}, window={self.batch_window}s)")
+
+    async def stop(self):
+        """Flush queued documents and stop both loops"""
+        if not self.running:
+            return
+
+        self.running = False
+
+        # Let the flush loop submit everything queued before the marker,
+        # including the batch it is collecting, instead of cancelling it
+        await self.queue.put(_STOP)
+        await asyncio.gather(self.flush_task, return_exceptions=True)
+        self.flush_task = None
+
+        self.track_task.cancel()
+        await asyncio.gather(self.track_task, return_exceptions=True)
+        self.track_task = None
+
+        # Submit documents queued after the marker
+        while not self.queue.empty():
+            batch, _ = self._drain(self.batch_size)
+            await self._submit(batch)
+
+        logger.info("Meilisearch batch indexer stopped")
+
+    async def enqueue(self, document: Dict[str, Any]):
+        """Queue a document for indexing (waits only if the queue is full)"""
+        await self.queue.put(document)
+        search_index_queue_depth.set(self.queue.qsize())
+
+    async def enqueue_many(self, documents: List[Dict[str, Any]]):
+        """Queue several documents for indexing"""
+        for document in documents:
+            await self.queue.put(document)
+        search_index_queue_depth.set(self.queue.qsize())
+
+    def _drain(self, limit: int) -> Tuple[List[Dict[str, Any]], bool]:
+        """Take up to limit documents that are already queued; True once the stop marker is taken"""
+        batch = []
+        while len(batch) < limit and not self.queue.empty():
+            document = self.queue.get_nowait()
+            if document is _STOP:
+                return batch, True
+            batch.append(document)
+        return batch, False
+
+    async def _flush_loop(self):
+        """Collect a batch by size or time window and submit it, until stop() queues the marker"""
+        stopping = False
+        while not stopping:
+            try:
+                document = await self.queue.get()
+                if document is _STOP:
+                    break
+
+                batch = [document]
+                deadline = time.monotonic() + self.batch_window
+
+                while len(batch) < self.batch_size and not stopping:
+                    drained, stopping = self._drain(self.batch_size - len(batch))
+                    batch.extend(drained)
+                    remaining = deadline - time.monotonic()
+                    if stopping or len(batch) >= self.batch_size or remaining <= 0:
+                        break
+                    try:
+                        document = await asyncio.wait_for(self.queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    if document is _STOP:
+                        stopping = True
+                    else:
+                        batch.append(document)
+
+                await self._submit(batch)
+
+            except asyncio.CancelledError:
+                logger.info("Meilisearch flush loop cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error in Meilisearch flush loop: {str(e)}")
+                await asyncio.sleep(1)
+
+    async def _submit(self, batch: List[Dict[str, Any]]):
+        """Send one batch as a single add_documents task"""
+        if not batch:
+            return
+
+        search_index_queue_depth.set(self.queue.qsize())
+        search_index_batch_size.observe(len(batch))
+
+        try:
+            uid = await self.offload_executor.run('meilisearch', self.search_service.submit_documents, batch)
+            self.pending_tasks[uid] = {
+                'document_ids': [document['id'] for document in batch],
+                'submitted_at': time.time(),
+                'errors': 0
+            }
+            search_index_pending_tasks.set(len(self.pending_tasks))
+            logger.info(f"Submitted Meilisearch batch task {uid} ({len(batch)} documents)")
+
+        except Exception as e:
+            search_index_documents_total.labels(outcome='submit_error').inc(len(batch))
+            self._record_failure(None, [document['id'] for document in batch], str(e))
+
+    async def _track_loop(self):
+        """Poll submitted tasks until they succeed or fail"""
+        while self.running:
+            try:
+                await asyncio.sleep(self.task_poll_interval)
+
+                for uid in list(self.pending_tasks):
+                    try:
+                        status = await self.offload_executor.run(
+                            'meilisearch', self.search_service.get_task_status, uid
+                        )
+                    except Exception as e:
+                        self._task_status_error(uid, e)
+                        continue
+
+                    if status['status'] not in ('succeeded', 'failed', 'canceled'):
+                        self.pending_tasks[uid]['errors'] = 0
+                        continue
+
+                    task = self.pending_tasks.pop(uid)
+                    if status['status'] == 'succeeded':
+                        # The batch is now visible to searches; drop results cached while it was pending
+                        self.search_service.bump_generation()
+                        search_index_documents_total.labels(outcome='success').inc(len(task['document_ids']))
+                    else:
+                        search_index_documents_total.labels(outcome='failed').inc(len(task['document_ids']))
+                        self._record_failure(uid, task['document_ids'], str(status['error']))
+
+                search_index_pending_tasks.set(len(self.pending_tasks))
+
+            except asyncio.CancelledError:
+                logger.info("Meilisearch task tracker cancelled")
+                break
+            except Exception as e:
+                logger.error(f"Error tracking Meilisearch tasks: {str(e)}")
+
+    def _task_status_error(self, uid: int, error: Exception):
+        """Count a failed status poll; give up on the task if it is gone or keeps failing"""
+        task = self.pending_tasks[uid]
+        task['errors'] += 1
+        missing = getattr(error, 'status_code', None) == 404
+        if not missing and task['errors'] < self.task_max_errors:
+            logger.warning(f"Could not get status of Meilisearch task {uid}: {str(error)}")
+            return
+
+        del self.pending_tasks[uid]
+        # The batch may well be visible by now; drop results cached while it was pending
+        self.search_service.bump_generation()
+        search_index_documents_total.labels(outcome='lost').inc(len(task['document_ids']))
+        self._record_failure(uid, task['document_ids'], f"Task status unavailable: {str(error)}")
+
+    def _record_failure(self, uid: Optional[int], document_ids: List[str], error: str):
+        """Keep recent failures for the status endpoint and log them"""
+        self.recent_failures.append({
+            'task_uid': uid,
+            'document_count': len(document_ids),
+            'document_ids': document_ids[:10],
+            'error': error,
+            'timestamp': datetime.utcnow().isoformat() + 'Z'
+        })
+        logger.error(f"Meilisearch batch {uid} failed for {len(document_ids)} documents: {error}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get indexer status"""
+        return {
+            'running': self.running,
+            'queued_documents': self.queue.qsize(),
+            'pending_tasks': len(self.pending_tasks),
+            'recent_failures': list(self.recent_failures),
+            'timestamp': datetime.utcnow().isoformat() + 'Z'
+        }
@@ -0,0 +1,97 @@
+# Search Result Cache - LRU + TTL cache in front of MeilisearchService.search_documents
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from prometheus_client import Counter, Gauge
+
+from shared.search_service_meilisearch import MeilisearchService
+
+search_cache_requests_total = Counter(
+    'search_cache_requests_total',
+    'Search result cache lookups',
+    ['result']
+)
+
+search_cache_entries = Gauge(
+    'search_cache_entries',
+    'Search result cache entries'
+)
+
+class SearchResultCache:
+    """Caches search results keyed on the normalized (query, filters, limit).
+
+    Entries remember the search service generation they were computed at;
+    any index write bumps the generation, so older entries miss. The
+    generation is per process, so SEARCH_CACHE_TTL also bounds how long
+    another worker's writes can go unseen.
+    """
+
+    def __init__(self, search_service: MeilisearchService):
+        self.search_service = search_service
+        self.max_entries = int(os.environ.get('SEARCH_CACHE_MAX_ENTRIES', '1024'))
+        self.ttl = float(os.environ.get('SEARCH_CACHE_TTL', '30'))
+        self.enabled = self.max_entries > 0 and self.ttl > 0
+
+        # key -> (generation, expires_at, result)
+        self.entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query: str, filters: Optional[Dict], limit: int) -> Tuple[str, str, int]:
+        """Normalize query whitespace/case and filter ordering"""
+        normalized_query = ' '.join(query.lower().split())
+        normalized_filters = json.dumps(filters or {}, sort_keys=True, default=str)
+        return normalized_query, normalized_filters, limit
+
+    def get(self, query: str, filters: Optional[Dict], limit: int) -> Optional[Dict[str, Any]]:
+        """Return a cached result, or None on miss/stale"""
+        if not self.enabled:
+            return None
+
+        key = self.make_key(query, filters, limit)
+
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                generation, expires_at, result = entry
+                if generation == self.search_service.generation and expires_at > time.monotonic():
+                    self.entries.move_to_end(key)
+                    search_cache_requests_total.labels(result='hit').inc()
+                    return result
+                del self.entries[key]
+
+        search_cache_requests_total.labels(result='miss').inc()
+        return None
+
+    def put(self, query: str, filters: Optional[Dict], limit: int, generation: int, result: Dict[str, Any]):
+        """Store a result computed at the given generation (failed searches are not cached)"""
+        if not self.enabled or result.get('error'):
+            return
+
+        key = self.make_key(query, filters, limit)
+
+        with self._lock:
+            self.entries[key] = (generation, time.monotonic() + self.ttl, result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            search_cache_entries.set(len(self.entries))
+
+    def clear(self):
+        """Drop all entries"""
+        with self._lock:
+            self.entries.clear()
+            search_cache_entries.set(0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache occupancy"""
+        return {
+            'enabled': self.enabled,
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'generation': self.search_service.generation
+        }
@@ -7,6 +7,17 @@ import meilisearch
 
 logger = logging.getLogger(__name__)
 
+def task_uid(task) -> int:
+    """Read the task UID from a TaskInfo model or a raw dict response"""
+    uid = getattr(task, 'task_uid', None)
+    return uid if uid is not None else task['taskUid']
+
+def task_field(task, name: str, default=None):
+    """Read a field from a Task model or a raw dict response"""
+    if isinstance(task, dict):
+        return task.get(name, default)
+    return getattr(task, name, default)
+
 class MeilisearchService:
     """Meilisearch service replacing AWS OpenSearch"""
     
@@ -21,8 +32,15 @@ class MeilisearchService:
         self.index_name = os.environ.get('MEILISEARCH_INDEX', 'documents')
         self._index = None
         
+        # Bumped on every index write so cached search results can be invalidated
+        self.generation = 0
+        
         logger.info(f"Meilisearch client initialized: {self.url}")
     
+    def bump_generation(self):
+        """Mark previously cached search results as stale"""
+        self.generation += 1
+    
     def get_index(self):
         """Get or create Meilisearch index"""
         if self._index is None:
@@ -39,7 +57,7 @@ class MeilisearchService:
         try:
             # Create index
             task = self.client.create_index(self.index_name, {'primaryKey': 'id'})
-            self.client.wait_for_task(task['taskUid'])
+            self.client.wait_for_task(task_uid(task))
             
             self._index = self.client.get_index(self.index_name)
             
@@ -86,43 +104,45 @@ class MeilisearchService:
             logger.error(f"Error creating Meilisearch index: {str(e)}")
             return False
     
+    @staticmethod
+    def to_meili_document(document: Dict[str, Any]) -> Dict[str, Any]:
+        """Prepare document for Meilisearch, flattening nested structures for better searching"""
+        return {
+            'id': document['id'],
+            'contact_id': document['contact_id'],
+            'filename': document['filename'],
+            'document_type': document['document_type'],
+            'content': document.get('content', ''),
+            'text_content': document.get('text_content', ''),
+            'upload_timestamp': document['upload_timestamp'],
+            'processing_timestamp': document.get('processing_timestamp', ''),
+            
+            # Flatten metadata for searching
+            'word_count': document.get('metadata', {}).get('word_count', 0),
+            'character_count': document.get('metadata', {}).get('character_count', 0),
+            'file_extension': document.get('metadata', {}).get('file_extension', ''),
+            'language_detected': document.get('metadata', {}).get('language_detected', 'en'),
+            'keywords': document.get('metadata', {}).get('keywords', []),
+            
+            # Processing info
+            'processing_status': document.get('processing_info', {}).get('status', 'unknown'),
+            'complexity_score': document.get('processing_info', {}).get('complexity_score', 0.0),
+            
+            # S3 metadata
+            's3_bucket': document.get('s3_metadata', {}).get('bucket', ''),
+            's3_key': document.get('s3_metadata', {}).get('key', ''),
+            'size': document.get('s3_metadata', {}).get('size', 0),
+        }
+    
     def index_document(self, document: Dict[str, Any]) -> bool:
-        """Index document in Meilisearch (replaces OpenSearch index)"""
+        """Index document in Meilisearch and wait for the task (replaces OpenSearch index)"""
         try:
             index = self.get_index()
             
-            # Prepare document for Meilisearch
-            # Flatten nested structures for better searching
-            meili_document = {
-                'id': document['id'],
-                'contact_id': document['contact_id'],
-                'filename': document['filename'],
-                'document_type': document['document_type'],
-                'content': document.get('content', ''),
-                'text_content': document.get('text_content', ''),
-                'upload_timestamp': document['upload_timestamp'],
-                'processing_timestamp': document.get('processing_timestamp', ''),
-                
-                # Flatten metadata for searching
-                'word_count': document.get('metadata', {}).get('word_count', 0),
-                'character_count': document.get('metadata', {}).get('character_count', 0),
-                'file_extension': document.get('metadata', {}).get('file_extension', ''),
-                'language_detected': document.get('metadata', {}).get('language_detected', 'en'),
-                'keywords': document.get('metadata', {}).get('keywords', []),
-                
-                # Processing info
-                'processing_status': document.get('processing_info', {}).get('status', 'unknown'),
-                'complexity_score': document.get('processing_info', {}).get('complexity_score', 0.0),
-                
-                # S3 metadata
-                's3_bucket': document.get('s3_metadata', {}).get('bucket', ''),
-                's3_key': document.get('s3_metadata', {}).get('key', ''),
-                'size': document.get('s3_metadata', {}).get('size', 0),
-            }
-            
             # Add document
-            task = index.add_documents([meili_document])
-            self.client.wait_for_task(task['taskUid'])
+            task = index.add_documents([self.to_meili_document(document)])
+            self.client.wait_for_task(task_uid(task))
+            self.bump_generation()
             
             logger.info(f"Indexed document in Meilisearch: {document['id']}")
             return True
@@ -131,6 +151,22 @@ class MeilisearchService:
             logger.error(f"Error indexing document: {str(e)}")
             return False
     
+    def submit_documents(self, documents: List[Dict[str, Any]]) -> int:
+        """Add a batch of documents in one Meilisearch task without waiting; returns the task UID"""
+        index = self.get_index()
+        task = index.add_documents([self.to_meili_document(document) for document in documents])
+        self.bump_generation()
+        return task_uid(task)
+    
+    def get_task_status(self, uid: int) -> Dict[str, Any]:
+        """Get status and error (if any) of a Meilisearch task"""
+        task = self.client.get_task(uid)
+        return {
+            'uid': uid,
+            'status': task_field(task, 'status', 'unknown'),
+            'error': task_field(task, 'error')
+        }
+    
     def search_documents(self, query: str, filters: Optional[Dict] = None, limit: int = 10) -> Dict[str, Any]:
         """Search documents in Meilisearch (replaces OpenSearch search)"""
         try:
@@ -188,14 +224,15 @@ class MeilisearchService:
             
         except Exception as e:
             logger.error(f"Error searching documents: {str(e)}")
-            return {'results': [], 'total_count': 0, 'query': query, 'processing_time': 0.0}
+            return {'results': [], 'total_count': 0, 'query': query, 'processing_time': 0.0, 'error': str(e)}
     
     def get_document_by_id(self, document_id: str) -> Optional[Dict[str, Any]]:
         """Get document by ID from Meilisearch"""
         try:
             index = self.get_index()
             document = index.get_document(document_id)
-            return document
+            # The client wraps documents in a model object
+            return document if isinstance(document, dict) else dict(vars(document))
             
         except Exception as e:
             logger.error(f"Error getting document by ID: {str(e)}")
@@ -206,7 +243,8 @@ class MeilisearchService:
         try:
             index = self.get_index()
             task = index.delete_document(document_id)
-            self.client.wait_for_task(task['taskUid'])
+            self.client.wait_for_task(task_uid(task))
+            self.bump_generation()
             
             logger.info(f"Deleted document from index: {document_id}")
             return True
@@ -0,0 +1,22 @@
+# Storage Events - Parses S3/MinIO bucket notification payloads
+from typing import Dict, Any, List, Tuple
+from urllib.parse import unquote_plus
+
+def created_objects(payload: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(bucket, key) for every ObjectCreated record in an S3-style event payload.
+
+    Keys arrive URL-encoded (spaces as '+'), as in S3 notifications.
+    """
+    objects = []
+    for record in payload.get('Records') or []:
+        # MinIO prefixes event names with 's3:', AWS does not
+        if not str(record.get('eventName', '')).removeprefix('s3:').startswith('ObjectCreated:'):
+            continue
+
+        s3 = record.get('s3') or {}
+        bucket = (s3.get('bucket') or {}).get('name')
+        key = (s3.get('object') or {}).get('key')
+        if bucket and key:
+            objects.append((bucket, unquote_plus(key)))
+
+    return objects
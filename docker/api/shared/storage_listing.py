@@ -0,0 +1,98 @@
+# Storage Listing - Async, bounded-memory object listing over MinIOStorageService
+import os
+import asyncio
+import logging
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional
+
+from shared.storage_service_minio import MinIOStorageService
+from shared.offload_executor import OffloadExecutor
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+class ObjectLister:
+    """Streams bucket listings to async code one page at a time.
+
+    Each page is fetched on the 'minio' offload pool, so the event loop never
+    blocks and at most one page per prefix is in memory. walk() can split a
+    prefix at its next delimiter level and list the sub-prefixes concurrently.
+    """
+
+    def __init__(self, storage_service: MinIOStorageService, offload_executor: OffloadExecutor):
+        self.storage_service = storage_service
+        self.offload_executor = offload_executor
+        self.page_size = int(os.environ.get('S3_LIST_PAGE_SIZE', '1000'))
+        self.concurrency = int(os.environ.get('S3_LIST_CONCURRENCY', '4'))
+
+    async def pages(self, prefix: str = '', bucket: Optional[str] = None,
+                    delimiter: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield listing pages ({'objects', 'prefixes'})"""
+        page_iter = self.storage_service.iter_pages(prefix, bucket, delimiter, self.page_size)
+        while True:
+            page = await self.offload_executor.run('minio', next, page_iter, _DONE)
+            if page is _DONE:
+                return
+            yield page
+
+    async def objects(self, prefix: str = '', bucket: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every object under a prefix"""
+        async for page in self.pages(prefix, bucket):
+            for obj in page['objects']:
+                yield obj
+
+    async def walk(self, prefix: str = '', bucket: Optional[str] = None, delimiter: str = '/',
+                   concurrency: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Yield every object under a prefix, listing its sub-prefixes concurrently.
+
+        Objects directly under the prefix come first; objects from the
+        sub-prefixes then arrive interleaved in no particular order. A bounded
+        queue keeps fast listers from running ahead of the consumer.
+        """
+        concurrency = concurrency or self.concurrency
+
+        sub_prefixes: List[str] = []
+        async for page in self.pages(prefix, bucket, delimiter):
+            for obj in page['objects']:
+                yield obj
+            sub_prefixes.extend(page['prefixes'])
+
+        if not sub_prefixes:
+            return
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.page_size)
+        pending: Iterator[str] = iter(sub_prefixes)
+
+        async def produce():
+            for sub_prefix in pending:
+                async for obj in self.objects(sub_prefix, bucket):
+                    await queue.put(obj)
+
+        workers = [asyncio.create_task(produce()) for _ in range(min(concurrency, len(sub_prefixes)))]
+
+        async def run_producers():
+            try:
+                await asyncio.gather(*workers)
+            except Exception:
+                # gather() does not stop the other listers; left running they would block on the full queue
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                await queue.put(_DONE)
+                raise
+            await queue.put(_DONE)
+
+        producers = asyncio.create_task(run_producers())
+        try:
+            while True:
+                obj = await queue.get()
+                if obj is _DONE:
+                    break
+                yield obj
+            # Surface listing errors from the producers
+            await producers
+        finally:
+            # On an error or early exit nobody reads the queue any more, so stop every lister
+            for task in (producers, *workers):
+                task.cancel()
+            await asyncio.gather(producers, *workers, return_exceptions=True)
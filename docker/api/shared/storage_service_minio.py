@@ -1,13 +1,20 @@
 # MinIO Storage Service - Replaces AWS S3/EFS
 import os
+import math
+import base64
+import hashlib
 import logging
-from typing import Optional, BinaryIO, Dict, Any, List
+from itertools import islice
+from typing import Optional, BinaryIO, Dict, Any, List, Iterator
 import boto3
 from botocore.client import Config
 from botocore.exceptions import ClientError
 
 logger = logging.getLogger(__name__)
 
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
 class MinIOStorageService:
     """MinIO storage service with S3-compatible API"""
     
@@ -29,9 +36,27 @@ class MinIOStorageService:
             region_name='us-east-1'  # MinIO doesn't use regions, but boto3 requires it
         )
         
+        # Presigned URLs are handed to clients, so sign them for the publicly reachable
+        # endpoint (signing is local; this client never makes requests)
+        self.public_endpoint_url = os.environ.get('S3_PUBLIC_ENDPOINT_URL', self.endpoint_url)
+        self.presign_client = boto3.client(
+            's3',
+            endpoint_url=self.public_endpoint_url,
+            aws_access_key_id=self.access_key,
+            aws_secret_access_key=self.secret_key,
+            config=Config(signature_version='s3v4'),
+            region_name='us-east-1'
+        ) if self.public_endpoint_url != self.endpoint_url else self.client
+        
         self.data_bucket = os.environ.get('S3_DATA_BUCKET', 'pretamane-data')
         self.backup_bucket = os.environ.get('S3_BACKUP_BUCKET', 'pretamane-backup')
         
+        # Multipart part size (S3 minimum is 5 MB for all but the last part)
+        self.part_size = max(
+            int(os.environ.get('S3_MULTIPART_PART_SIZE', 8 * 1024 * 1024)),
+            MIN_PART_SIZE
+        )
+        
         logger.info(f"MinIO client initialized: {self.endpoint_url}")
         
         # Ensure buckets exist
@@ -80,6 +105,76 @@ class MinIOStorageService:
             logger.error(f"Error uploading file to MinIO: {str(e)}")
             return False
     
+    def upload_stream(self, fileobj: BinaryIO, key: str, bucket: Optional[str] = None,
+                      content_type: Optional[str] = None, metadata: Optional[Dict] = None) -> Optional[Dict[str, Any]]:
+        """Stream a file object to MinIO part by part, hashing as it goes.
+        
+        Only one part is held in memory at a time. Objects smaller than one
+        part are sent with a single put_object. Returns size, SHA-256 and ETag,
+        or None on failure (any partial multipart upload is aborted).
+        """
+        bucket = bucket or self.data_bucket
+        sha256 = hashlib.sha256()
+        size = 0
+        upload_id = None
+        
+        extra = {}
+        if content_type:
+            extra['ContentType'] = content_type
+        if metadata:
+            extra['Metadata'] = metadata
+        
+        try:
+            chunk = fileobj.read(self.part_size)
+            sha256.update(chunk)
+            size += len(chunk)
+            
+            next_chunk = fileobj.read(self.part_size)
+            if not next_chunk:
+                # Single-part object
+                response = self.client.put_object(Bucket=bucket, Key=key, Body=chunk, **extra)
+                logger.info(f"Uploaded file to MinIO: s3://{bucket}/{key} ({size} bytes)")
+                return {'size': size, 'sha256': sha256.hexdigest(), 'etag': response['ETag'], 'parts': 1}
+            
+            upload_id = self.client.create_multipart_upload(Bucket=bucket, Key=key, **extra)['UploadId']
+            parts = []
+            
+            while chunk:
+                response = self.client.upload_part(
+                    Bucket=bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=len(parts) + 1,
+                    Body=chunk
+                )
+                parts.append({'PartNumber': len(parts) + 1, 'ETag': response['ETag']})
+                
+                if next_chunk is not None:
+                    chunk, next_chunk = next_chunk, None
+                else:
+                    chunk = fileobj.read(self.part_size)
+                sha256.update(chunk)
+                size += len(chunk)
+            
+            response = self.client.complete_multipart_upload(
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': parts}
+            )
+            
+            logger.info(f"Uploaded file to MinIO: s3://{bucket}/{key} ({size} bytes, {len(parts)} parts)")
+            return {'size': size, 'sha256': sha256.hexdigest(), 'etag': response['ETag'], 'parts': len(parts)}
+            
+        except Exception as e:
+            logger.error(f"Error streaming file to MinIO: {str(e)}")
+            if upload_id:
+                try:
+                    self.client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+                except Exception as abort_error:
+                    logger.warning(f"Error aborting multipart upload {upload_id}: {str(abort_error)}")
+            return None
+    
     def download_file(self, key: str, bucket: Optional[str] = None) -> Optional[bytes]:
         """Download file from MinIO"""
         try:
@@ -95,25 +190,80 @@ class MinIOStorageService:
             logger.error(f"Error downloading file from MinIO: {str(e)}")
             return None
     
+    def open_object(self, key: str, bucket: Optional[str] = None, byte_range: Optional[str] = None,
+                    if_none_match: Optional[str] = None) -> Dict[str, Any]:
+        """Open an object for streaming, letting MinIO apply Range and If-None-Match.
+        
+        Returns a dict whose 'status' is 200/206 (with an unread 'body' the
+        caller must close), or 304, 404 or 416 with no body.
+        """
+        bucket = bucket or self.data_bucket
+        
+        params = {'Bucket': bucket, 'Key': key}
+        if byte_range:
+            params['Range'] = byte_range
+        if if_none_match:
+            params['IfNoneMatch'] = if_none_match
+        
+        try:
+            response = self.client.get_object(**params)
+        except ClientError as e:
+            status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+            code = e.response.get('Error', {}).get('Code')
+            if status == 304 or code in ('304', 'NotModified'):
+                return {'status': 304}
+            if status == 416 or code == 'InvalidRange':
+                return {'status': 416}
+            if status == 404 or code in ('404', 'NoSuchKey'):
+                return {'status': 404}
+            raise
+        
+        return {
+            'status': 206 if response.get('ContentRange') else 200,
+            'body': response['Body'],
+            'content_length': response['ContentLength'],
+            'content_range': response.get('ContentRange'),
+            'content_type': response.get('ContentType', 'application/octet-stream'),
+            'etag': response['ETag'],
+            'last_modified': response['LastModified']
+        }
+    
     def get_file_metadata(self, key: str, bucket: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """Get file metadata from MinIO"""
         try:
             bucket = bucket or self.data_bucket
             
-            response = self.client.head_object(Bucket=bucket, Key=key)
+            response = self.client.head_object(Bucket=bucket, Key=key, ChecksumMode='ENABLED')
+            
+            # Full-object SHA-256, present when the upload carried x-amz-checksum-sha256
+            checksum = response.get('ChecksumSHA256')
             
             return {
                 'size': response['ContentLength'],
                 'content_type': response.get('ContentType', 'application/octet-stream'),
                 'last_modified': response['LastModified'].isoformat(),
                 'metadata': response.get('Metadata', {}),
-                'etag': response['ETag']
+                'etag': response['ETag'],
+                'sha256': base64.b64decode(checksum).hex() if checksum and '-' not in checksum else None
             }
             
         except Exception as e:
             logger.error(f"Error getting file metadata: {str(e)}")
             return None
     
+    def copy_file(self, source_key: str, dest_key: str, bucket: Optional[str] = None) -> bool:
+        """Server-side copy within a bucket (multipart copy for large objects)"""
+        try:
+            bucket = bucket or self.data_bucket
+            
+            self.client.copy({'Bucket': bucket, 'Key': source_key}, bucket, dest_key)
+            logger.info(f"Copied s3://{bucket}/{source_key} to {dest_key}")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error copying file in MinIO: {str(e)}")
+            return False
+    
     def delete_file(self, key: str, bucket: Optional[str] = None) -> bool:
         """Delete file from MinIO"""
         try:
@@ -127,27 +277,46 @@ class MinIOStorageService:
             logger.error(f"Error deleting file from MinIO: {str(e)}")
             return False
     
+    @staticmethod
+    def _format_object(obj: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape one list_objects_v2 entry"""
+        return {
+            'key': obj['Key'],
+            'size': obj['Size'],
+            'last_modified': obj['LastModified'].isoformat(),
+            'etag': obj['ETag']
+        }
+    
+    def iter_pages(self, prefix: str = '', bucket: Optional[str] = None, delimiter: Optional[str] = None,
+                   page_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Yield listing pages ({'objects', 'prefixes'}) following continuation tokens.
+        
+        Only one page is held at a time; with a delimiter, keys below it are
+        rolled up into 'prefixes' instead of being returned as objects.
+        """
+        bucket = bucket or self.data_bucket
+        
+        params = {'Bucket': bucket, 'Prefix': prefix, 'PaginationConfig': {'PageSize': page_size}}
+        if delimiter:
+            params['Delimiter'] = delimiter
+        
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(**params):
+            yield {
+                'objects': [self._format_object(obj) for obj in page.get('Contents', [])],
+                'prefixes': [entry['Prefix'] for entry in page.get('CommonPrefixes', [])]
+            }
+    
+    def iter_objects(self, prefix: str = '', bucket: Optional[str] = None,
+                     page_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Yield every object under a prefix, page by page"""
+        for page in self.iter_pages(prefix, bucket, page_size=page_size):
+            yield from page['objects']
+    
     def list_files(self, prefix: str = '', bucket: Optional[str] = None, max_keys: int = 1000) -> List[Dict[str, Any]]:
-        """List files in MinIO bucket"""
+        """List up to max_keys files in MinIO bucket (use iter_objects to walk everything)"""
         try:
-            bucket = bucket or self.data_bucket
-            
-            response = self.client.list_objects_v2(
-                Bucket=bucket,
-                Prefix=prefix,
-                MaxKeys=max_keys
-            )
-            
-            files = []
-            for obj in response.get('Contents', []):
-                files.append({
-                    'key': obj['Key'],
-                    'size': obj['Size'],
-                    'last_modified': obj['LastModified'].isoformat(),
-                    'etag': obj['ETag']
-                })
-            
-            return files
+            return list(islice(self.iter_objects(prefix, bucket, page_size=min(max_keys, 1000)), max_keys))
             
         except Exception as e:
             logger.error(f"Error listing files in MinIO: {str(e)}")
@@ -158,7 +327,7 @@ class MinIOStorageService:
         try:
             bucket = bucket or self.data_bucket
             
-            url = self.client.generate_presigned_url(
+            url = self.presign_client.generate_presigned_url(
                 'get_object',
                 Params={'Bucket': bucket, 'Key': key},
                 ExpiresIn=expiration
@@ -170,6 +339,102 @@ class MinIOStorageService:
             logger.error(f"Error generating presigned URL: {str(e)}")
             return None
     
+    def presign_upload(self, key: str, size: int, bucket: Optional[str] = None, content_type: Optional[str] = None,
+                       metadata: Optional[Dict] = None, sha256: Optional[str] = None,
+                       expiration: int = 3600) -> Optional[Dict[str, Any]]:
+        """Presign a direct client upload: one PUT URL, or a multipart upload with one URL per part.
+        
+        The returned headers are part of the PUT signature and must be sent
+        as-is. Passing the hex SHA-256 makes MinIO verify the body against it.
+        Multipart uploads are finished with complete_multipart_upload().
+        """
+        try:
+            bucket = bucket or self.data_bucket
+            
+            params = {'Bucket': bucket, 'Key': key}
+            headers = {}
+            if content_type:
+                params['ContentType'] = content_type
+                headers['Content-Type'] = content_type
+            if metadata:
+                params['Metadata'] = metadata
+                headers.update({f"x-amz-meta-{name}": value for name, value in metadata.items()})
+            
+            if size <= self.part_size:
+                if sha256:
+                    params['ChecksumSHA256'] = base64.b64encode(bytes.fromhex(sha256)).decode('ascii')
+                    headers['x-amz-checksum-sha256'] = params['ChecksumSHA256']
+                
+                url = self.presign_client.generate_presigned_url('put_object', Params=params, ExpiresIn=expiration)
+                return {'method': 'PUT', 'url': url, 'headers': headers, 'expires_in': expiration}
+            
+            # Grow the part size if needed to stay within the S3 part limit
+            part_size = max(self.part_size, math.ceil(size / MAX_PARTS))
+            part_count = math.ceil(size / part_size)
+            
+            upload_id = self.client.create_multipart_upload(**params)['UploadId']
+            
+            parts = [
+                {
+                    'part_number': part_number,
+                    'url': self.presign_client.generate_presigned_url(
+                        'upload_part',
+                        Params={'Bucket': bucket, 'Key': key, 'UploadId': upload_id, 'PartNumber': part_number},
+                        ExpiresIn=expiration
+                    )
+                }
+                for part_number in range(1, part_count + 1)
+            ]
+            
+            logger.info(f"Presigned multipart upload for s3://{bucket}/{key} ({part_count} parts)")
+            return {
+                'method': 'multipart',
+                'upload_id': upload_id,
+                'part_size': part_size,
+                'parts': parts,
+                'headers': {},
+                'expires_in': expiration
+            }
+            
+        except Exception as e:
+            logger.error(f"Error presigning upload: {str(e)}")
+            return None
+    
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: List[Dict[str, Any]],
+                                  bucket: Optional[str] = None) -> bool:
+        """Complete a client-driven multipart upload from its (part_number, etag) list"""
+        try:
+            bucket = bucket or self.data_bucket
+            
+            self.client.complete_multipart_upload(
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': [
+                    {'PartNumber': part['part_number'], 'ETag': part['etag']}
+                    for part in sorted(parts, key=lambda part: part['part_number'])
+                ]}
+            )
+            
+            logger.info(f"Completed multipart upload: s3://{bucket}/{key} ({len(parts)} parts)")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error completing multipart upload: {str(e)}")
+            return False
+    
+    def abort_multipart_upload(self, key: str, upload_id: str, bucket: Optional[str] = None) -> bool:
+        """Abort a multipart upload and discard its uploaded parts"""
+        try:
+            bucket = bucket or self.data_bucket
+            
+            self.client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error aborting multipart upload: {str(e)}")
+            return False
+    
     def bucket_exists(self, bucket: str) -> bool:
         """Check if bucket exists"""
         try:
@@ -178,19 +443,25 @@ class MinIOStorageService:
         except ClientError:
             return False
     
+    def scan_usage(self, bucket: Optional[str] = None) -> Dict[str, int]:
+        """Full paginated scan of a bucket's byte and object totals (for ledger reconciliation)"""
+        bucket = bucket or self.data_bucket
+        usage = {'total_bytes': 0, 'object_count': 0}
+        
+        for obj in self.iter_objects(bucket=bucket):
+            usage['total_bytes'] += obj['size']
+            usage['object_count'] += 1
+        
+        return usage
+    
     def get_bucket_size(self, bucket: Optional[str] = None) -> Dict[str, Any]:
-        """Get bucket size statistics"""
+        """Get bucket size statistics by listing every object (use the storage ledger for hot paths)"""
         try:
             bucket = bucket or self.data_bucket
             
-            response = self.client.list_objects_v2(Bucket=bucket)
-            
-            total_size = 0
-            file_count = 0
-            
-            for obj in response.get('Contents', []):
-                total_size += obj['Size']
-                file_count += 1
+            usage = self.scan_usage(bucket)
+            total_size = usage['total_bytes']
+            file_count = usage['object_count']
             
             return {
                 'bucket': bucket,
@@ -202,7 +473,3 @@ class MinIOStorageService:
         except Exception as e:
             logger.error(f"Error getting bucket size: {str(e)}")
             return {'bucket': bucket, 'total_size_bytes': 0, 'file_count': 0}
-
-
-
-
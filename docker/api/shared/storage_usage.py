@@ -0,0 +1,44 @@
+# Storage Usage - Shapes storage_usage ledger rows for both database backends
+from typing import Dict, Any, Iterable, List, Tuple
+
+def usage_deltas(ledger: Dict[str, Dict[str, int]],
+                 usage: Dict[str, Dict[str, int]]) -> List[Tuple[str, int, int]]:
+    """(contact_id, bytes, objects) changes that turn ledger rows into document totals.
+
+    Both sides map contact_id to {'total_bytes', 'object_count'}; contacts
+    that already match are left out. Applied as deltas, the changes keep
+    whatever was recorded after the ledger snapshot was read.
+    """
+    deltas = []
+    for contact_id in set(ledger) | set(usage):
+        before = ledger.get(contact_id, {})
+        after = usage.get(contact_id, {})
+        delta_bytes = after.get('total_bytes', 0) - before.get('total_bytes', 0)
+        delta_objects = after.get('object_count', 0) - before.get('object_count', 0)
+        if delta_bytes or delta_objects:
+            deltas.append((contact_id, delta_bytes, delta_objects))
+    return sorted(deltas)
+
+def format_usage(row: Any) -> Dict[str, Any]:
+    """Format one ledger row like MinIOStorageService.get_bucket_size()"""
+    total_bytes = int(row['total_bytes'])
+    last_reconciled = row['last_reconciled']
+    return {
+        'bucket': row['bucket'],
+        'total_size_bytes': total_bytes,
+        'total_size_mb': round(total_bytes / (1024 * 1024), 2),
+        'file_count': int(row['object_count']),
+        'last_reconciled': last_reconciled.isoformat() if last_reconciled else None
+    }
+
+def build_contact_usage(contact_id: str, rows: Iterable[Any]) -> Dict[str, Any]:
+    """Combine a contact's per-bucket rows into one summary"""
+    buckets = {row['bucket']: format_usage(row) for row in rows}
+    total_bytes = sum(bucket['total_size_bytes'] for bucket in buckets.values())
+    return {
+        'contact_id': contact_id,
+        'total_size_bytes': total_bytes,
+        'total_size_mb': round(total_bytes / (1024 * 1024), 2),
+        'file_count': sum(bucket['file_count'] for bucket in buckets.values()),
+        'buckets': buckets
+    }
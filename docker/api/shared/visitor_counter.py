@@ -0,0 +1,56 @@
+# Visitor Counter - Sharded counter helpers shared by the PostgreSQL backends
+import os
+import time
+import random
+import threading
+
+# Number of rows in website_visitor_shards that writers spread across
+VISITOR_COUNTER_SHARDS = int(os.environ.get('VISITOR_COUNTER_SHARDS', '16'))
+
+# How long a summed read may be served from memory
+VISITOR_COUNT_CACHE_TTL = float(os.environ.get('VISITOR_COUNT_CACHE_TTL', '5'))
+
+INCREMENT_SHARD_SQL = """
+    INSERT INTO website_visitor_shards (shard_id, count, last_updated)
+    VALUES ({shard}, 1, NOW())
+    ON CONFLICT (shard_id) DO UPDATE
+    SET count = website_visitor_shards.count + 1,
+        last_updated = NOW()
+"""
+
+SUM_SHARDS_SQL = "SELECT COALESCE(SUM(count), 0) FROM website_visitor_shards"
+
+def pick_shard() -> int:
+    """Choose a random shard so concurrent writers rarely share a row lock"""
+    return random.randrange(VISITOR_COUNTER_SHARDS)
+
+class ApproximateCounter:
+    """In-process view of the sharded total that only ever moves forward.
+
+    Reads are served from memory until the TTL expires, then refreshed from
+    the shard sum. Local increments are applied immediately so a process
+    never reports a lower count than it has already returned.
+    """
+
+    def __init__(self, ttl: float = VISITOR_COUNT_CACHE_TTL):
+        self.ttl = ttl
+        self.value = 0
+        self.refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        """Whether the cached total should be re-read from the shards"""
+        return time.monotonic() - self.refreshed_at > self.ttl
+
+    def observe(self, total: int) -> int:
+        """Record a freshly summed total"""
+        with self._lock:
+            self.value = max(self.value, int(total))
+            self.refreshed_at = time.monotonic()
+            return self.value
+
+    def increment(self) -> int:
+        """Account for one local increment"""
+        with self._lock:
+            self.value += 1
+            return self.value
@@ -2,12 +2,37 @@
 import os
 import re
 import json
+import codecs
 import logging
+from collections import Counter
 from typing import Dict, Any, List
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Compiled once at import, so every process (including analysis pool workers) reuses them
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+# Phone, date and keyword patterns mean \b\d{3}..., \b\d{1,2}... and \b[a-zA-Z]{3,}\b; starting
+# on a bare character class (with the word boundary checked by lookbehind) lets the regex
+# engine skip straight to candidate characters
+PHONE_PATTERN = re.compile(r'\d(?<!\w\d)\d{2}[-.]?\d{3}[-.]?\d{4}\b')
+URL_PATTERN = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+DATE_PATTERN = re.compile(r'\d(?<!\w\d)\d?[/-]\d{1,2}[/-]\d{2,4}\b')
+AMOUNT_PATTERN = re.compile(r'\$\d+(?:,\d{3})*(?:\.\d{2})?')
+KEYWORD_PATTERN = re.compile(r'[a-zA-Z](?<!\w[a-zA-Z])[a-zA-Z]{2,}\b')
+
+# Common English words (3+ letters, as KEYWORD_PATTERN only matches those) that are never keywords
+STOPWORDS = frozenset("""
+    about above after again against all also and any are aren because been before being below
+    between both but can cannot could couldn did didn does doesn doing don down during each few
+    for from further had hadn has hasn have haven having her here hers herself him himself his
+    how however into isn its itself just let more most mustn myself nor not now off once only
+    other ought our ours ourselves out over own per same shall shan she should shouldn some such
+    than that the their theirs them themselves then there these they this those through too
+    under until upon very via was wasn were weren what when where which while who whom why will
+    with won would wouldn yes yet you your yours yourself yourselves
+""".split())
+
 class DocumentProcessingService:
     """Document processing service for content analysis"""
     
@@ -34,20 +59,59 @@ class DocumentProcessingService:
     @staticmethod
     def extract_metadata_from_content(content: str, filename: str) -> Dict[str, Any]:
         """Extract metadata from document content (from enhanced_index.py)"""
+        return DocumentProcessingService.metadata_from_scan(DocumentProcessingService.scan_content(content), filename)
+    
+    @staticmethod
+    def metadata_from_scan(scan: Dict[str, Any], filename: str) -> Dict[str, Any]:
+        """Shape a scan_content() result (or a merged streaming scan) as document metadata"""
+        entities = scan['entities']
         metadata = {
-            'word_count': len(content.split()) if content else 0,
-            'character_count': len(content) if content else 0,
-            'line_count': len(content.split('\n')) if content else 0,
+            'word_count': scan['word_count'],
+            'character_count': scan['character_count'],
+            'line_count': scan['line_count'],
             'file_extension': os.path.splitext(filename)[1].lower(),
-            'has_email': bool(re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', content)),
-            'has_phone': bool(re.search(r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b', content)),
-            'has_url': bool(re.search(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', content)),
+            'has_email': bool(entities['emails']),
+            'has_phone': bool(entities['phones']),
+            'has_url': bool(entities['urls']),
             'language_detected': 'en',  # Simplified - would use language detection library in production
-            'keywords': DocumentProcessingService.extract_keywords(content),
-            'entities': DocumentProcessingService.extract_entities(content)
+            'keywords': DocumentProcessingService.top_keywords(scan['token_counts']),
+            'entities': entities
         }
         return metadata
     
+    @staticmethod
+    def scan_content(content: str) -> Dict[str, Any]:
+        """Counts, entities and keyword token frequencies in one call, each pattern run at most once.
+        
+        The has_* flags are read off the entity lists instead of rescanning.
+        Entity patterns keep separate passes because their matches can
+        overlap (a phone number inside a URL), which one alternation would hide.
+        """
+        return {
+            'word_count': len(content.split()) if content else 0,
+            'character_count': len(content) if content else 0,
+            'line_count': content.count('\n') + 1 if content else 0,
+            'entities': DocumentProcessingService.extract_entities(content),
+            'token_counts': DocumentProcessingService.count_tokens(content)
+        }
+    
+    @staticmethod
+    def count_tokens(content: str) -> Counter:
+        """Keyword candidate frequencies (lowercased 3+ letter words, stopwords removed) in first-seen order"""
+        if not content:
+            return Counter()
+        
+        token_counts = Counter(KEYWORD_PATTERN.findall(content.lower()))
+        # Deleting the few stopwords present is cheaper than testing every token
+        for stopword in STOPWORDS.intersection(token_counts):
+            del token_counts[stopword]
+        return token_counts
+    
+    @staticmethod
+    def top_keywords(token_counts: Counter, limit: int = 10) -> List[str]:
+        """Most frequent tokens (ties in first-seen order) that occur more than once"""
+        return [word for word, freq in token_counts.most_common(limit) if freq > 1]
+    
     @staticmethod
     def extract_keywords(content: str) -> List[str]:
         """Extract keywords from content (from enhanced_index.py)"""
@@ -55,24 +119,18 @@ class DocumentProcessingService:
             return []
         
         # Simple keyword extraction - in production, use NLP libraries
-        words = re.findall(r'\b[a-zA-Z]{3,}\b', content.lower())
-        word_freq = {}
-        for word in words:
-            word_freq[word] = word_freq.get(word, 0) + 1
-        
-        # Return top 10 most frequent words
-        sorted_words = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)
-        return [word for word, freq in sorted_words[:10] if freq > 1]
+        return DocumentProcessingService.top_keywords(DocumentProcessingService.count_tokens(content))
     
     @staticmethod
     def extract_entities(content: str) -> Dict[str, List[str]]:
         """Extract entities from content (from enhanced_index.py)"""
+        # Scans that cannot match without their anchor text are skipped
         entities = {
-            'emails': re.findall(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', content),
-            'phones': re.findall(r'\b\d{3}[-.]?\d{3}[-.]?\d{4}\b', content),
-            'urls': re.findall(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', content),
-            'dates': re.findall(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b', content),
-            'amounts': re.findall(r'\$\d+(?:,\d{3})*(?:\.\d{2})?', content)
+            'emails': EMAIL_PATTERN.findall(content) if '@' in content else [],
+            'phones': PHONE_PATTERN.findall(content),
+            'urls': URL_PATTERN.findall(content) if 'http' in content else [],
+            'dates': DATE_PATTERN.findall(content),
+            'amounts': AMOUNT_PATTERN.findall(content) if '$' in content else []
         }
         return entities
     
@@ -143,3 +201,83 @@ class DocumentProcessingService:
             return 'videos'
         else:
             return 'other'
+
+# Content types whose text is analyzed in full; for the others extract_text_from_content
+# only looks at a prefix, so reading a bounded prefix gives the same result
+STREAMABLE_CONTENT_TYPES = {'text/plain', 'application/json'}
+
+class StreamingContentAnalyzer:
+    """Builds extract_metadata_from_content() output from a byte stream in bounded memory.
+    
+    feed() decodes UTF-8 incrementally and returns the text up to the last
+    whitespace, keeping the rest for the next call. Scan each returned
+    segment with DocumentProcessingService.scan_content (or in the analysis
+    pool) and add() the result. No pattern can match across whitespace, so
+    the merged result equals a scan of the whole text, within these bounds:
+    
+    - a run of max_carry characters without whitespace is cut anyway
+    - each entity list keeps its first entity_limit matches
+    - past max_tokens distinct tokens, tokens seen only once are dropped
+    """
+    
+    def __init__(self, entity_limit: int = 1000, max_tokens: int = 100000,
+                 max_carry: int = 65536, preview_chars: int = 100000):
+        self.entity_limit = entity_limit
+        self.max_tokens = max_tokens
+        self.max_carry = max_carry
+        self.preview_chars = preview_chars
+        
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._carry = ''
+        
+        self.preview = ''
+        self.word_count = 0
+        self.character_count = 0
+        self.newline_count = 0
+        self.entities: Dict[str, List[str]] = {}
+        self.token_counts: Counter = Counter()
+    
+    def feed(self, data: bytes, final: bool = False) -> List[str]:
+        """Decode the next chunk and return the segments that are ready to scan"""
+        decoded = self._decoder.decode(data, final)
+        if len(self.preview) < self.preview_chars:
+            self.preview += decoded[:self.preview_chars - len(self.preview)]
+        
+        text = self._carry + decoded
+        if final:
+            self._carry = ''
+            return [text] if text else []
+        
+        # Any whitespace character is a safe cut; the common ones are found with C-level rfind
+        cut = max(text.rfind(' '), text.rfind('\n'), text.rfind('\t'), text.rfind('\r')) + 1
+        if not cut and len(text) >= self.max_carry:
+            cut = len(text)
+        
+        self._carry = text[cut:]
+        return [text[:cut]] if cut else []
+    
+    def add(self, scan: Dict[str, Any]):
+        """Merge the scan_content() result of the next segment"""
+        self.word_count += scan['word_count']
+        self.character_count += scan['character_count']
+        if scan['character_count']:
+            self.newline_count += scan['line_count'] - 1
+        
+        for name, found in scan['entities'].items():
+            kept = self.entities.setdefault(name, [])
+            kept.extend(found[:self.entity_limit - len(kept)])
+        
+        # Counter.update keeps first-seen order, so keyword ties resolve as for the whole text
+        self.token_counts.update(scan['token_counts'])
+        if len(self.token_counts) > self.max_tokens:
+            self.token_counts = Counter({token: count for token, count in self.token_counts.items() if count > 1})
+    
+    def metadata(self, filename: str) -> Dict[str, Any]:
+        """Document metadata for everything fed so far"""
+        return DocumentProcessingService.metadata_from_scan({
+            'word_count': self.word_count,
+            'character_count': self.character_count,
+            'line_count': self.newline_count + 1 if self.character_count else 0,
+            'entities': {name: self.entities.get(name, []) for name in ('emails', 'phones', 'urls', 'dates', 'amounts')},
+            'token_counts': self.token_counts
+        }, filename)
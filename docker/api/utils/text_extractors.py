@@ -0,0 +1,202 @@
+# Text extractors - Pulls plain text out of binary document formats
+import io
+import os
+import zipfile
+import importlib
+import logging
+from typing import Dict, Any, Callable, List, Optional
+
+from utils.document_processing import DocumentProcessingService
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever extraction, metadata, keyword or complexity output changes;
+# cached results (extraction_results) of other versions are ignored
+EXTRACTOR_VERSION = '1'
+
+# Leading bytes of an Office Open XML (zip) container
+ZIP_MAGIC = b'PK\x03\x04'
+# Without a NUL in this prefix, unknown content is treated as text
+BINARY_SNIFF_BYTES = 8192
+
+class ExtractorUnavailableError(RuntimeError):
+    """Raised when the parser library for a format is not installed"""
+
+class TextExtractor:
+    """One document format: how to recognise it and how to get its text.
+
+    magic is the file's leading bytes; zip_member names an entry that
+    identifies the format inside a zip container. The parser module is
+    imported on first use, so processes that never see the format never
+    load it.
+    """
+
+    def __init__(self, name: str, content_types: List[str], extensions: List[str],
+                 module: str, extract: Callable[[Any, bytes, Optional[int]], str],
+                 magic: Optional[bytes] = None, zip_member: Optional[str] = None):
+        self.name = name
+        self.content_types = set(content_types)
+        self.extensions = set(extensions)
+        self.module = module
+        self.magic = magic
+        self.zip_member = zip_member
+        self._extract = extract
+        self._parser = None
+
+    def parser(self):
+        """Import the parser module on first use"""
+        if self._parser is None:
+            try:
+                self._parser = importlib.import_module(self.module)
+            except ImportError as e:
+                raise ExtractorUnavailableError(f"{self.name} extraction needs {self.module}: {str(e)}")
+        return self._parser
+
+    def extract(self, data: bytes, max_chars: Optional[int] = None) -> str:
+        """Text of one file; parsers stop early once max_chars are collected"""
+        return self._extract(self.parser(), data, max_chars)
+
+def _join_limited(parts, max_chars: Optional[int]) -> str:
+    """Join text parts with newlines, stopping once max_chars are collected"""
+    collected = []
+    size = 0
+    for part in parts:
+        if not part:
+            continue
+        collected.append(part)
+        size += len(part) + 1
+        if max_chars is not None and size >= max_chars:
+            break
+    return '\n'.join(collected)
+
+def _extract_pdf(pypdf, data: bytes, max_chars: Optional[int]) -> str:
+    reader = pypdf.PdfReader(io.BytesIO(data))
+    return _join_limited((page.extract_text() for page in reader.pages), max_chars)
+
+def _extract_docx(docx, data: bytes, max_chars: Optional[int]) -> str:
+    document = docx.Document(io.BytesIO(data))
+
+    def parts():
+        for paragraph in document.paragraphs:
+            yield paragraph.text
+        for table in document.tables:
+            for row in table.rows:
+                yield '\t'.join(cell.text for cell in row.cells)
+
+    return _join_limited(parts(), max_chars)
+
+def _extract_xlsx(openpyxl, data: bytes, max_chars: Optional[int]) -> str:
+    # read_only streams rows instead of building every cell object
+    workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+
+    def parts():
+        for sheet in workbook.worksheets:
+            yield sheet.title
+            for row in sheet.iter_rows(values_only=True):
+                yield '\t'.join('' if value is None else str(value) for value in row).rstrip('\t')
+
+    try:
+        return _join_limited(parts(), max_chars)
+    finally:
+        workbook.close()
+
+def _extract_pptx(pptx, data: bytes, max_chars: Optional[int]) -> str:
+    presentation = pptx.Presentation(io.BytesIO(data))
+
+    def parts():
+        for slide in presentation.slides:
+            for shape in slide.shapes:
+                if shape.has_text_frame:
+                    yield shape.text_frame.text
+
+    return _join_limited(parts(), max_chars)
+
+# Checked in order; formats are matched by magic bytes before the declared type
+EXTRACTORS = [
+    TextExtractor('pdf', ['application/pdf'], ['.pdf'], 'pypdf', _extract_pdf, magic=b'%PDF-'),
+    TextExtractor(
+        'docx', ['application/vnd.openxmlformats-officedocument.wordprocessingml.document'], ['.docx'],
+        'docx', _extract_docx, magic=ZIP_MAGIC, zip_member='word/document.xml'
+    ),
+    TextExtractor(
+        'xlsx', ['application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'], ['.xlsx'],
+        'openpyxl', _extract_xlsx, magic=ZIP_MAGIC, zip_member='xl/workbook.xml'
+    ),
+    TextExtractor(
+        'pptx', ['application/vnd.openxmlformats-officedocument.presentationml.presentation'], ['.pptx'],
+        'pptx', _extract_pptx, magic=ZIP_MAGIC, zip_member='ppt/presentation.xml'
+    ),
+]
+
+def register_extractor(extractor: TextExtractor):
+    """Add a format, taking precedence over the built-in ones"""
+    EXTRACTORS.insert(0, extractor)
+
+def declared_extractor(content_type: str, filename: str) -> Optional[TextExtractor]:
+    """Extractor for a declared content type or file extension, without looking at the bytes"""
+    extension = os.path.splitext(filename)[1].lower()
+    for extractor in EXTRACTORS:
+        if content_type in extractor.content_types or extension in extractor.extensions:
+            return extractor
+    return None
+
+def find_extractor(data: bytes, content_type: str, filename: str) -> Optional[TextExtractor]:
+    """Extractor for a file: by magic bytes first, then by declared type or extension"""
+    zip_members = None
+    for extractor in EXTRACTORS:
+        if not extractor.magic or not data.startswith(extractor.magic):
+            continue
+        if not extractor.zip_member:
+            return extractor
+
+        if zip_members is None:
+            try:
+                with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                    zip_members = set(archive.namelist())
+            except zipfile.BadZipFile:
+                zip_members = set()
+        if extractor.zip_member in zip_members:
+            return extractor
+
+    return declared_extractor(content_type, filename)
+
+def extract_document_text(data: bytes, content_type: str, filename: str,
+                          max_chars: Optional[int] = None) -> Dict[str, Any]:
+    """Text of a stored file, whatever its format.
+
+    Returns {'content', 'text_content', 'extractor', 'truncated'} and, when a
+    parser fails on the file, 'extraction_error' with empty text. content is
+    the decoded file (or the extracted text) and text_content what
+    extract_text_from_content makes of it. Unknown binary content yields no
+    text. Time and memory limits (TimeoutError, MemoryError) propagate.
+    """
+    result = {'content': '', 'text_content': '', 'extractor': 'text', 'truncated': False}
+    extractor = find_extractor(data, content_type, filename)
+
+    if extractor:
+        result['extractor'] = extractor.name
+        try:
+            content = extractor.extract(data, max_chars)
+        except (TimeoutError, MemoryError):
+            raise
+        except Exception as e:
+            logger.warning(f"Could not extract {extractor.name} text from {filename}: {str(e)}")
+            result['extraction_error'] = str(e) or type(e).__name__
+            return result
+
+    elif b'\x00' in data[:BINARY_SNIFF_BYTES]:
+        result['extractor'] = 'binary'
+        return result
+
+    else:
+        content = data.decode('utf-8', errors='replace')
+
+    if max_chars is not None and len(content) > max_chars:
+        content = content[:max_chars]
+        result['truncated'] = True
+
+    result['content'] = content
+    result['text_content'] = (
+        content if extractor else DocumentProcessingService.extract_text_from_content(content, content_type)
+    )
+    return result